@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark identity resolution on synthetic people.
+Builds a scratch database of N people (surname variants, typos, birth
+years 1750-1950, some death dates and places), then times a full first run, an incremental run with
+1% of people edited, and a run with nothing changed.
+
+Usage:
+    python bench_identity.py [N] [--db path]    (default 100000, temp file)
+"""
+
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import identity_resolver
+
+SURNAMES = [
+    "smith", "johnson", "williams", "brown", "jones", "miller", "davis", "wilson",
+    "anderson", "taylor", "thomas", "moore", "martin", "jackson", "thompson", "white",
+    "harris", "clark", "lewis", "robinson", "walker", "young", "allen", "king",
+    "wright", "scott", "hill", "green", "adams", "baker", "nelson", "carter",
+    "mitchell", "roberts", "turner", "phillips", "campbell", "parker", "evans", "edwards",
+    "collins", "stewart", "morris", "murphy", "cook", "rogers", "morgan", "cooper",
+    "peterson", "reed", "bailey", "bell", "kelly", "howard", "ward", "cox",
+    "richardson", "wood", "watson", "brooks", "bennett", "gray", "hughes", "price",
+    "sanders", "myers", "long", "ross", "foster", "schmidt", "mueller", "weber",
+    "schneider", "fischer", "meyer", "wagner", "becker", "hoffmann", "koch", "richter",
+]
+GIVEN = [
+    "john", "william", "james", "george", "charles", "thomas", "henry", "joseph",
+    "robert", "edward", "samuel", "david", "frank", "walter", "arthur", "albert",
+    "mary", "anna", "elizabeth", "margaret", "sarah", "emma", "alice", "martha",
+    "catherine", "jane", "ellen", "clara", "ida", "bertha", "minnie", "florence",
+    "johann", "friedrich", "heinrich", "wilhelm", "maria", "katharina", "elisabeth", "anna",
+]
+
+
+def typo(word: str, rng: random.Random) -> str:
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    op = rng.random()
+    if op < 0.4:
+        return word[:i] + word[i + 1:]                          # drop
+    if op < 0.7:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]  # swap
+    return word[:i] + rng.choice("aeiouy") + word[i + 1:]       # vowel change
+
+
+def make_people(n: int, rng: random.Random):
+    # Surname variants (a few thousand distinct spellings overall)
+    surnames = SURNAMES + [typo(s, rng) + suffix for s in SURNAMES for suffix in ("", "s", "e")] * 8
+    rows = []
+    for pid in range(1, n + 1):
+        first, last = rng.choice(GIVEN), rng.choice(surnames)
+        if rng.random() < 0.05:
+            first = typo(first, rng)
+        year = rng.randint(1750, 1950)
+        birth = rng.choice([str(year), f"abt {year}", f"{rng.randint(1, 28)} Mar {year}", ""])
+        death = rng.choice([str(year + rng.randint(0, 90)), ""])
+        rows.append((pid, first.title(), last.title(), f"{first.title()} {last.title()}", birth, death))
+    return rows
+
+
+def timed(conn, label):
+    t0 = time.perf_counter()
+    stats = identity_resolver.resolve(conn)
+    elapsed = time.perf_counter() - t0
+    print(f"{label:14} {elapsed:8.2f}s  people={stats['people']} "
+          f"changed={stats['changed']} candidates={stats['candidates']} "
+          f"pairs={stats['pairs']} clusters={stats['clusters']}")
+    return elapsed
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    n = int(args[0]) if args else 100_000
+    db = Path(sys.argv[sys.argv.index("--db") + 1]) if "--db" in sys.argv else \
+        Path(tempfile.mkstemp(suffix=".db")[1])
+
+    rng = random.Random(42)
+    conn = sqlite3.connect(db)
+    conn.executescript("""
+        DROP TABLE IF EXISTS people;
+        DROP TABLE IF EXISTS identity_scores;
+        DROP TABLE IF EXISTS identity_state;
+        DROP TABLE IF EXISTS identity_clusters;
+        DROP TABLE IF EXISTS person_locations;
+        CREATE TABLE people (
+            id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT,
+            name TEXT, birth_date TEXT, death_date TEXT
+        );
+        CREATE TABLE person_locations (
+            id INTEGER PRIMARY KEY, person_id INTEGER, location_id INTEGER, notes TEXT
+        );
+    """)
+    conn.executemany("INSERT INTO people VALUES (?, ?, ?, ?, ?, ?)", make_people(n, rng))
+    conn.executemany(
+        "INSERT INTO person_locations (person_id, location_id) VALUES (?, ?)",
+        [(rng.randint(1, n), rng.randint(1, 500)) for _ in range(n // 2)]
+    )
+    conn.commit()
+
+    print(f"{n} people, metric={identity_resolver.METRIC}, db={db}")
+    timed(conn, "full")
+
+    edits = rng.sample(range(1, n + 1), max(1, n // 100))
+    conn.executemany(
+        "UPDATE people SET name = name || 'e' WHERE id=?", [(pid,) for pid in edits]
+    )
+    conn.commit()
+    timed(conn, "1% changed")
+    timed(conn, "no changes")
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
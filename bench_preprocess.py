@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark preprocessing profiles.
+For each sample page and each profile: preprocess time and EasyOCR
+mean confidence, plus which profile "auto" would pick.
+
+Usage:
+    python bench_preprocess.py [folder_of_pages] [--no-ocr]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+from preprocess import PROFILES, load_gray, clean_array, source_dpi, choose_profile, estimate_noise
+
+BASE = Path.home() / "genealogy"
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".bmp", ".tiff", ".tif"}
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    run_ocr = "--no-ocr" not in sys.argv
+    folder = Path(args[0]) if args else BASE / "processed"
+
+    pages = sorted(p for p in folder.iterdir() if p.suffix.lower() in IMAGE_EXTS)
+    if not pages:
+        print(f"No images in {folder}")
+        return 1
+
+    reader = None
+    if run_ocr:
+        import ocr_engine
+        reader = ocr_engine.get_easyocr()
+
+    totals = {p: [0.0, 0.0, 0] for p in PROFILES}  # time, confidence, pages
+
+    print(f"{'page':40} {'noise':>6} {'auto':>9} " +
+          " ".join(f"{p + ' s':>10} {p + ' conf':>13}" for p in PROFILES))
+
+    for page in pages:
+        gray = load_gray(page)
+        dpi = source_dpi(page)
+        row = [f"{page.name[:40]:40}", f"{estimate_noise(gray):6.1f}", f"{choose_profile(gray):>9}"]
+
+        for profile in PROFILES:
+            t0 = time.perf_counter()
+            clean, _ = clean_array(gray, profile, dpi)
+            elapsed = time.perf_counter() - t0
+
+            conf = 0.0
+            if reader is not None:
+                results = reader.readtext(clean, detail=1)
+                conf = sum(r[2] for r in results) / len(results) if results else 0.0
+
+            totals[profile][0] += elapsed
+            totals[profile][1] += conf
+            totals[profile][2] += 1
+            row.append(f"{elapsed:10.2f} {conf:13.3f}")
+
+        print(" ".join(row))
+
+    print()
+    for profile, (t, c, n) in totals.items():
+        print(f"{profile:9} avg {t / n:6.2f}s/page  avg conf {c / n:.3f}  ({n} pages)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
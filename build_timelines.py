@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 import sqlite3
 from pathlib import Path
-from datetime import datetime
 import logging
 
+from date_parser import ensure_date_keys, refresh_keys
+from extraction_store import ensure_schema
+from link_assets import name_forms, tokens
+
 # ============================================================
 # PATHS + LOGGING
 # ============================================================
@@ -18,10 +21,29 @@ logging.basicConfig(
 log = logging.getLogger("timelines")
 log.info("Timeline builder initialized")
 
+# ============================================================
+# EVENT PERSON MATCH
+# ============================================================
+def names_person(said, name) -> int:
+    """
+    1 if an extracted event's person text can refer to this person: the
+    same name, or one of their name forms (link_assets.py) inside it.
+    Events without a person belong to everyone the document is linked to.
+    """
+    said = tokens(said)
+    if not said or said == tokens(name):
+        return 1
+    return int(any(
+        tuple(said[i:i + len(form)]) == form
+        for form, _ in name_forms(name)
+        for i in range(len(said) - len(form) + 1)
+    ))
+
 # ============================================================
 # DATABASE CONNECTION
 # ============================================================
 conn = sqlite3.connect(DB_PATH)
+conn.create_function("names_person", 2, names_person, deterministic=True)
 c = conn.cursor()
 
 # ============================================================
@@ -41,58 +63,219 @@ CREATE TABLE IF NOT EXISTS person_events (
 conn.commit()
 
 # ============================================================
-# HELPER: PARSE DATES
+# INPUT TABLES + INDEXES
 # ============================================================
-def parse_date(date_str: str) -> str:
-    """
-    Normalize dates to ISO format. If invalid, return empty string.
-    """
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%Y"):
-        try:
-            return datetime.strptime(date_str, fmt).date().isoformat()
-        except Exception:
-            continue
-    return ""
+# Events come from extracted_events (validated, dates normalized at
+# extraction time by llm_extract.py): no parsing happens here.
+ensure_schema(conn)
+c.execute("""
+CREATE TABLE IF NOT EXISTS asset_links (
+    file_id INTEGER,
+    person_id INTEGER,
+    confidence REAL
+)
+""")
+c.execute("CREATE INDEX IF NOT EXISTS idx_asset_links_file ON asset_links(file_id)")
+c.execute("CREATE INDEX IF NOT EXISTS idx_asset_links_person ON asset_links(person_id)")
+c.execute("CREATE INDEX IF NOT EXISTS idx_files_path ON files(file_path)")
+c.execute("CREATE INDEX IF NOT EXISTS idx_files_person ON files(person_id)")
+c.execute("CREATE INDEX IF NOT EXISTS idx_ocr_results_path ON ocr_results(file_path)")
+
+# Natural key: the same event from the same file is stored once.
+# Older builds appended duplicates every cycle; drop them before the index.
+if not c.execute("SELECT 1 FROM sqlite_master WHERE name='idx_person_events_key'").fetchone():
+    c.execute("""
+        DELETE FROM person_events WHERE id NOT IN (
+            SELECT MIN(id) FROM person_events
+            GROUP BY person_id, event_type, event_date, description, source_file
+        )
+    """)
+    log.info(f"Removed {c.rowcount} duplicate person_events rows")
+c.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_person_events_key ON person_events
+    (person_id, event_type, event_date, description, source_file)
+""")
+conn.commit()
+
+# ============================================================
+# CHANGE LOG (TRIGGERS)
+# ============================================================
+# Writers never call us: triggers record which people, files and
+# documents changed; each run consumes the log up to its high-water mark.
+c.execute("""
+CREATE TABLE IF NOT EXISTS timeline_changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    person_id INTEGER,
+    file_path TEXT,
+    file_hash TEXT
+)
+""")
+c.execute("""
+CREATE TABLE IF NOT EXISTS timeline_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_change INTEGER,
+    built_at TEXT
+)
+""")
+
+TRIGGERS = {
+    "asset_links": {
+        "INSERT": "(NEW.person_id, NULL, NULL)",
+        "DELETE": "(OLD.person_id, NULL, NULL)",
+        "UPDATE": "(OLD.person_id, NULL, NULL), (NEW.person_id, NULL, NULL)",
+    },
+    "files": {
+        "INSERT": "(NEW.person_id, NEW.file_path, NULL)",
+        "DELETE": "(OLD.person_id, OLD.file_path, NULL)",
+        "UPDATE OF person_id, file_path":
+            "(OLD.person_id, OLD.file_path, NULL), (NEW.person_id, NEW.file_path, NULL)",
+    },
+    "ocr_results": {
+        "INSERT": "(NULL, NEW.file_path, NEW.file_hash)",
+        "DELETE": "(NULL, OLD.file_path, OLD.file_hash)",
+        "UPDATE OF file_path, file_hash":
+            "(NULL, OLD.file_path, OLD.file_hash), (NULL, NEW.file_path, NEW.file_hash)",
+    },
+    "people": {
+        # Events are matched to people by name (names_person)
+        "UPDATE OF name, first_name, last_name": "(NEW.id, NULL, NULL)",
+    },
+    "extracted_events": {
+        "INSERT": "(NULL, NULL, NEW.file_hash)",
+        "DELETE": "(NULL, NULL, OLD.file_hash)",
+    },
+}
+for table, events in TRIGGERS.items():
+    for event, values in events.items():
+        name = f"trg_timeline_{table}_{event.split()[0].lower()}"
+        c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON {table}
+            BEGIN
+                INSERT INTO timeline_changes (person_id, file_path, file_hash)
+                VALUES {values};
+            END
+        """)
+conn.commit()
 
 # ============================================================
-# BUILD TIMELINES
+# DATE KEYS (people / events edited since the last cycle)
 # ============================================================
-c.execute("SELECT id, name FROM people")
-people = c.fetchall()
+ensure_date_keys(conn)
+refresh_keys(conn)
 
-log.info(f"Processing timelines for {len(people)} people")
+# ============================================================
+# AFFECTED PEOPLE
+# ============================================================
+state = c.execute("SELECT last_change FROM timeline_state WHERE id=1").fetchone()
+high_water = c.execute("SELECT COALESCE(MAX(id), 0) FROM timeline_changes").fetchone()[0]
+
+if state is not None and high_water <= (state[0] or 0):
+    conn.close()
+    log.info("No changes since last build")
+    raise SystemExit(0)
 
-for person_id, name in people:
-    # Fetch all files linked to this person
+c.execute("CREATE TEMP TABLE affected (person_id INTEGER PRIMARY KEY)")
+if state is None:
+    # First run with the change log: everyone
     c.execute("""
-        SELECT f.file_path, f.ocr_text
-        FROM files fp
-        JOIN files f ON fp.file_id = f.id
-        WHERE fp.person_id = ?
-    """, (person_id,))
-    files = c.fetchall()
-
-    for file_path, ocr_text in files:
-        # Extract events from OCR text using LLaMA data if available
-        c.execute("SELECT events FROM ocr_results WHERE file_path=?", (file_path,))
-        row = c.fetchone()
-        if row and row[0]:
-            try:
-                events_data = eval(row[0])  # row[0] should be a list of dicts
-            except Exception:
-                events_data = []
-        else:
-            events_data = []
-
-        for event in events_data:
-            event_type = event.get("type", "Unknown")
-            event_date = parse_date(event.get("date", ""))
-            description = event.get("description", "")
-            c.execute("""
-                INSERT INTO person_events (person_id, event_type, event_date, description, source_file)
-                VALUES (?, ?, ?, ?, ?)
-            """, (person_id, event_type, event_date, description, file_path))
+        INSERT OR IGNORE INTO affected
+        SELECT person_id FROM asset_links WHERE person_id IS NOT NULL
+        UNION SELECT person_id FROM files WHERE person_id IS NOT NULL
+        UNION SELECT DISTINCT person_id FROM person_events WHERE person_id IS NOT NULL
+    """)
+else:
+    c.execute("""
+        WITH ch AS (
+            SELECT person_id, file_path, file_hash FROM timeline_changes
+            WHERE id > ? AND id <= ?
+        ),
+        paths AS (
+            SELECT file_path FROM ch WHERE file_path IS NOT NULL
+            UNION
+            SELECT o.file_path FROM ocr_results o JOIN ch ON o.file_hash = ch.file_hash
+        ),
+        fids AS (
+            SELECT f.id, f.person_id FROM files f JOIN paths p ON f.file_path = p.file_path
+        )
+        INSERT OR IGNORE INTO affected
+        SELECT person_id FROM ch WHERE person_id IS NOT NULL
+        UNION SELECT person_id FROM fids WHERE person_id IS NOT NULL
+        UNION SELECT l.person_id FROM asset_links l JOIN fids ON l.file_id = fids.id
+    """, (state[0] or 0, high_water))
+
+n_affected = c.execute("SELECT COUNT(*) FROM affected").fetchone()[0]
+
+# ============================================================
+# REBUILD AFFECTED TIMELINES (UPSERT ON THE NATURAL KEY)
+# ============================================================
+# An event extracted from a document goes on the timeline of each person
+# the document is linked to (asset_links or files.person_id) whom the
+# event names, or of all of them when it names no one.
+c.execute("""
+    CREATE TEMP TABLE fresh AS
+    SELECT DISTINCT l.person_id, e.event_type,
+                    COALESCE(NULLIF(e.event_date, ''), e.date_text) AS event_date,
+                    e.description, f.file_path AS source_file
+    FROM (
+        SELECT file_id, person_id FROM asset_links
+        UNION
+        SELECT id, person_id FROM files WHERE person_id IS NOT NULL
+    ) l
+    JOIN affected a ON a.person_id = l.person_id
+    JOIN files f ON f.id = l.file_id
+    JOIN ocr_results o ON o.file_path = f.file_path
+    JOIN extracted_events e ON e.file_hash = o.file_hash
+    LEFT JOIN people p ON p.id = l.person_id
+    WHERE names_person(e.person, p.name)
+""")
+c.execute("""
+    DELETE FROM person_events
+    WHERE person_id IN (SELECT person_id FROM affected)
+    AND NOT EXISTS (
+        SELECT 1 FROM fresh n
+        WHERE n.person_id = person_events.person_id
+        AND n.event_type IS person_events.event_type
+        AND n.event_date IS person_events.event_date
+        AND n.description IS person_events.description
+        AND n.source_file IS person_events.source_file
+    )
+""")
+removed = c.rowcount
+# The unique index treats NULLs as distinct (no description / date), so
+# it cannot stop those repeats: compare with IS, and clear old repeats
+c.execute("""
+    DELETE FROM person_events
+    WHERE person_id IN (SELECT person_id FROM affected)
+    AND id NOT IN (
+        SELECT MIN(id) FROM person_events
+        WHERE person_id IN (SELECT person_id FROM affected)
+        GROUP BY person_id, event_type, event_date, description, source_file
+    )
+""")
+removed += c.rowcount
+c.execute("""
+    INSERT INTO person_events (person_id, event_type, event_date, description, source_file)
+    SELECT person_id, event_type, event_date, description, source_file FROM fresh n
+    WHERE NOT EXISTS (
+        SELECT 1 FROM person_events p
+        WHERE p.person_id = n.person_id
+        AND p.event_type IS n.event_type
+        AND p.event_date IS n.event_date
+        AND p.description IS n.description
+        AND p.source_file IS n.source_file
+    )
+    ON CONFLICT DO NOTHING
+""")
+added = c.rowcount
 
+c.execute("""
+    INSERT INTO timeline_state (id, last_change, built_at) VALUES (1, ?, datetime('now'))
+    ON CONFLICT(id) DO UPDATE SET last_change=excluded.last_change, built_at=excluded.built_at
+""", (high_water,))
+c.execute("DELETE FROM timeline_changes WHERE id <= ?", (high_water,))
 conn.commit()
+refresh_keys(conn)  # new person_events rows
+
+log.info(f"Timelines updated for {n_affected} people: +{added} -{removed} events")
 conn.close()
 log.info("Timeline reconstruction completed.")
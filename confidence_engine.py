@@ -1,6 +1,50 @@
 #!/usr/bin/env python3
+"""
+OCR confidence scoring (the one scorer for every engine).
+- Raw engine confidence -> calibrated probability the text is right,
+  per engine family, from monotone curves fitted on reviewed samples
+- Built-in prior curves until an engine has enough reviews
+- Scalar API (evaluate) and NumPy batch API (score_batch)
+- Re-score ocr_results / ocr_pages from stored raw_confidence, no re-OCR
 
+Reviewed samples live in ocr_reviews (engine, raw_confidence, correct):
+    python confidence_engine.py import reviews.csv   # engine,raw_confidence,correct
+    python confidence_engine.py fit
+    python confidence_engine.py rescore [threshold]
+    python confidence_engine.py curves
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import sqlite3
+import logging
 from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from schema_guard import ensure_table
+
+BASE = Path.home() / "genealogy"
+DB_PATH = BASE / "db/family_tree.db"
+
+MIN_CONFIDENCE = float(os.environ.get("GENEALOGY_REVIEW_THRESHOLD", "0.55"))
+GOOD_CONFIDENCE = 0.75
+
+CURVE_KNOTS = np.linspace(0.0, 1.0, 21)  # calibration curve sampled here
+MIN_SAMPLES = 50                          # reviews needed before a fit replaces the prior
+RELOAD_SECONDS = 300                      # long-lived workers pick up new fits
+
+TEXT_ENGINES = {"text", "docx", "odt", "rtf", "pdf-text"}
+
+log = logging.getLogger("confidence_engine")
+
+_curves = None
+_loaded_at = 0.0
 
 # ============================================================
 # Data class for OCR results
@@ -11,15 +55,296 @@ class OCRResult:
     engine: str
     confidence: float
 
+# ============================================================
+# SCHEMA
+# ============================================================
+def ensure_schema(conn: sqlite3.Connection):
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS ocr_reviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_hash TEXT,
+            page_no INTEGER,
+            region_no INTEGER,
+            engine TEXT,
+            raw_confidence REAL,
+            correct INTEGER,
+            reviewed_at TEXT
+        )
+    """)
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS confidence_calibration (
+            family TEXT PRIMARY KEY,
+            curve TEXT,
+            samples INTEGER,
+            fitted_at TEXT
+        )
+    """)
+
+# ============================================================
+# CURVES
+# ============================================================
+def engine_family(engine: str) -> str:
+    """Engines sharing one calibration curve (all form templates, all text routes)."""
+    engine = (engine or "").lower()
+    if engine.startswith("form:"):
+        return "form"
+    if engine in TEXT_ENGINES:
+        return "text"
+    return engine
+
+
+def _prior(family: str, raw: np.ndarray) -> np.ndarray:
+    """Hand-set curves used until a family has MIN_SAMPLES reviews."""
+    if family in ("easyocr", "cascade", "form", "mixed"):
+        return raw
+    if family == "trocr":
+        return np.minimum(raw, 0.85)
+    if family == "text":
+        return (raw > 0).astype(np.float64)
+    return raw * 0.5
+
+
+def load_curves(conn: sqlite3.Connection = None, force=False) -> dict:
+    """Fitted curves {family: values at CURVE_KNOTS}, cached per process."""
+    global _curves, _loaded_at
+    if _curves is not None and not force and time.time() - _loaded_at < RELOAD_SECONDS:
+        return _curves
+
+    own = conn is None
+    try:
+        conn = conn or sqlite3.connect(DB_PATH, timeout=30)
+        ensure_schema(conn)
+        rows = conn.execute("SELECT family, curve FROM confidence_calibration").fetchall()
+        if own:
+            conn.close()
+    except sqlite3.Error as e:
+        log.warning(f"Calibration curves unavailable, using priors: {e}")
+        rows = []
+
+    _curves = {family: np.array(json.loads(curve)) for family, curve in rows}
+    _loaded_at = time.time()
+    return _curves
+
+# ============================================================
+# SCORING
+# ============================================================
+def score_batch(engines, raw, curves=None) -> np.ndarray:
+    """
+    Calibrated confidence for many results at once.
+    engines: sequence of engine names, raw: matching raw confidences.
+    """
+    raw = np.clip(np.asarray(raw, dtype=np.float64), 0.0, 1.0)
+    out = np.empty_like(raw)
+    if raw.size == 0:
+        return out
+    curves = load_curves() if curves is None else curves
+
+    names, inverse = np.unique(np.asarray(engines, dtype=str), return_inverse=True)
+    for i, name in enumerate(names):
+        mask = inverse == i
+        family = engine_family(name)
+        if family in curves:
+            out[mask] = np.interp(raw[mask], CURVE_KNOTS, curves[family])
+        else:
+            out[mask] = _prior(family, raw[mask])
+    return out
+
+
+def normalize(engine: str, confidence: float) -> float:
+    return float(score_batch([engine], [confidence])[0])
+
+
+def quality(confidence: float) -> str:
+    return (
+        "good" if confidence >= GOOD_CONFIDENCE
+        else "ok" if confidence >= MIN_CONFIDENCE
+        else "poor"
+    )
+
 # ============================================================
 # Evaluation logic
 # ============================================================
-def evaluate(result: OCRResult) -> dict:
+def evaluate(result: OCRResult, threshold: float = MIN_CONFIDENCE) -> dict:
+    """
+    Calibrate one result and mark it needs_review below threshold.
+    raw_confidence is kept so the result can be re-scored later.
+    """
+    confidence = normalize(result.engine, result.confidence)
+    return {
+        "confidence": confidence,
+        "raw_confidence": float(result.confidence),
+        "needs_review": confidence < threshold,
+        "quality": quality(confidence)
+    }
+
+# ============================================================
+# CALIBRATION (FIT FROM REVIEWED SAMPLES)
+# ============================================================
+def fit_curve(raw, correct) -> np.ndarray:
     """
-    Simple evaluator: marks low-confidence OCR as needs_review.
+    Isotonic (pool adjacent violators) fit of correct ~ raw,
+    sampled at CURVE_KNOTS.
     """
-    threshold = 0.55
-    needs_review = result.confidence < threshold
-    # Optionally, boost confidence for TrOCR or EasyOCR heuristics here
-    confidence = min(result.confidence + 0.1, 1.0) if not needs_review else result.confidence
-    return {"confidence": confidence, "needs_review": needs_review}
+    # Equal raw scores pooled first: knots need distinct x for interp
+    xs, inverse, counts = np.unique(
+        np.asarray(raw, dtype=np.float64), return_inverse=True, return_counts=True
+    )
+    ys = np.bincount(inverse, weights=np.asarray(correct, dtype=np.float64)) / counts
+
+    # Blocks: [mean x, mean y, weight]; merge while y decreases
+    blocks = []
+    for x, y, n in zip(xs, ys, counts):
+        blocks.append([x, y, float(n)])
+        while len(blocks) > 1 and blocks[-2][1] > blocks[-1][1]:
+            x2, y2, w2 = blocks.pop()
+            x1, y1, w1 = blocks[-1]
+            w = w1 + w2
+            blocks[-1] = [(x1 * w1 + x2 * w2) / w, (y1 * w1 + y2 * w2) / w, w]
+
+    bx = np.array([b[0] for b in blocks])
+    by = np.array([b[1] for b in blocks])
+    return np.interp(CURVE_KNOTS, bx, by)
+
+
+def record_review(conn: sqlite3.Connection, engine: str, raw_confidence: float, correct: bool,
+                  file_hash=None, page_no=None, region_no=None):
+    ensure_schema(conn)
+    conn.execute(
+        """
+        INSERT INTO ocr_reviews
+        (file_hash, page_no, region_no, engine, raw_confidence, correct, reviewed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (file_hash, page_no, region_no, engine, raw_confidence, int(bool(correct)),
+         datetime.utcnow().isoformat())
+    )
+    conn.commit()
+
+
+def fit(conn: sqlite3.Connection, min_samples: int = MIN_SAMPLES) -> dict:
+    """Fit one curve per engine family with enough reviews. Returns {family: samples}."""
+    ensure_schema(conn)
+    rows = conn.execute(
+        "SELECT engine, raw_confidence, correct FROM ocr_reviews "
+        "WHERE raw_confidence IS NOT NULL AND correct IS NOT NULL"
+    ).fetchall()
+
+    samples = {}
+    for engine, raw, correct in rows:
+        xs, ys = samples.setdefault(engine_family(engine), ([], []))
+        xs.append(raw)
+        ys.append(correct)
+
+    fitted = {}
+    now = datetime.utcnow().isoformat()
+    for family, (raw, correct) in samples.items():
+        if len(raw) < min_samples:
+            log.info(f"{family}: {len(raw)} reviews, keeping prior curve")
+            continue
+        curve = fit_curve(raw, correct)
+        conn.execute(
+            """
+            INSERT INTO confidence_calibration (family, curve, samples, fitted_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(family) DO UPDATE SET
+                curve=excluded.curve,
+                samples=excluded.samples,
+                fitted_at=excluded.fitted_at
+            """,
+            (family, json.dumps([round(float(v), 4) for v in curve]), len(raw), now)
+        )
+        fitted[family] = len(raw)
+    conn.commit()
+    load_curves(conn, force=True)
+    return fitted
+
+# ============================================================
+# RE-SCORE STORED RESULTS (NO RE-OCR)
+# ============================================================
+def rescore(conn: sqlite3.Connection, threshold: float = MIN_CONFIDENCE) -> dict:
+    """
+    Recompute confidence / needs_review for every stored result from its
+    raw_confidence in one vectorized pass per table. Rows written before
+    raw_confidence existed use their stored confidence as the raw value.
+    Returns {table: rows changed}.
+    """
+    from ocr_store import ensure_store
+    ensure_store(conn)
+    curves = load_curves(conn, force=True)
+
+    changed = {}
+    for table in ("ocr_results", "ocr_pages"):
+        conn.execute(
+            f"UPDATE {table} SET raw_confidence=confidence "
+            f"WHERE raw_confidence IS NULL AND confidence IS NOT NULL"
+        )
+        rows = conn.execute(
+            f"SELECT id, engine, raw_confidence, confidence, needs_review FROM {table} "
+            f"WHERE raw_confidence IS NOT NULL"
+        ).fetchall()
+        if not rows:
+            changed[table] = 0
+            continue
+
+        ids, engines, raw, old_conf, old_review = zip(*rows)
+        conf = score_batch([e or "" for e in engines], raw, curves)
+        review = conf < threshold
+        old_conf = np.array([np.nan if c is None else c for c in old_conf], dtype=np.float64)
+        old_review = np.array([-1 if r is None else r for r in old_review])
+
+        diff = ~np.isclose(conf, old_conf) | (review.astype(int) != old_review)
+        idx = np.flatnonzero(diff)
+        conn.executemany(
+            f"UPDATE {table} SET confidence=?, needs_review=? WHERE id=?",
+            [(float(conf[i]), int(review[i]), ids[i]) for i in idx]
+        )
+        changed[table] = len(idx)
+    conn.commit()
+    return changed
+
+# ============================================================
+# CLI
+# ============================================================
+def main(argv):
+    conn = sqlite3.connect(DB_PATH)
+    ensure_schema(conn)
+
+    if len(argv) >= 2 and argv[0] == "import":
+        with open(argv[1], newline="") as f:
+            rows = [
+                (r["engine"], float(r["raw_confidence"]),
+                 int(r["correct"] in ("1", "true", "True", "yes")),
+                 datetime.utcnow().isoformat())
+                for r in csv.DictReader(f)
+            ]
+        conn.executemany(
+            "INSERT INTO ocr_reviews (engine, raw_confidence, correct, reviewed_at) "
+            "VALUES (?, ?, ?, ?)",
+            rows
+        )
+        conn.commit()
+        print(f"Imported {len(rows)} reviews")
+    elif argv and argv[0] == "fit":
+        fitted = fit(conn)
+        print("Fitted: " + (", ".join(f"{k} ({n})" for k, n in fitted.items()) or "none"))
+    elif argv and argv[0] == "rescore":
+        threshold = float(argv[1]) if len(argv) > 1 else MIN_CONFIDENCE
+        for table, n in rescore(conn, threshold).items():
+            print(f"{table}: {n} rows re-scored")
+    elif argv and argv[0] == "curves":
+        for family, curve, samples, fitted_at in conn.execute(
+                "SELECT family, curve, samples, fitted_at FROM confidence_calibration"):
+            points = json.loads(curve)
+            print(f"{family:10} n={samples:<6} {fitted_at}  "
+                  f"0.3→{points[6]:.2f} 0.5→{points[10]:.2f} 0.8→{points[16]:.2f}")
+    else:
+        print(__doc__)
+        conn.close()
+        return 1
+
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Genealogical date normalization.
+- Exact and partial dates: 1850-06-12, 1850/06/12, 12 Jun 1850,
+  Jun 12, 1850, Mar 1902, 1887, 6/12/1850 (day first, as before);
+  a time after an ISO date (1900-01-01 00:00:00) is ignored
+- Decades: 1890s
+- Qualifiers: abt / about / ca / c. / circa / est, bef / before, aft / after
+- Ranges: bet 1880 and 1885, bet 1880 & 1885, from 1880 to 1885, 1880-1885
+- Impossible dates (31 Feb 1850) are unparseable, not "abt 1850"
+Common shapes hit a compiled fast path; every result is memoized.
+
+Each date becomes integer keys (YYYYMMDD, unknown parts 00 in the sort
+key) written next to the text column, so timelines sort on integers and
+range queries ("alive in 1900") use an index:
+    <col>_sort       nominal date, for ordering
+    <col>_lo/_hi     earliest / latest day the date can mean
+    <col>_precision  day, month, year, decade, about, before, after,
+                     range, or none (unparseable)
+"""
+
+import re
+import sqlite3
+import calendar
+from dataclasses import dataclass
+from functools import lru_cache
+
+from schema_guard import ensure_column, ensure_table
+
+# Bump when parse() results change; keys of "about" / "none" rows (the
+# fallbacks a new rule can take over) are recomputed once
+PARSER_VERSION = 2
+
+ABOUT_YEARS = 2     # "abt 1887" spans 1885-1889
+OPEN_YEARS = 20     # "bef 1850" spans 1830-1850
+MIN_YEAR, MAX_YEAR = 1000, 2100
+
+# Date columns that get keys, per table (missing columns are skipped)
+DATE_COLUMNS = {
+    "person_events": ("event_date",),
+    "events": ("event_date", "start_date", "end_date"),
+    "people": ("birth_date", "death_date"),
+}
+# Extra indexes beyond <col>_sort: {table: [(column, key suffix)]}
+RANGE_INDEXES = {
+    "people": [("birth_date", "lo"), ("death_date", "hi")],
+}
+
+MONTHS = {
+    name: i
+    for i in range(1, 13)
+    for name in (calendar.month_name[i].lower(), calendar.month_abbr[i].lower())
+}
+MONTHS["sept"] = 9
+
+QUALIFIERS = {
+    "abt": "about", "about": "about", "ca": "about", "c": "about", "circa": "about",
+    "approx": "about", "est": "about", "estimated": "about",
+    "bef": "before", "before": "before",
+    "aft": "after", "after": "after",
+}
+QUALIFIER_TEXT = {"about": "abt", "before": "bef", "after": "aft"}
+
+
+@dataclass(frozen=True)
+class GenDate:
+    text: str        # canonical form, e.g. "abt 1887", "1902-03", "bet 1880 and 1885"
+    sort: int
+    lo: int
+    hi: int
+    precision: str
+
+# ============================================================
+# FAST PATH (COMPILED)
+# ============================================================
+_YEAR = re.compile(r"^(\d{4})$")
+_ISO = re.compile(
+    r"^(\d{4})[-/](\d{1,2})(?:[-/](\d{1,2}))?"
+    r"(?:[t ]\d{1,2}:\d{2}(?::\d{2}(?:\.\d+)?)?z?)?$"     # time part, ignored
+)
+_DMY_NUM = re.compile(r"^(\d{1,2})[/.](\d{1,2})[/.](\d{4})$")
+_D_MON_Y = re.compile(r"^(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?([a-z]+)\.?,?\s+(\d{4})$")
+_MON_D_Y = re.compile(r"^([a-z]+)\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})$")
+_MON_Y = re.compile(r"^([a-z]+)\.?,?\s+(\d{4})$")
+_DECADE = re.compile(r"^(\d{3})0'?s$")
+
+_RANGE = re.compile(r"^(?:bet(?:ween)?\.?|from)\s+(.+?)\s+(?:and|&|to|-)\s+(.+)$")
+_DASH_RANGE = re.compile(r"^(.+?)\s*(?:-|–|to)\s*(.+)$")
+_QUAL_GLUED = re.compile(r"^(abt|bef|aft|ca|c|est)\.?\s*(?=\d)")
+_ANY_YEAR = re.compile(r"(?<!\d)(1\d{3}|20\d{2})(?!\d)")
+
+
+def _key(y, m=0, d=0) -> int:
+    return y * 10000 + m * 100 + d
+
+
+def _exact(y, m=0, d=0):
+    """(y, m, d, precision) if valid, else None."""
+    if not MIN_YEAR <= y <= MAX_YEAR:
+        return None
+    if m and not 1 <= m <= 12:
+        return None
+    if d and not (m and 1 <= d <= calendar.monthrange(y, m)[1]):
+        return None
+    return y, m, d, "day" if d else "month" if m else "year"
+
+
+def _simple(s: str):
+    """A single (unqualified) date: (y, m, d, precision) or None."""
+    if m := _YEAR.match(s):
+        return _exact(int(m[1]))
+    if m := _ISO.match(s):
+        return _exact(int(m[1]), int(m[2]), int(m[3] or 0))
+    if m := _D_MON_Y.match(s):
+        month = MONTHS.get(m[2])
+        return _exact(int(m[3]), month, int(m[1])) if month else None
+    if m := _MON_D_Y.match(s):
+        month = MONTHS.get(m[1])
+        return _exact(int(m[3]), month, int(m[2])) if month else None
+    if m := _MON_Y.match(s):
+        month = MONTHS.get(m[1])
+        return _exact(int(m[2]), month) if month else None
+    if m := _DMY_NUM.match(s):
+        a, b, y = int(m[1]), int(m[2]), int(m[3])
+        return _exact(y, a, b) if a <= 12 < b else _exact(y, b, a)
+    if m := _DECADE.match(s):
+        y = int(m[1]) * 10
+        return (y, 0, 0, "decade") if MIN_YEAR <= y <= MAX_YEAR else None
+    return None
+
+
+def _invalid(s: str) -> bool:
+    """s has the shape of a full date but _simple() rejected it (e.g. 31 Feb)."""
+    if _ISO.match(s) or _DMY_NUM.match(s):
+        return True
+    m = _D_MON_Y.match(s)
+    if m and m[2] in MONTHS:
+        return True
+    m = _MON_D_Y.match(s)
+    return bool(m and m[1] in MONTHS)
+
+
+def _span(date):
+    """(text, sort, lo, hi) of a simple date."""
+    y, m, d, precision = date
+    if precision == "decade":
+        return f"{y}s", _key(y), _key(y, 1, 1), _key(y + 9, 12, 31)
+    text = f"{y}" + (f"-{m:02d}" if m else "") + (f"-{d:02d}" if d else "")
+    last_m = m or 12
+    last_d = d or calendar.monthrange(y, last_m)[1]
+    return text, _key(y, m, d), _key(y, m or 1, d or 1), _key(y, last_m, last_d)
+
+# ============================================================
+# PARSE
+# ============================================================
+@lru_cache(maxsize=65536)
+def parse(text: str):
+    """GenDate for a free-text date, or None."""
+    if not text:
+        return None
+    s = " ".join(str(text).lower().replace(",", ", ").split()).strip(" .")
+    s = _QUAL_GLUED.sub(r"\1 ", s)
+
+    date = _simple(s)
+    if date:
+        t, sort, lo, hi = _span(date)
+        return GenDate(t, sort, lo, hi, date[3])
+
+    # Qualified: abt / bef / aft <date>
+    head, _, rest = s.partition(" ")
+    qualifier = QUALIFIERS.get(head.rstrip("."))
+    if qualifier and (date := _simple(rest)):
+        t, sort, lo, hi = _span(date)
+        y = date[0]
+        if qualifier == "about":
+            lo = min(lo, _key(y - ABOUT_YEARS, 1, 1))
+            hi = max(hi, _key(y + ABOUT_YEARS, 12, 31))
+        elif qualifier == "before":
+            lo = _key(y - OPEN_YEARS, 1, 1)
+        else:
+            hi = _key(y + OPEN_YEARS, 12, 31)
+        return GenDate(f"{QUALIFIER_TEXT[qualifier]} {t}", sort, lo, hi, qualifier)
+
+    # Ranges
+    for pattern in (_RANGE, _DASH_RANGE):
+        m = pattern.match(s)
+        if m and (a := _simple(m[1].strip())) and (b := _simple(m[2].strip())):
+            ta, sort, lo, _ = _span(a)
+            tb, _, _, hi = _span(b)
+            if lo <= hi:
+                return GenDate(f"bet {ta} and {tb}", sort, lo, hi, "range")
+
+    # A wrong full date is not an approximate one
+    if _invalid(s) or (qualifier and _invalid(rest)):
+        return None
+
+    # Last resort: one plausible year somewhere in the text, read as "abt"
+    years = _ANY_YEAR.findall(s)
+    if len(years) == 1:
+        y = int(years[0])
+        return GenDate(f"abt {y}", _key(y), _key(y - ABOUT_YEARS, 1, 1),
+                       _key(y + ABOUT_YEARS, 12, 31), "about")
+    return None
+
+
+def normalize(text: str) -> str:
+    """Canonical date text ("" if unparseable)."""
+    date = parse(text)
+    return date.text if date else ""
+
+
+def date_key(text, part):
+    """SQLite function gen_date(text, part): part is sort / lo / hi / precision."""
+    date = parse(text) if text else None
+    if date is None:
+        return "none" if part == "precision" else None
+    return getattr(date, part)
+
+# ============================================================
+# DATABASE KEYS
+# ============================================================
+def register(conn: sqlite3.Connection):
+    conn.create_function("gen_date", 2, date_key, deterministic=True)
+
+
+def _columns(conn, table) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def ensure_date_keys(conn: sqlite3.Connection):
+    """Key columns, indexes and reset triggers for every DATE_COLUMNS entry."""
+    for table, columns in DATE_COLUMNS.items():
+        existing = _columns(conn, table)
+        for col in columns:
+            if col not in existing:
+                continue
+            for suffix in ("sort", "lo", "hi"):
+                ensure_column(conn, table, f"{col}_{suffix}", "INTEGER")
+            ensure_column(conn, table, f"{col}_precision", "TEXT")
+
+            lead = "person_id, " if "person_id" in existing else ""
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_{col}_sort "
+                f"ON {table}({lead}{col}_sort)"
+            )
+            # Rows still to key (keeps the per-cycle refresh O(new rows))
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_{col}_pending "
+                f"ON {table}({col}_precision) WHERE {col}_precision IS NULL"
+            )
+            # Editing the text re-queues the row
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{col}_rekey
+                AFTER UPDATE OF {col} ON {table}
+                BEGIN
+                    UPDATE {table} SET {col}_precision = NULL WHERE rowid = NEW.rowid;
+                END
+            """)
+        for col, suffix in RANGE_INDEXES.get(table, []):
+            if col in existing:
+                conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{table}_{col}_{suffix} "
+                    f"ON {table}({col}_{suffix})"
+                )
+    _requeue_fallbacks(conn)
+    conn.commit()
+
+
+def _requeue_fallbacks(conn: sqlite3.Connection):
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS date_parser_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER
+        )
+    """)
+    row = conn.execute("SELECT version FROM date_parser_state WHERE id=1").fetchone()
+    if row and row[0] >= PARSER_VERSION:
+        return
+    for table, columns in DATE_COLUMNS.items():
+        existing = _columns(conn, table)
+        for col in columns:
+            if f"{col}_precision" in existing:
+                conn.execute(
+                    f"UPDATE {table} SET {col}_precision = NULL "
+                    f"WHERE {col}_precision IN ('about', 'none')"
+                )
+    conn.execute(
+        "INSERT OR REPLACE INTO date_parser_state (id, version) VALUES (1, ?)",
+        (PARSER_VERSION,)
+    )
+
+
+def refresh_keys(conn: sqlite3.Connection) -> int:
+    """Fill keys for rows added or edited since the last refresh."""
+    register(conn)
+    updated = 0
+    for table, columns in DATE_COLUMNS.items():
+        existing = _columns(conn, table)
+        for col in columns:
+            if f"{col}_precision" not in existing:
+                continue
+            cur = conn.execute(f"""
+                UPDATE {table} SET
+                    {col}_sort = gen_date({col}, 'sort'),
+                    {col}_lo = gen_date({col}, 'lo'),
+                    {col}_hi = gen_date({col}, 'hi'),
+                    {col}_precision = gen_date({col}, 'precision')
+                WHERE {col}_precision IS NULL
+            """)
+            updated += cur.rowcount
+    conn.commit()
+    return updated
@@ -138,6 +138,10 @@ if not table_exists(c, "sources"):
     """)
     logging.info("Created table: sources")
 
+# BROWSING INDEXES (web_ui.py opens the database read-only)
+if column_exists(c, "people", "name"):
+    c.execute("CREATE INDEX IF NOT EXISTS idx_people_name ON people(name, id)")
+
 conn.commit()
 conn.close()
 logging.info("Database upgrade complete.")
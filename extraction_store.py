@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Extracted facts (LLM output) persistence.
+- Strict event / person schema: a record failing validation is dropped
+  on its own, never the whole document
+- Normalized tables extracted_events / extracted_people keyed by file
+  hash, replaced as a whole when a document is re-extracted
+- Dates normalized at extraction time, so timeline building is pure SQL
+"""
+
+import json
+import ast
+import sqlite3
+from datetime import datetime
+
+from date_parser import normalize as normalize_date
+from schema_guard import ensure_column, ensure_table
+
+EVENT_TYPES = {
+    "birth", "baptism", "marriage", "divorce", "death", "burial",
+    "residence", "census", "immigration", "emigration", "naturalization",
+    "military", "occupation", "education", "other"
+}
+EVENT_ALIASES = {
+    "born": "birth", "christening": "baptism", "christened": "baptism",
+    "married": "marriage", "wedding": "marriage", "died": "death",
+    "buried": "burial", "interment": "burial", "lived": "residence",
+    "immigrated": "immigration", "emigrated": "emigration",
+    "naturalized": "naturalization", "enlisted": "military", "service": "military"
+}
+SEXES = {"m": "M", "male": "M", "f": "F", "female": "F"}
+
+# ============================================================
+# SCHEMA
+# ============================================================
+def ensure_schema(conn: sqlite3.Connection):
+    ensure_column(conn, "ocr_results", "extracted_at", "TEXT")
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS extracted_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_hash TEXT,
+            seq INTEGER,
+            person TEXT,
+            event_type TEXT,
+            event_date TEXT,
+            date_text TEXT,
+            place TEXT,
+            description TEXT,
+            UNIQUE(file_hash, seq)
+        )
+    """)
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS extracted_people (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_hash TEXT,
+            seq INTEGER,
+            name TEXT,
+            sex TEXT,
+            birth_date TEXT,
+            death_date TEXT,
+            role TEXT,
+            UNIQUE(file_hash, seq)
+        )
+    """)
+
+# ============================================================
+# VALIDATION
+# ============================================================
+def _text(value) -> str:
+    """Schema string: str, number (years) or null. Anything else is invalid."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        raise ValueError("boolean where text expected")
+    if isinstance(value, (str, int, float)):
+        return str(value).strip()
+    raise ValueError(f"{type(value).__name__} where text expected")
+
+
+def clean_event(obj):
+    """Validated event dict, or None if obj does not fit the schema."""
+    if not isinstance(obj, dict):
+        return None
+    try:
+        kind = _text(obj.get("type")).lower()
+        date_text = _text(obj.get("date"))
+        event = {
+            "person": _text(obj.get("person")),
+            "event_type": kind,
+            "event_date": normalize_date(date_text),
+            "date_text": date_text,
+            "place": _text(obj.get("place")),
+            "description": _text(obj.get("description")),
+        }
+    except ValueError:
+        return None
+    if not kind:
+        return None
+    kind = EVENT_ALIASES.get(kind, kind)
+    event["event_type"] = kind if kind in EVENT_TYPES else "other"
+    if not (event["person"] or date_text or event["description"]):
+        return None
+    return event
+
+
+def clean_person(obj):
+    """Validated person dict, or None if obj does not fit the schema."""
+    if not isinstance(obj, dict):
+        return None
+    try:
+        person = {
+            "name": _text(obj.get("name")),
+            "sex": SEXES.get(_text(obj.get("sex")).lower(), ""),
+            "birth_date": normalize_date(_text(obj.get("birth_date"))),
+            "death_date": normalize_date(_text(obj.get("death_date"))),
+            "role": _text(obj.get("role")),
+        }
+    except ValueError:
+        return None
+    return person if person["name"] else None
+
+
+def clean_records(pairs) -> dict:
+    """
+    pairs: iterable of (kind, obj) from the LLM stream.
+    Returns {"events": [...], "people": [...], "dropped": n}.
+    """
+    out = {"events": [], "people": [], "dropped": 0}
+    for kind, obj in pairs:
+        clean = clean_event(obj) if kind == "events" else clean_person(obj) if kind == "people" else None
+        if clean is None:
+            out["dropped"] += 1
+        else:
+            out[kind].append(clean)
+    return out
+
+# ============================================================
+# STORE
+# ============================================================
+def store_extraction(conn: sqlite3.Connection, file_hash: str, records: dict):
+    """Replace a document's extracted rows. Caller commits."""
+    conn.execute("DELETE FROM extracted_events WHERE file_hash=?", (file_hash,))
+    conn.execute("DELETE FROM extracted_people WHERE file_hash=?", (file_hash,))
+    conn.executemany(
+        """
+        INSERT INTO extracted_events
+        (file_hash, seq, person, event_type, event_date, date_text, place, description)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (file_hash, seq, e["person"], e["event_type"], e["event_date"],
+             e["date_text"], e["place"], e["description"])
+            for seq, e in enumerate(records["events"])
+        ]
+    )
+    conn.executemany(
+        """
+        INSERT INTO extracted_people
+        (file_hash, seq, name, sex, birth_date, death_date, role)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (file_hash, seq, p["name"], p["sex"], p["birth_date"], p["death_date"], p["role"])
+            for seq, p in enumerate(records["people"])
+        ]
+    )
+    conn.execute(
+        "UPDATE ocr_results SET extracted_at=? WHERE file_hash=?",
+        (datetime.utcnow().isoformat(), file_hash)
+    )
+
+
+def migrate_legacy_events(conn: sqlite3.Connection) -> int:
+    """
+    Move old ocr_results.events text (JSON or Python literal lists) into
+    the normalized tables, once. literal_eval only, never eval.
+    """
+    ensure_schema(conn)
+    ensure_column(conn, "ocr_results", "events", "TEXT")
+    rows = conn.execute(
+        "SELECT file_hash, events FROM ocr_results "
+        "WHERE events IS NOT NULL AND extracted_at IS NULL"
+    ).fetchall()
+    for file_hash, raw in rows:
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            try:
+                data = ast.literal_eval(raw)
+            except (ValueError, SyntaxError):
+                data = []
+        if isinstance(data, dict):
+            data = data.get("events", [])
+        if not isinstance(data, list):
+            data = []
+        store_extraction(conn, file_hash, clean_records(("events", e) for e in data))
+    conn.commit()
+    return len(rows)
@@ -4,8 +4,10 @@ Face clustering for genealogy images.
 
 - Reads images from incoming/processed folders
 - Extracts face embeddings
-- Groups similar faces with DBSCAN
-- Stores in face_embeddings table
+- Groups similar faces with DBSCAN, new faces together with stored ones
+- Stores in face_embeddings table, with a cluster_id that stays stable
+  across runs (a new photo of a known face joins its existing cluster);
+  identity_resolver.py uses shared clusters as a matching signal
 - Does not overwrite existing embeddings
 """
 
@@ -18,6 +20,8 @@ import base64
 import traceback
 import logging
 
+from schema_guard import ensure_column
+
 # -----------------------------
 # Paths
 # -----------------------------
@@ -54,8 +58,9 @@ CREATE TABLE IF NOT EXISTS face_embeddings (
 )
 """)
 conn.commit()
-
-logging.info("Starting face clustering...")
+ensure_column(conn, "face_embeddings", "cluster_id", "INTEGER")
+c.execute("CREATE INDEX IF NOT EXISTS idx_face_embeddings_cluster ON face_embeddings(cluster_id)")
+conn.commit()
 
 # -----------------------------
 # Load already-processed face files
@@ -105,7 +110,14 @@ if not encodings:
     conn.close()
     exit(0)
 
-X = np.array(encodings)
+# -----------------------------
+# Stored faces, clustered again with the new ones
+# -----------------------------
+c.execute("SELECT id, face_encoding, cluster_id FROM face_embeddings WHERE face_encoding IS NOT NULL")
+stored = c.fetchall()
+known = [np.frombuffer(base64.b64decode(enc), dtype=np.float64) for _, enc, _ in stored]
+
+X = np.array(known + encodings)
 
 # -----------------------------
 # Cluster faces
@@ -119,10 +131,39 @@ clustering = DBSCAN(
 labels = clustering.labels_
 logging.info(f"Found {len(set(labels)) - (1 if -1 in labels else 0)} clusters")
 
+# -----------------------------
+# DBSCAN label -> stable cluster_id
+# -----------------------------
+# A label keeps the smallest cluster_id already stored under it; labels
+# made only of new faces get fresh ids after the largest one in use
+cluster_ids = {}
+for label, (_, _, cid) in zip(labels, stored):
+    if label != -1 and cid is not None:
+        cluster_ids[label] = min(cluster_ids.get(label, cid), cid)
+next_id = max((cid for _, _, cid in stored if cid is not None), default=-1) + 1
+
+
+def cluster_id_for(label):
+    global next_id
+    if label not in cluster_ids:
+        cluster_ids[label] = next_id
+        next_id += 1
+    return cluster_ids[label]
+
+
+# Stored faces without an id yet (from before cluster ids were kept), and
+# stored faces whose old cluster was merged into one with a smaller id
+backfill = [
+    (cluster_id_for(label), fid)
+    for label, (fid, _, cid) in zip(labels, stored)
+    if label != -1 and cid != cluster_id_for(label)
+]
+c.executemany("UPDATE face_embeddings SET cluster_id=? WHERE id=?", backfill)
+
 # -----------------------------
 # Store results
 # -----------------------------
-for label, encoding, path in zip(labels, encodings, paths):
+for label, encoding, path in zip(labels[len(stored):], encodings, paths):
     if label == -1:
         continue  # noise / unknown
 
@@ -130,9 +171,9 @@ for label, encoding, path in zip(labels, encodings, paths):
 
     try:
         c.execute("""
-            INSERT INTO face_embeddings (person_id, file_path, face_encoding)
-            VALUES (?, ?, ?)
-        """, (None, path, encoded))
+            INSERT INTO face_embeddings (person_id, file_path, face_encoding, cluster_id)
+            VALUES (?, ?, ?, ?)
+        """, (None, path, encoded, cluster_id_for(label)))
     except Exception as e:
         logging.error(f"Failed to insert {path}: {e}")
         traceback.print_exc()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+File-type router (magic bytes, not extensions).
+Decides the cheapest extractor for each file in front of ocr_engine:
+
+    route        extractor                      OCR?
+    text         plain read                     no
+    docx / odt   zip + XML text runs            no
+    rtf          control words stripped         no
+    pdf          page_source (text layer first) only scanned pages
+    tiff-multi   page_source frames             yes
+    image        preprocess + EasyOCR           yes
+    unsupported  nothing (flagged for review)   no
+
+The route is what lands in ocr_results.engine for non-OCR files.
+"""
+
+import re
+import zipfile
+import logging
+from pathlib import Path
+import xml.etree.ElementTree as ET
+
+log = logging.getLogger("file_router")
+
+SNIFF_BYTES = 4096
+
+IMAGE_ROUTES = {"image"}
+PAGED_ROUTES = {"pdf", "tiff-multi"}
+TEXT_ROUTES = {"text", "docx", "odt", "rtf"}
+
+_IMAGE_MAGIC = (
+    b"\x89PNG\r\n\x1a\n",
+    b"\xff\xd8\xff",        # JPEG
+    b"BM",                  # BMP
+    b"GIF87a",
+    b"GIF89a",
+)
+_TIFF_MAGIC = (b"II*\x00", b"MM\x00*")
+
+# ============================================================
+# CLASSIFY
+# ============================================================
+def classify(path: Path) -> str:
+    path = Path(path)
+    try:
+        with open(path, "rb") as f:
+            head = f.read(SNIFF_BYTES)
+    except OSError:
+        return "unsupported"
+
+    if head.startswith(b"%PDF"):
+        return "pdf"
+    if head.startswith(_TIFF_MAGIC):
+        return "tiff-multi" if _tiff_frames(path) > 1 else "image"
+    if head.startswith(_IMAGE_MAGIC) or (head[:4] == b"RIFF" and head[8:12] == b"WEBP"):
+        return "image"
+    if head.startswith(b"PK\x03\x04"):
+        return _classify_zip(path)
+    if head.startswith(b"{\\rtf"):
+        return "rtf"
+    if _looks_like_text(head):
+        return "text"
+    return "unsupported"
+
+
+def _tiff_frames(path: Path) -> int:
+    try:
+        from PIL import Image
+        with Image.open(path) as img:
+            return getattr(img, "n_frames", 1)
+    except Exception:
+        return 1
+
+
+def _classify_zip(path: Path) -> str:
+    try:
+        with zipfile.ZipFile(path) as z:
+            names = set(z.namelist())
+            if "word/document.xml" in names:
+                return "docx"
+            if "mimetype" in names and z.read("mimetype").startswith(
+                    b"application/vnd.oasis.opendocument.text"):
+                return "odt"
+    except (zipfile.BadZipFile, OSError, KeyError):
+        pass
+    return "unsupported"
+
+
+def _looks_like_text(head: bytes) -> bool:
+    if not head:
+        return True  # empty file: text route, stored as empty + needs review
+    if b"\x00" in head:
+        return False
+    try:
+        head.decode("utf-8")
+        return True
+    except UnicodeDecodeError as e:
+        # Cut mid-character at the sniff boundary is still text
+        if e.start >= len(head) - 3:
+            return True
+    # Latin-1 / cp1252 typed transcripts: mostly printable bytes
+    printable = sum(1 for b in head if b in (9, 10, 13) or 32 <= b < 127 or b >= 160)
+    return printable / len(head) > 0.95
+
+# ============================================================
+# EXTRACT (NO OCR)
+# ============================================================
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_TEXT_NS = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}"
+
+
+def extract_text(path: Path, route: str) -> str:
+    """Text for the no-OCR routes."""
+    try:
+        if route == "docx":
+            return _docx_text(path)
+        if route == "odt":
+            return _odt_text(path)
+        if route == "rtf":
+            return _rtf_text(Path(path).read_text(errors="ignore"))
+        if route == "text":
+            return Path(path).read_text(errors="ignore")
+    except Exception as e:
+        log.warning(f"{route} extraction failed for {Path(path).name}: {e}")
+    return ""
+
+
+def _docx_text(path: Path) -> str:
+    with zipfile.ZipFile(path) as z:
+        root = ET.fromstring(z.read("word/document.xml"))
+    lines = []
+    for para in root.iter(f"{_W}p"):
+        parts = []
+        for node in para.iter():
+            if node.tag == f"{_W}t" and node.text:
+                parts.append(node.text)
+            elif node.tag == f"{_W}tab":
+                parts.append("\t")
+        lines.append("".join(parts))
+    return "\n".join(lines)
+
+
+def _odt_text(path: Path) -> str:
+    with zipfile.ZipFile(path) as z:
+        root = ET.fromstring(z.read("content.xml"))
+    lines = []
+    for node in root.iter():
+        if node.tag in (f"{_TEXT_NS}p", f"{_TEXT_NS}h"):
+            lines.append("".join(node.itertext()))
+    return "\n".join(lines)
+
+
+_RTF_GROUPS = re.compile(r"\{\\(?:fonttbl|colortbl|stylesheet|info|\*)[^{}]*(?:\{[^{}]*\}[^{}]*)*\}")
+_RTF_PAR = re.compile(r"\\(?:par|line)\b ?")
+_RTF_HEX = re.compile(r"\\'([0-9a-fA-F]{2})")
+_RTF_CONTROL = re.compile(r"\\[a-zA-Z]+-?\d* ?|[{}]")
+
+
+def _rtf_text(raw: str) -> str:
+    text = _RTF_GROUPS.sub("", raw)
+    text = _RTF_PAR.sub("\n", text)
+    text = _RTF_HEX.sub(lambda m: bytes.fromhex(m.group(1)).decode("cp1252", "ignore"), text)
+    text = _RTF_CONTROL.sub("", text)
+    return text.strip()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Form templates (pedigree charts, family group sheets).
+- Fingerprint a page layout from its ruled lines + ink density
+- Match against stored templates (correlation, aspect ratio guard)
+- OCR only the known field regions, as one batched EasyOCR call
+- Output structured fields instead of a text blob
+
+Register a template from a blank or filled sample page:
+    python form_templates.py add "Family Group Sheet" sample.png fields.json
+    python form_templates.py list
+
+fields.json holds boxes as fractions of the page (0-1):
+    [{"field": "name",  "box": [0.10, 0.12, 0.60, 0.16]},
+     {"field": "born",  "box": [0.10, 0.18, 0.40, 0.22]}, ...]
+"""
+
+import sys
+import json
+import time
+import sqlite3
+import logging
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from schema_guard import ensure_table
+
+BASE = Path.home() / "genealogy"
+DB_PATH = BASE / "db/family_tree.db"
+
+FP_W, FP_H = 32, 40         # fingerprint grid
+FP_SIDE = 1000              # page is shrunk to this long side first
+MATCH_THRESHOLD = 0.80      # correlation needed to call it the same form
+ASPECT_TOLERANCE = 0.10
+FIELD_MARGIN = 0.005        # box padding (fraction of page) for misregistration
+RELOAD_SECONDS = 300        # long-lived workers pick up new templates
+
+log = logging.getLogger("form_templates")
+
+_templates = None
+_loaded_at = 0.0
+
+# ============================================================
+# SCHEMA
+# ============================================================
+def ensure_schema(conn: sqlite3.Connection):
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS form_templates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE,
+            aspect REAL,
+            fingerprint BLOB,
+            fields TEXT,
+            created_at TEXT
+        )
+    """)
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS form_fields (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_hash TEXT,
+            page_no INTEGER DEFAULT 1,
+            template_id INTEGER,
+            field TEXT,
+            value TEXT,
+            confidence REAL,
+            UNIQUE(file_hash, page_no, field),
+            FOREIGN KEY(template_id) REFERENCES form_templates(id)
+        )
+    """)
+
+# ============================================================
+# FINGERPRINT
+# ============================================================
+def fingerprint(np_img: np.ndarray) -> np.ndarray:
+    """
+    Layout vector: ruled-line mask + ink density on a coarse grid,
+    zero-mean / unit-length so a dot product is a correlation.
+    """
+    h, w = np_img.shape
+    scale = min(1.0, FP_SIDE / max(h, w))
+    if scale < 1.0:
+        np_img = cv2.resize(np_img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    h, w = np_img.shape
+
+    ink = ((np_img < 128) * 255).astype(np.uint8)
+    horiz = cv2.morphologyEx(ink, cv2.MORPH_OPEN,
+                             cv2.getStructuringElement(cv2.MORPH_RECT, (max(10, w // 25), 1)))
+    vert = cv2.morphologyEx(ink, cv2.MORPH_OPEN,
+                            cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(10, h // 25))))
+
+    lines = cv2.resize(horiz | vert, (FP_W, FP_H), interpolation=cv2.INTER_AREA)
+    density = cv2.resize(ink, (FP_W, FP_H), interpolation=cv2.INTER_AREA)
+
+    vec = np.concatenate([lines.ravel() * 2.0, density.ravel()]).astype(np.float32)
+    vec -= vec.mean()
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+# ============================================================
+# TEMPLATE STORE
+# ============================================================
+def load_templates(conn: sqlite3.Connection = None, force=False):
+    """Templates cached per process; reloaded every RELOAD_SECONDS."""
+    global _templates, _loaded_at
+    if _templates is not None and not force and time.time() - _loaded_at < RELOAD_SECONDS:
+        return _templates
+
+    own = conn is None
+    conn = conn or sqlite3.connect(DB_PATH, timeout=30)
+    try:
+        ensure_schema(conn)
+        rows = conn.execute(
+            "SELECT id, name, aspect, fingerprint, fields FROM form_templates"
+        ).fetchall()
+    finally:
+        if own:
+            conn.close()
+
+    _templates = [
+        {
+            "id": tid,
+            "name": name,
+            "aspect": aspect,
+            "fingerprint": np.frombuffer(fp, dtype=np.float32),
+            "fields": json.loads(fields),
+        }
+        for tid, name, aspect, fp, fields in rows
+    ]
+    _loaded_at = time.time()
+    return _templates
+
+
+def add_template(conn: sqlite3.Connection, name: str, np_img: np.ndarray, fields: list):
+    ensure_schema(conn)
+    h, w = np_img.shape
+    conn.execute(
+        """
+        INSERT INTO form_templates (name, aspect, fingerprint, fields, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET
+            aspect=excluded.aspect,
+            fingerprint=excluded.fingerprint,
+            fields=excluded.fields
+        """,
+        (name, w / h, fingerprint(np_img).tobytes(), json.dumps(fields),
+         datetime.utcnow().isoformat())
+    )
+    conn.commit()
+    load_templates(conn, force=True)
+
+# ============================================================
+# MATCH + FIELD OCR
+# ============================================================
+def match(np_img: np.ndarray, templates=None):
+    """Best matching template and its score, or (None, score)."""
+    templates = load_templates() if templates is None else templates
+    if not templates:
+        return None, 0.0
+
+    h, w = np_img.shape
+    aspect = w / h
+    fp = fingerprint(np_img)
+
+    best, best_score = None, 0.0
+    for t in templates:
+        if abs(t["aspect"] - aspect) > ASPECT_TOLERANCE * t["aspect"]:
+            continue
+        score = float(np.dot(fp, t["fingerprint"]))
+        if score > best_score:
+            best, best_score = t, score
+
+    if best_score < MATCH_THRESHOLD:
+        return None, best_score
+    return best, best_score
+
+
+def field_boxes(template, shape):
+    """Relative field boxes -> EasyOCR horizontal_list [x_min, x_max, y_min, y_max]."""
+    h, w = shape
+    boxes = []
+    for f in template["fields"]:
+        x0, y0, x1, y1 = f["box"]
+        boxes.append([
+            max(0, int((x0 - FIELD_MARGIN) * w)), min(w, int((x1 + FIELD_MARGIN) * w)),
+            max(0, int((y0 - FIELD_MARGIN) * h)), min(h, int((y1 + FIELD_MARGIN) * h)),
+        ])
+    return boxes
+
+
+def ocr_fields(reader, np_img: np.ndarray, template) -> dict:
+    """
+    Recognize every field region in one batched EasyOCR pass (no detection).
+    Returns {field: (value, confidence)}.
+    """
+    boxes = field_boxes(template, np_img.shape)
+    if not boxes:
+        return {}
+    results = reader.recognize(
+        np_img, horizontal_list=boxes, free_list=[],
+        batch_size=len(boxes), detail=1
+    )
+
+    # One result per box, in box order (corners can coincide or be adjusted)
+    names = [f["field"] for f in template["fields"]]
+    if len(results) != len(boxes):
+        log.warning(f"Form '{template['name']}': {len(results)} results for {len(boxes)} fields")
+        return {name: ("", 0.0) for name in names}
+    return {
+        name: (text.strip(), float(conf))
+        for name, (_, text, conf) in zip(names, results)
+    }
+
+
+def store_fields(conn: sqlite3.Connection, file_hash: str, template_id: int, fields: dict, page_no=1):
+    ensure_schema(conn)
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO form_fields
+        (file_hash, page_no, template_id, field, value, confidence)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        [(file_hash, page_no, template_id, name, value, conf)
+         for name, (value, conf) in fields.items()]
+    )
+
+# ============================================================
+# CLI
+# ============================================================
+def main(argv):
+    conn = sqlite3.connect(DB_PATH)
+    ensure_schema(conn)
+
+    if len(argv) >= 4 and argv[0] == "add":
+        from preprocess import preprocess_array
+        name, sample, fields_json = argv[1], Path(argv[2]), Path(argv[3])
+        np_img, _ = preprocess_array(sample)
+        fields = json.loads(fields_json.read_text())
+        add_template(conn, name, np_img, fields)
+        print(f"Template '{name}' saved with {len(fields)} fields")
+    elif argv and argv[0] == "list":
+        for tid, name, fields in conn.execute("SELECT id, name, fields FROM form_templates"):
+            print(f"{tid:3} {name}: {', '.join(f['field'] for f in json.loads(fields))}")
+    else:
+        print(__doc__)
+        conn.close()
+        return 1
+
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+OCR-error-tolerant search over ocr_results (alongside search_index.py).
+- Words are folded before indexing: lower case, accents stripped, digits
+  OCR puts for letters read back as letters (E1izabeth -> elizabeth), so
+  many misreads collapse onto one vocabulary entry
+- Letter pairs OCR merges or splits (rn / m, vv / w, cl / d, ii / u) are
+  tried as query variants rather than folded, so the index stays lossless
+- Compact vocabulary (fuzzy_vocab): one row per folded word, with its
+  Soundex code and the number of documents containing it
+- Trigram index over the vocabulary (fuzzy_grams) and Soundex index give
+  candidate words for a query word; an edit-distance check (optimal
+  string alignment, bounded by word length) keeps the close ones
+- Inverted index word -> documents (fuzzy_postings); query words expand
+  to their candidates and documents rank by idf-weighted similarity
+- Incremental: triggers on ocr_results queue changed documents in
+  fuzzy_changes; update() indexes only those
+
+Usage:
+    python fuzzy_search.py                 index new / changed OCR text
+    python fuzzy_search.py "Eliznbeth Weber"
+"""
+
+import re
+import sys
+import math
+import sqlite3
+import logging
+import unicodedata
+from collections import defaultdict
+from pathlib import Path
+
+from identity_resolver import soundex
+from schema_guard import ensure_table
+
+BASE = Path.home() / "genealogy"
+DB_PATH = BASE / "db/family_tree.db"
+
+log = logging.getLogger("fuzzy_search")
+
+BATCH = 200             # documents per transaction when indexing
+MIN_WORD = 2            # shorter tokens are not indexed
+MIN_SIMILARITY = 0.6    # candidate words below this are dropped
+PHONETIC_BONUS = 0.1    # same Soundex code as the query word
+MAX_EXPANSIONS = 50     # candidate words kept per query word
+
+# Single characters OCR puts in place of letters; other digits dropped
+CHAR_FIXES = str.maketrans({
+    "0": "o", "1": "l", "|": "l", "!": "l", "5": "s", "8": "b", "6": "b",
+    **{d: None for d in "23479"}
+})
+# Letter pairs OCR reads as one letter, and the reverse: query variants
+PAIR_FIXES = (("rn", "m"), ("vv", "w"), ("cl", "d"), ("ii", "u"))
+VARIANT_PENALTY = 0.95
+_WORD = re.compile(r"[0-9|!]*[a-z][a-z0-9|!]*")     # at least one letter
+
+# ============================================================
+# FOLDING
+# ============================================================
+def _ascii_lower(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode().lower()
+
+
+def fold(word: str) -> str:
+    return "".join(_WORD.findall(_ascii_lower(word))).translate(CHAR_FIXES)
+
+
+def variants(word: str) -> set:
+    """The word with each OCR pair confusion applied one way or the other."""
+    out = set()
+    for pair, single in PAIR_FIXES:
+        for a, b in ((pair, single), (single, pair)):
+            if a in word:
+                out.add(word.replace(a, b))
+    out.discard(word)
+    return out
+
+
+def words(text: str) -> list:
+    """Folded words of a text (tokens with no letters, e.g. years, skipped)."""
+    tokens = " ".join(_WORD.findall(_ascii_lower(text or ""))).translate(CHAR_FIXES)
+    return [w for w in tokens.split() if len(w) >= MIN_WORD]
+
+
+def grams(word: str) -> set:
+    padded = f"^{word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def max_edits(word: str) -> int:
+    return 1 if len(word) <= 4 else 2 if len(word) <= 8 else 3
+
+# ============================================================
+# SCHEMA
+# ============================================================
+def ensure_schema(conn: sqlite3.Connection) -> bool:
+    """Create tables + triggers; True when the index is new (everything queued)."""
+    fresh = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name='fuzzy_vocab'"
+    ).fetchone()
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS fuzzy_vocab (
+            id INTEGER PRIMARY KEY,
+            word TEXT UNIQUE,
+            phonetic TEXT,
+            len INTEGER,
+            doc_count INTEGER DEFAULT 0
+        )
+    """)
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS fuzzy_grams (
+            gram TEXT,
+            word_id INTEGER,
+            PRIMARY KEY (gram, word_id)
+        ) WITHOUT ROWID
+    """)
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS fuzzy_postings (
+            word_id INTEGER,
+            doc_id INTEGER,
+            hits INTEGER,
+            PRIMARY KEY (word_id, doc_id)
+        ) WITHOUT ROWID
+    """)
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS fuzzy_changes (
+            doc_id INTEGER PRIMARY KEY
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fuzzy_postings_doc ON fuzzy_postings(doc_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fuzzy_vocab_phonetic ON fuzzy_vocab(phonetic, len)")
+    for event, row in (("INSERT", "new"), ("UPDATE OF text", "new"), ("DELETE", "old")):
+        name = f"trg_fuzzy_ocr_{event.split()[0].lower()}"
+        # No OR IGNORE in the body: an outer upsert's conflict policy would
+        # override it and fail on a document that is still queued
+        old = conn.execute("SELECT sql FROM sqlite_master WHERE type='trigger' AND name=?", (name,)).fetchone()
+        if old and "OR IGNORE" in old[0]:
+            conn.execute(f"DROP TRIGGER {name}")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name}
+            AFTER {event} ON ocr_results
+            BEGIN
+                INSERT INTO fuzzy_changes (doc_id) SELECT {row}.id
+                WHERE NOT EXISTS (SELECT 1 FROM fuzzy_changes WHERE doc_id={row}.id);
+            END
+        """)
+    if fresh:
+        conn.execute("INSERT OR IGNORE INTO fuzzy_changes (doc_id) SELECT id FROM ocr_results")
+    conn.commit()
+    return fresh
+
+# ============================================================
+# INDEXING
+# ============================================================
+def _word_ids(conn, vocab: set) -> dict:
+    """{word: id}, adding new words (and their trigrams) to the vocabulary."""
+    vocab = list(vocab)
+    ids = {}
+    for i in range(0, len(vocab), 500):
+        batch = vocab[i:i + 500]
+        ids.update(conn.execute(
+            f"SELECT word, id FROM fuzzy_vocab WHERE word IN ({','.join('?' * len(batch))})",
+            batch
+        ))
+    new_grams = []
+    for word in vocab:
+        if word not in ids:
+            cur = conn.execute(
+                "INSERT INTO fuzzy_vocab (word, phonetic, len) VALUES (?, ?, ?)",
+                (word, soundex(word), len(word))
+            )
+            ids[word] = cur.lastrowid
+            new_grams.extend((g, cur.lastrowid) for g in grams(word))
+    conn.executemany("INSERT OR IGNORE INTO fuzzy_grams (gram, word_id) VALUES (?, ?)", new_grams)
+    return ids
+
+
+def _drop_doc(conn, doc_id):
+    old = [wid for (wid,) in conn.execute(
+        "SELECT word_id FROM fuzzy_postings WHERE doc_id=?", (doc_id,)
+    )]
+    if not old:
+        return
+    conn.execute("DELETE FROM fuzzy_postings WHERE doc_id=?", (doc_id,))
+    conn.executemany("UPDATE fuzzy_vocab SET doc_count = doc_count - 1 WHERE id=?",
+                     [(w,) for w in old])
+    # Words no longer in any document leave the vocabulary
+    gone = conn.execute(
+        f"SELECT id, word FROM fuzzy_vocab WHERE doc_count <= 0 AND id IN ({','.join('?' * len(old))})",
+        old
+    ).fetchall() if len(old) <= 900 else conn.execute(
+        "SELECT id, word FROM fuzzy_vocab WHERE doc_count <= 0"
+    ).fetchall()
+    conn.executemany("DELETE FROM fuzzy_grams WHERE gram=? AND word_id=?",
+                     [(g, wid) for wid, word in gone for g in grams(word)])
+    conn.executemany("DELETE FROM fuzzy_vocab WHERE id=?", [(wid,) for wid, _ in gone])
+
+
+def update(conn: sqlite3.Connection) -> int:
+    """Index the documents queued by the triggers; returns how many."""
+    ensure_schema(conn)
+    done = 0
+    while True:
+        queued = [d for (d,) in conn.execute(
+            "SELECT doc_id FROM fuzzy_changes ORDER BY doc_id LIMIT ?", (BATCH,)
+        )]
+        if not queued:
+            break
+        texts = dict(conn.execute(
+            f"SELECT id, text FROM ocr_results WHERE id IN ({','.join('?' * len(queued))})",
+            queued
+        ))
+        counts = {}
+        for doc_id in queued:
+            _drop_doc(conn, doc_id)
+            hits = defaultdict(int)
+            for word in words(texts.get(doc_id)):
+                hits[word] += 1
+            counts[doc_id] = hits
+
+        ids = _word_ids(conn, {w for hits in counts.values() for w in hits})
+        conn.executemany(
+            "INSERT INTO fuzzy_postings (word_id, doc_id, hits) VALUES (?, ?, ?)",
+            [(ids[w], doc_id, n) for doc_id, hits in counts.items() for w, n in hits.items()]
+        )
+        conn.executemany(
+            "UPDATE fuzzy_vocab SET doc_count = doc_count + 1 WHERE id=?",
+            [(ids[w],) for hits in counts.values() for w in hits]
+        )
+        conn.executemany("DELETE FROM fuzzy_changes WHERE doc_id=?", [(d,) for d in queued])
+        conn.commit()
+        done += len(queued)
+    return done
+
+# ============================================================
+# QUERY
+# ============================================================
+def expand(conn: sqlite3.Connection, word: str) -> list:
+    """
+    Vocabulary words close to one folded query word:
+    [(word_id, word, similarity, doc_count)], best first.
+    """
+    k = max_edits(word)
+    qgrams = grams(word)
+    # Each edit breaks at most 3 trigrams (q-gram lemma)
+    need = max(1, len(qgrams) - 3 * k)
+    cands = {
+        wid: (w, n) for wid, w, n in conn.execute(
+            f"""
+            SELECT v.id, v.word, v.doc_count
+            FROM fuzzy_grams g JOIN fuzzy_vocab v ON v.id = g.word_id
+            WHERE g.gram IN ({','.join('?' * len(qgrams))}) AND v.len BETWEEN ? AND ?
+            GROUP BY v.id HAVING COUNT(*) >= ?
+            """,
+            (*qgrams, len(word) - k, len(word) + k, need)
+        )
+    }
+    code = soundex(word)
+    cands.update(
+        (wid, (w, n)) for wid, w, n in conn.execute(
+            "SELECT id, word, doc_count FROM fuzzy_vocab WHERE phonetic=? AND len BETWEEN ? AND ?",
+            (code, len(word) - k, len(word) + k)
+        )
+    )
+
+    found = []
+    for wid, (w, n) in cands.items():
+        d = edit_distance(word, w, k)
+        if d > k:
+            continue
+        sim = 1 - d / max(len(word), len(w))
+        if d and soundex(w) == code:
+            sim = min(1.0, sim + PHONETIC_BONUS)
+        if sim >= MIN_SIMILARITY:
+            found.append((wid, w, sim, n))
+    found.sort(key=lambda c: (-c[2], -c[3]))
+    return found[:MAX_EXPANSIONS]
+
+
+def search(conn: sqlite3.Connection, query: str, limit: int = 20) -> list:
+    """
+    Ranked documents for a (name) query, tolerant of OCR misreads:
+    [{"id", "file_path", "score", "matched", "terms"}], best first.
+    Documents matching more query words rank first; then by the sum of
+    (similarity of the best variant found) x (idf of the query word).
+    """
+    terms = list(dict.fromkeys(words(query)))
+    if not terms:
+        return []
+    total = conn.execute("SELECT COUNT(*) FROM ocr_results").fetchone()[0] or 1
+
+    scores = defaultdict(float)
+    matched = defaultdict(dict)
+    for term in terms:
+        close = {c[0]: c for c in expand(conn, term)}
+        for variant in variants(term):
+            for wid, w, sim, df in expand(conn, variant):
+                sim *= VARIANT_PENALTY
+                if sim > close.get(wid, (0, 0, 0))[2]:
+                    close[wid] = (wid, w, sim, df)
+        best = {}
+        for wid, w, sim, _ in close.values():
+            for (doc_id,) in conn.execute("SELECT doc_id FROM fuzzy_postings WHERE word_id=?", (wid,)):
+                if sim > best.get(doc_id, (0, None))[0]:
+                    best[doc_id] = (sim, w)
+        # idf of the query word (all its variants together): a rare OCR
+        # misspelling must not outrank the correctly read word
+        idf = math.log(1 + total / max(len(best), 1))
+        for doc_id, (sim, w) in best.items():
+            scores[doc_id] += sim * idf
+            matched[doc_id][term] = w
+
+    ranked = sorted(scores, key=lambda d: (-len(matched[d]), -scores[d]))[:limit]
+    paths = dict(conn.execute(
+        f"SELECT id, file_path FROM ocr_results WHERE id IN ({','.join('?' * len(ranked))})",
+        ranked
+    )) if ranked else {}
+    return [
+        {"id": d, "file_path": paths.get(d), "score": round(scores[d], 3),
+         "matched": len(matched[d]), "terms": matched[d]}
+        for d in ranked
+    ]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        filename=BASE / ".genealogy_search.log",
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s"
+    )
+    conn = sqlite3.connect(DB_PATH)
+    indexed = update(conn)
+    log.info(f"Fuzzy index: {indexed} documents (re)indexed")
+    if len(sys.argv) > 1:
+        for hit in search(conn, " ".join(sys.argv[1:])):
+            terms = ", ".join(f"{q}~{w}" for q, w in hit["terms"].items())
+            print(f"{hit['score']:7.2f}  {hit['id']:>6}  {hit['file_path']}  [{terms}]")
+    conn.close()
@@ -1,47 +1,146 @@
 #!/usr/bin/env python3
+"""
+Family graph and per-person timeline pages (static HTML).
+- Rebuilt only when their content version moved (static_assets.py):
+  the graph when people / relationships changed, a timeline when that
+  person or their events changed
+- Written with pre-compressed .gz / .br copies; web_ui.py serves them
+  with ETag / Last-Modified
+"""
 
+import os
+import shutil
 import sqlite3
+import logging
+import tempfile
+from datetime import datetime
+from html import escape
 from pathlib import Path
+
 import networkx as nx
 from pyvis.network import Network
-import shutil
-import os
-from datetime import datetime
+
+import static_assets
+from schema_guard import normalize_people_name
 
 BASE = Path.home() / "genealogy"
 DB = BASE / "db" / "family_tree.db"
-GRAPH_DIR = BASE / "graphs"
-GRAPH_DIR.mkdir(exist_ok=True)
+GRAPH_DIR = static_assets.GRAPH_DIR
+TIMELINE_DIR = static_assets.TIMELINE_DIR
+GRAPH_PAGE = GRAPH_DIR / "family_graph.html"
 
 OMV = Path("/mnt/omv/genealogy")
 OMV_AVAILABLE = OMV.exists() and os.access(OMV, os.W_OK)
 OMV_GRAPH = OMV / "graphs" if OMV_AVAILABLE else None
 
-def build_graph():
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
+log = logging.getLogger("generate_graph")
 
+# ============================================================
+# GRAPH
+# ============================================================
+def build_graph(conn):
     G = nx.Graph()
 
-    for row in c.execute("SELECT id, name FROM people"):
-        G.add_node(row[0], label=row[1])
+    for pid, name in conn.execute("SELECT id, name FROM people"):
+        G.add_node(pid, label=name or f"#{pid}")
 
-    for row in c.execute("SELECT person1, relation, person2 FROM relationships"):
-        G.add_edge(row[0], row[2], label=row[1])
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name='relationships'").fetchone():
+        for a, relation, b in conn.execute(
+            "SELECT person_id, relationship_type, related_person_id FROM relationships"
+        ):
+            if a in G and b in G:
+                G.add_edge(a, b, label=relation)
 
-    conn.close()
     return G
 
-def export_graph(G):
+
+def render_graph(G) -> bytes:
     net = Network(height="800px", width="100%", bgcolor="#111", font_color="white")
     net.from_nx(G)
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / GRAPH_PAGE.name
+        net.write_html(out.as_posix())
+        return out.read_bytes()
+
 
-    out = GRAPH_DIR / "family_graph.html"
-    net.write_html(out.as_posix())
+def export_graph(conn) -> bool:
+    stale = static_assets.stale(conn, "graph")
+    if not stale:
+        log.info("Graph unchanged")
+        return False
+    (_, version), = stale
+    static_assets.publish(conn, GRAPH_PAGE, render_graph(build_graph(conn)), "graph", version)
+    conn.commit()
 
     if OMV_AVAILABLE:
-        shutil.copy2(out, OMV_GRAPH / f"family_graph_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.html")
+        OMV_GRAPH.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(GRAPH_PAGE, OMV_GRAPH / f"family_graph_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.html")
+    log.info(f"Graph rebuilt (version {version})")
+    return True
+
+# ============================================================
+# TIMELINES
+# ============================================================
+def _events(conn, person_id):
+    timeline = """
+        SELECT event_date, event_type, description, source_file FROM person_events
+        WHERE person_id=? ORDER BY {order}
+    """
+    try:
+        # Integer date keys (date_parser.py, kept by build_timelines.py)
+        return conn.execute(timeline.format(order="event_date_sort, id"), (person_id,)).fetchall()
+    except sqlite3.OperationalError:
+        pass
+    try:
+        return conn.execute(timeline.format(order="event_date, id"), (person_id,)).fetchall()
+    except sqlite3.OperationalError:
+        return []   # build_timelines.py has not run yet
+
+
+def render_timeline(person, events) -> bytes:
+    pid, name, born, died = person
+    title = escape(name or f"#{pid}")
+    lines = [
+        "<!doctype html>",
+        f'<html><head><meta charset="utf-8"><title>{title}</title></head><body>',
+        f'<h1><a href="/people/{pid}">{title}</a></h1>',
+        f"<p>Born {escape(born or '?')} &middot; Died {escape(died or '?')}</p>",
+        "<table>",
+    ]
+    lines += [
+        "<tr>" + "".join(f"<td>{escape(str(v or ''))}</td>" for v in event) + "</tr>"
+        for event in events
+    ] or ["<tr><td>No events yet.</td></tr>"]
+    lines += ["</table>", "</body></html>", ""]
+    return "\n".join(lines).encode("utf-8")
+
+
+def export_timelines(conn) -> int:
+    stale = static_assets.stale(conn, static_assets.TIMELINE)
+    for source, version in stale:
+        pid = int(source[len(static_assets.TIMELINE):])
+        path = TIMELINE_DIR / f"person_{pid}.html"
+        person = conn.execute(
+            "SELECT id, name, birth_date, death_date FROM people WHERE id=?", (pid,)
+        ).fetchone()
+        if person is None:
+            static_assets.unpublish(conn, path, source)
+        else:
+            static_assets.publish(conn, path, render_timeline(person, _events(conn, pid)), source, version)
+    conn.commit()
+    log.info(f"Timelines rebuilt: {len(stale)}")
+    return len(stale)
+
 
 if __name__ == "__main__":
-    G = build_graph()
-    export_graph(G)
+    logging.basicConfig(
+        filename=BASE / ".genealogy_graph.log",
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s"
+    )
+    conn = sqlite3.connect(DB)
+    normalize_people_name(conn)
+    static_assets.ensure_schema(conn)
+    export_graph(conn)
+    export_timelines(conn)
+    conn.close()
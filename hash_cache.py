@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Shared content hashing with a persistent cache.
+- One SHA256 implementation for ocr_ingest, ocr_engine and sync_to_omv
+- 1 MB buffered reads (never the whole file in memory)
+- file_hashes table keyed on path; a hit needs the same size,
+  mtime and inode, so unchanged files are never re-read
+"""
+
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from schema_guard import ensure_table
+
+BASE = Path.home() / "genealogy"
+DB_PATH = BASE / "db/family_tree.db"
+
+CHUNK = 1024 * 1024
+
+log = logging.getLogger("hash_cache")
+_local = threading.local()
+
+# ------------------------------------------------------------
+# Hashing
+# ------------------------------------------------------------
+def sha256_file(path: Path) -> str:
+    """Stream a file through SHA256 with a reused 1 MB buffer."""
+    h = hashlib.sha256()
+    buf = bytearray(CHUNK)
+    view = memoryview(buf)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+# ------------------------------------------------------------
+# Cache table
+# ------------------------------------------------------------
+def ensure_hash_cache(conn: sqlite3.Connection):
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS file_hashes (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime_ns INTEGER,
+            inode INTEGER,
+            sha256 TEXT,
+            hashed_at TEXT
+        )
+    """)
+
+
+def _default_conn() -> sqlite3.Connection:
+    # One connection per thread (pipeline stages, pool workers)
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=30)
+        ensure_hash_cache(conn)
+        _local.conn = conn
+    return conn
+
+
+def _store(conn, path: Path, st: os.stat_result, digest: str):
+    conn.execute(
+        """
+        INSERT INTO file_hashes (path, size, mtime_ns, inode, sha256, hashed_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(path) DO UPDATE SET
+            size=excluded.size,
+            mtime_ns=excluded.mtime_ns,
+            inode=excluded.inode,
+            sha256=excluded.sha256,
+            hashed_at=excluded.hashed_at
+        """,
+        (str(path), st.st_size, st.st_mtime_ns, st.st_ino, digest,
+         datetime.utcnow().isoformat())
+    )
+    conn.commit()
+
+# ------------------------------------------------------------
+# Public API
+# ------------------------------------------------------------
+def content_hash(path: Path, conn: sqlite3.Connection = None) -> str:
+    """
+    SHA256 of a file, read from disk only if the file changed since
+    it was last hashed (size, mtime or inode differ).
+    """
+    conn = conn or _default_conn()
+    path = Path(path)
+    st = path.stat()
+
+    row = conn.execute(
+        "SELECT size, mtime_ns, inode, sha256 FROM file_hashes WHERE path=?",
+        (str(path),)
+    ).fetchone()
+    if row and row[:3] == (st.st_size, st.st_mtime_ns, st.st_ino):
+        return row[3]
+
+    digest = sha256_file(path)
+    _store(conn, path, st, digest)
+    return digest
+
+
+def remember(path: Path, digest: str, conn: sqlite3.Connection = None):
+    """
+    Record a known hash for a file we just wrote (copy/move),
+    so it never has to be read back.
+    """
+    conn = conn or _default_conn()
+    path = Path(path)
+    _store(conn, path, path.stat(), digest)
+
+
+def forget(path: Path, conn: sqlite3.Connection = None):
+    conn = conn or _default_conn()
+    conn.execute("DELETE FROM file_hashes WHERE path=?", (str(path),))
+    conn.commit()
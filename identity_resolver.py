@@ -1,8 +1,48 @@
 #!/usr/bin/env python3
+"""
+Identity resolution: candidate duplicate people -> identity_scores ->
+identity_clusters.
+- Blocking: Soundex of the surname, then birth decade (neighbouring
+  decades compatible, unknown decade compatible with any). Blocks with
+  too many spellings are split again by given-name Soundex.
+- Each distinct spelling pair is scored once per block, then fanned out
+  to the people carrying those spellings
+- Name similarity with rapidfuzz (C, batched cdist) when installed,
+  difflib with its quick-ratio prefilters otherwise
+- Incremental: only pairs involving people added or changed since the
+  last run are scored; identity_scores is upserted, never wiped
+- Each candidate is scored on several signals, all read from per-person
+  feature sets loaded up front (no per-pair SQL):
+    name       string similarity
+    dates      birth / death spans (date_parser lo/hi) overlap, or how far
+               apart they are; being born after the other died conflicts
+    places     shared person_locations
+    documents  co-occurrence in the same files (files.person_id, asset_links)
+    faces      shared face_cluster.py clusters (single-person photos only)
+  score is the weighted mean of the signals available for the pair
+- Pairs at MERGE_THRESHOLD with at least one signal besides the name are
+  joined transitively (union-find) into identity_clusters
+- reason says why each pair matched
+"""
+
+import re
+import json
+import hashlib
 import sqlite3
+import logging
+from collections import defaultdict
+from datetime import datetime
 from difflib import SequenceMatcher
+from functools import lru_cache
 from pathlib import Path
-import logging
+
+from date_parser import parse as parse_date
+from schema_guard import ensure_column, ensure_table, normalize_people_name
+
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:
+    fuzz = process = None
 
 # ============================================================
 # PATHS + LOGGING
@@ -10,60 +50,435 @@ import logging
 BASE = Path.home() / "genealogy"
 DB_PATH = BASE / "db/family_tree.db"
 
-logging.basicConfig(
-    filename=BASE / ".genealogy_identity.log",
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s"
-)
 log = logging.getLogger("identity_resolver")
-log.info("Identity resolver initialized")
+
+THRESHOLD = 0.75        # name similarity needed to score a pair (and combined score to keep it)
+MERGE_THRESHOLD = 0.9   # combined score that joins two people into one cluster
+MAX_BLOCK = 2000        # candidate lists longer than this are split by given name
+DATE_SLACK_YEARS = 5    # date spans this far apart count as a full conflict
+METRIC = "rapidfuzz" if fuzz else "difflib"
+
+# Signal weights; a signal missing for a pair (no dates, no places...)
+# is left out of the mean instead of counting as a mismatch
+WEIGHTS = {
+    "name": 0.4,
+    "dates": 0.3,
+    "places": 0.1,
+    "documents": 0.1,
+    "faces": 0.3,
+}
 
 # ============================================================
-# DATABASE
+# SCHEMA
 # ============================================================
-conn = sqlite3.connect(DB_PATH)
-c = conn.cursor()
+def ensure_schema(conn: sqlite3.Connection):
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS identity_scores (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            person_a INTEGER,
+            person_b INTEGER,
+            score REAL,
+            reason TEXT,
+            scored_at TEXT
+        )
+    """)
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS identity_state (
+            person_id INTEGER PRIMARY KEY,
+            signature TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_identity_scores_pair
+        ON identity_scores(person_a, person_b)
+    """)
+    ensure_column(conn, "identity_scores", "features", "TEXT")
+    ensure_column(conn, "identity_scores", "evidence", "INTEGER")
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS identity_clusters (
+            person_id INTEGER PRIMARY KEY,
+            cluster_id INTEGER,
+            updated_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_identity_scores_b ON identity_scores(person_b)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_identity_clusters ON identity_clusters(cluster_id)")
+    conn.commit()
 
 # ============================================================
-# HELPER: NAME SIMILARITY
+# KEYS
 # ============================================================
-def similarity(a: str, b: str) -> float:
-    if not a or not b:
-        return 0.0
-    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+_SOUNDEX = str.maketrans("bfpvcgjkqsxzdtlmnr", "111122222222334556")
+
+
+@lru_cache(maxsize=None)
+def soundex(word: str) -> str:
+    """American Soundex ("" for no letters)."""
+    word = re.sub(r"[^a-z]", "", word.lower())
+    if not word:
+        return ""
+    codes = word.translate(_SOUNDEX)
+    out, last = [word[0].upper()], codes[0]
+    for ch, code in zip(word[1:], codes[1:]):
+        if code.isdigit() and code != last:
+            out.append(code)
+        if ch not in "hw":
+            last = code
+    return "".join(out)[:4].ljust(4, "0")
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(re.sub(r"[^a-z ]", " ", (name or "").lower()).split())
+
 
 # ============================================================
-# FETCH ALL PEOPLE
+# PEOPLE
 # ============================================================
-c.execute("SELECT id, name FROM people")
-people = c.fetchall()
+NONE = frozenset()
+
+
+class Person:
+    """One person's matching features, precomputed once per run."""
+    __slots__ = ("id", "name", "surname_key", "given_key", "decade", "birth", "death",
+                 "places", "documents", "faces", "signature")
+
+    def __init__(self, pid, name, last_name, birth_date, death_date,
+                 places=NONE, documents=NONE, faces=NONE):
+        self.id = pid
+        self.name = normalize_name(name)
+        parts = self.name.split()
+        surname = normalize_name(last_name) or (parts[-1] if parts else "")
+        given = parts[0] if len(parts) > 1 else ""
+        self.surname_key = soundex(surname)
+        self.given_key = soundex(given)
+        self.birth = parse_date(birth_date) if birth_date else None
+        self.death = parse_date(death_date) if death_date else None
+        self.decade = self.birth.sort // 100000 if self.birth else None
+        self.places, self.documents, self.faces = places, documents, faces
+        # Any change to what the person is matched on re-queues them
+        self.signature = hashlib.sha1(repr((
+            self.name, birth_date or "", death_date or "",
+            sorted(places), sorted(documents), sorted(faces)
+        )).encode("utf-8")).hexdigest()
+
+
+def _sets(conn: sqlite3.Connection, *queries) -> dict:
+    """{person_id: frozenset(values)} from (person_id, value) queries; missing tables skipped."""
+    found = defaultdict(set)
+    for sql in queries:
+        try:
+            for pid, value in conn.execute(sql):
+                if pid is not None and value is not None:
+                    found[pid].add(value)
+        except sqlite3.OperationalError as e:
+            log.info(f"Identity signal skipped ({e})")
+    return {pid: frozenset(values) for pid, values in found.items()}
+
+
+def load_people(conn: sqlite3.Connection) -> list:
+    normalize_people_name(conn)
+    places = _sets(conn, "SELECT person_id, location_id FROM person_locations")
+    documents = _sets(
+        conn,
+        "SELECT person_id, id FROM files",
+        "SELECT person_id, file_id FROM asset_links",
+    )
+    # A face counts for a person only when its photo is tied to that one
+    # person: group photos would make everyone in them look alike
+    faces = _sets(
+        conn,
+        """
+        SELECT COALESCE(fe.person_id, f.person_id), fe.cluster_id
+        FROM face_embeddings fe LEFT JOIN files f ON f.file_path = fe.file_path
+        WHERE fe.cluster_id IS NOT NULL
+        """,
+        """
+        SELECT l.person_id, fe.cluster_id
+        FROM face_embeddings fe
+        JOIN files f ON f.file_path = fe.file_path
+        JOIN asset_links l ON l.file_id = f.id
+        WHERE fe.cluster_id IS NOT NULL AND l.file_id IN (
+            SELECT file_id FROM asset_links GROUP BY file_id
+            HAVING COUNT(DISTINCT person_id) = 1
+        )
+        """,
+    )
+    return [
+        Person(pid, name, last_name, birth, death,
+               places.get(pid, NONE), documents.get(pid, NONE), faces.get(pid, NONE))
+        for pid, name, last_name, birth, death in conn.execute(
+            "SELECT id, name, last_name, birth_date, death_date FROM people "
+            "WHERE TRIM(COALESCE(name, '')) != ''"
+        )
+    ]
+
+
+def changed_people(conn: sqlite3.Connection, people) -> set:
+    """Ids whose matching features differ from what was last scored."""
+    seen = dict(conn.execute("SELECT person_id, signature FROM identity_state"))
+    return {p.id for p in people if seen.get(p.id) != p.signature}
 
 # ============================================================
-# CLEAR OLD SCORES
+# SIMILARITY
 # ============================================================
-c.execute("DELETE FROM identity_scores")
-conn.commit()
+def similar_pairs(queries, choices, threshold=THRESHOLD):
+    """(query index, choice index, score) for name pairs >= threshold."""
+    if fuzz:
+        matrix = process.cdist(
+            queries, choices, scorer=fuzz.ratio,
+            score_cutoff=threshold * 100, workers=-1
+        )
+        rows, cols = matrix.nonzero()
+        return [(int(i), int(j), float(matrix[i, j]) / 100) for i, j in zip(rows, cols)]
+
+    pairs = []
+    for i, q in enumerate(queries):
+        sm = SequenceMatcher(None, q)
+        sm.set_seq2(q)
+        for j, c in enumerate(choices):
+            sm.set_seq1(c)
+            if sm.real_quick_ratio() < threshold or sm.quick_ratio() < threshold:
+                continue
+            score = sm.ratio()
+            if score >= threshold:
+                pairs.append((i, j, score))
+    return pairs
+
+
+def _decades_close(a, b) -> bool:
+    return a.decade is None or b.decade is None or abs(a.decade - b.decade) <= 1
+
+
+def _span_match(a, b):
+    """1.0 if two date spans overlap, falling to -1.0 as they drift apart; None if unknown."""
+    if a is None or b is None:
+        return None
+    lo, hi = max(a.lo, b.lo), min(a.hi, b.hi)
+    if lo <= hi:
+        return 1.0
+    years = lo // 10000 - hi // 10000       # same year, different day: 0
+    return max(-1.0, 1.0 - 2 * years / DATE_SLACK_YEARS)
+
+
+def _date_feature(a, b):
+    if (a.birth and b.death and a.birth.lo > b.death.hi) or \
+            (b.birth and a.death and b.birth.lo > a.death.hi):
+        return -1.0
+    known = [m for m in (_span_match(a.birth, b.birth), _span_match(a.death, b.death))
+             if m is not None]
+    return sum(known) / len(known) if known else None
+
+
+def _overlap(x, y):
+    """Shared share of the smaller set; None when either side has nothing."""
+    if not x or not y:
+        return None
+    return len(x & y) / min(len(x), len(y))
+
+
+def features(a, b, name_score) -> dict:
+    """Signal values for one pair (signals with no data on either side left out)."""
+    found = {"name": name_score}
+    for key, value in (
+        ("dates", _date_feature(a, b)),
+        ("places", _overlap(a.places, b.places)),
+        ("documents", _overlap(a.documents, b.documents)),
+        ("faces", _overlap(a.faces, b.faces)),
+    ):
+        if value is not None:
+            found[key] = value
+    return found
+
+
+def combine(found: dict) -> float:
+    total = sum(WEIGHTS[k] for k in found)
+    return max(0.0, sum(WEIGHTS[k] * v for k, v in found.items()) / total)
+
+
+def _reason(a, found):
+    parts = [f"name {found['name']:.2f} ({METRIC})"]
+    parts += [f"{k} {v:.2f}" for k, v in found.items() if k != "name"]
+    parts.append(f"surname {a.surname_key}")
+    return "; ".join(parts)
+
+# ============================================================
+# BLOCKING + SCORING
+# ============================================================
+def candidate_pairs(people, changed: set, threshold=THRESHOLD) -> dict:
+    """
+    {(a, b): (name score, person a, person b)} with a < b, for pairs
+    where at least one side changed, both share a surname Soundex block
+    and their birth decades are within one of each other (or unknown).
+    """
+    blocks = defaultdict(list)
+    for p in people:
+        if p.surname_key:
+            blocks[p.surname_key].append(p)
+
+    found = {}
+    for members in blocks.values():
+        queries = [p for p in members if p.id in changed]
+        if not queries:
+            continue
+        for q_group, c_group in _split(queries, members):
+            # Score each distinct spelling once, then fan out to people
+            q_names, c_names = _by_name(q_group), _by_name(c_group)
+            q_keys, c_keys = list(q_names), list(c_names)
+            for i, j, score in similar_pairs(q_keys, c_keys, threshold):
+                for a in q_names[q_keys[i]]:
+                    for b in c_names[c_keys[j]]:
+                        if a.id == b.id or not _decades_close(a, b):
+                            continue
+                        key = (a.id, b.id) if a.id < b.id else (b.id, a.id)
+                        if key not in found:
+                            found[key] = (score, a, b)
+    return found
+
+
+def _by_name(group) -> dict:
+    names = defaultdict(list)
+    for p in group:
+        names[p.name].append(p)
+    return names
+
+
+def _split(queries, choices):
+    """Sub-block by given-name Soundex when a block has too many spellings."""
+    if len({p.name for p in choices}) <= MAX_BLOCK:
+        yield queries, choices
+        return
+    by_given = defaultdict(list)
+    for p in choices:
+        by_given[p.given_key].append(p)
+    q_by_given = defaultdict(list)
+    for p in queries:
+        q_by_given[p.given_key].append(p)
+    for given, group in q_by_given.items():
+        # A missing given name can match anyone in the surname block
+        yield group, by_given[given] + by_given[""] if given else choices
 
 # ============================================================
-# CALCULATE PAIRWISE SIMILARITY
+# CLUSTERS
 # ============================================================
-threshold = 0.75  # configurable similarity threshold
+def clusters(pairs) -> dict:
+    """Union-find over (a, b) merge pairs -> {person_id: cluster_id (smallest member)}."""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            # Smallest id as root keeps cluster ids stable between runs
+            parent[max(ra, rb)] = min(ra, rb)
+    return {x: find(x) for x in parent}
+
 
-for i in range(len(people)):
-    id1, name1 = people[i]
-    for j in range(i + 1, len(people)):
-        id2, name2 = people[j]
+def update_clusters(conn: sqlite3.Connection) -> int:
+    """
+    Recompute clusters from every stored merge pair (cheap: only pairs
+    over MERGE_THRESHOLD) and write only the rows that moved.
+    """
+    merged = clusters(conn.execute(
+        "SELECT person_a, person_b FROM identity_scores WHERE score >= ? AND evidence >= 1",
+        (MERGE_THRESHOLD,)
+    ))
+    current = dict(conn.execute("SELECT person_id, cluster_id FROM identity_clusters"))
+    conn.executemany(
+        "DELETE FROM identity_clusters WHERE person_id=?",
+        [(pid,) for pid in current if pid not in merged]
+    )
+    now = datetime.utcnow().isoformat()
+    conn.executemany(
+        "INSERT OR REPLACE INTO identity_clusters (person_id, cluster_id, updated_at) VALUES (?, ?, ?)",
+        [(pid, cid, now) for pid, cid in merged.items() if current.get(pid) != cid]
+    )
+    return len(set(merged.values()))
+
+# ============================================================
+# RESOLVE
+# ============================================================
+def resolve(conn: sqlite3.Connection, threshold=THRESHOLD) -> dict:
+    ensure_schema(conn)
+    people = load_people(conn)
+    changed = changed_people(conn, people)
+    current = {p.id for p in people}
+    removed = [
+        pid for (pid,) in conn.execute("SELECT person_id FROM identity_state")
+        if pid not in current
+    ]
 
-        score = similarity(name1, name2)
+    candidates = candidate_pairs(people, changed, threshold) if changed else {}
+    rows = []
+    for (a_id, b_id), (name_score, a, b) in candidates.items():
+        found = features(a, b, name_score)
+        score = combine(found)
         if score >= threshold:
-            c.execute(
-                """
-                INSERT INTO identity_scores (person_a, person_b, score, reason)
-                VALUES (?, ?, ?, ?)
-                """,
-                (id1, id2, score, "Name similarity")
-            )
-
-conn.commit()
-conn.close()
-log.info("Identity resolution completed.")
+            rows.append((
+                a_id, b_id, score, _reason(a, found),
+                json.dumps({k: round(v, 3) for k, v in found.items()}), len(found) - 1
+            ))
+
+    stale = [(pid,) for pid in list(changed) + removed]
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS identity_stale (person_id INTEGER PRIMARY KEY)")
+    conn.execute("DELETE FROM identity_stale")
+    conn.executemany("INSERT OR IGNORE INTO identity_stale VALUES (?)", stale)
+    conn.execute("""
+        DELETE FROM identity_scores
+        WHERE person_a IN (SELECT person_id FROM identity_stale)
+        OR person_b IN (SELECT person_id FROM identity_stale)
+    """)
+    now = datetime.utcnow().isoformat()
+    conn.executemany(
+        """
+        INSERT INTO identity_scores
+        (person_a, person_b, score, reason, features, evidence, scored_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(person_a, person_b) DO UPDATE SET
+            score=excluded.score,
+            reason=excluded.reason,
+            features=excluded.features,
+            evidence=excluded.evidence,
+            scored_at=excluded.scored_at
+        """,
+        [row + (now,) for row in rows]
+    )
+    conn.executemany("DELETE FROM identity_state WHERE person_id=?", [(pid,) for pid in removed])
+    conn.executemany(
+        "INSERT OR REPLACE INTO identity_state (person_id, signature) VALUES (?, ?)",
+        [(p.id, p.signature) for p in people if p.id in changed]
+    )
+    n_clusters = update_clusters(conn) if stale else \
+        conn.execute("SELECT COUNT(DISTINCT cluster_id) FROM identity_clusters").fetchone()[0]
+    conn.commit()
+
+    return {"people": len(people), "changed": len(changed), "removed": len(removed),
+            "candidates": len(candidates), "pairs": len(rows), "clusters": n_clusters}
+
+
+def main():
+    logging.basicConfig(
+        filename=BASE / ".genealogy_identity.log",
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s"
+    )
+    log.info(f"Identity resolver initialized ({METRIC})")
+
+    conn = sqlite3.connect(DB_PATH)
+    stats = resolve(conn)
+    conn.close()
+    log.info(
+        f"Identity resolution completed: {stats['people']} people, "
+        f"{stats['changed']} new/changed, {stats['removed']} removed, "
+        f"{stats['candidates']} candidates, {stats['pairs']} pairs kept, "
+        f"{stats['clusters']} clusters"
+    )
+
+
+if __name__ == "__main__":
+    main()
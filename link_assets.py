@@ -1,42 +1,302 @@
 #!/usr/bin/env python3
+"""
+Link files to the people named in them (asset_links).
+- Person names indexed once as token phrases (full name, first + last,
+  "Last, First", initial + last); each document is tokenized and scanned
+  a single time against the index
+- Confidence from how the name matched, lowered when several people
+  share the same form, raised when the name is in the file name
+- Incremental: only files whose name / OCR changed are rescanned in full;
+  people added or renamed are looked for in the other files on their own
+- One row per (file_id, person_id), upserted; rows without matched_text
+  (linked by hand) are never touched
+"""
 
+import re
 import sqlite3
+import hashlib
+import logging
+import unicodedata
+from collections import defaultdict
 from pathlib import Path
-import re
+
+from schema_guard import ensure_column, ensure_table, normalize_people_name
 
 BASE = Path.home() / "genealogy"
 DB = BASE / "db" / "family_tree.db"
 
-def normalize(s):
-    return re.sub(r"[^a-z]", "", s.lower())
+log = logging.getLogger("link_assets")
+
+# Match forms, strongest first: (label, confidence)
+FULL = ("full name", 0.95)
+FIRST_LAST = ("first + last", 0.85)
+REVERSED = ("last, first", 0.8)
+INITIAL = ("initial + last", 0.6)
+FILE_NAME_BONUS = 0.05   # the name is also in the file name
+
+_TOKEN = re.compile(r"[a-z]+")
+
+
+def tokens(text: str) -> list:
+    """Lower-case ASCII word tokens ("Müller, J." -> ["muller", "j"])."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode()
+    return _TOKEN.findall(text.lower())
+
+# ============================================================
+# SCHEMA
+# ============================================================
+def ensure_schema(conn: sqlite3.Connection):
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS asset_links (
+            file_id INTEGER,
+            person_id INTEGER,
+            confidence REAL
+        )
+    """)
+    # Rows from the old linker were all substring matches: mark them as
+    # linker-made so the first rescan can drop the ones that no longer match
+    ensure_column(conn, "asset_links", "matched_text", "TEXT", default="legacy substring match")
+
+    # Older runs appended the same link every cycle
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name='idx_asset_links_key'").fetchone():
+        cur = conn.execute("""
+            DELETE FROM asset_links WHERE rowid NOT IN (
+                SELECT MIN(rowid) FROM asset_links GROUP BY file_id, person_id
+            )
+        """)
+        log.info(f"Removed {cur.rowcount} duplicate asset_links rows")
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_asset_links_key
+        ON asset_links(file_id, person_id)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_asset_links_person ON asset_links(person_id)")
+
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS link_files (
+            file_id INTEGER PRIMARY KEY,
+            signature TEXT
+        )
+    """)
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS link_people (
+            person_id INTEGER PRIMARY KEY,
+            signature TEXT
+        )
+    """)
+    conn.commit()
+
+# ============================================================
+# NAME INDEX
+# ============================================================
+def name_forms(name: str) -> list:
+    """[(token tuple, (label, confidence))] for one person's name."""
+    t = tokens(name)
+    if len(t) < 2:
+        return []   # a lone given name or surname links too much
+    first, last = t[0], t[-1]
+    forms = [(tuple(t), FULL), ((last, first), REVERSED), ((first[0], last), INITIAL)]
+    if len(t) > 2:
+        forms.append(((first, last), FIRST_LAST))
+    return forms
+
+
+def build_index(people) -> dict:
+    """
+    people: {person_id: name}.
+    Returns {first token: [(form, label, confidence, person ids)]}.
+    """
+    owners = defaultdict(set)
+    strength = {}
+    for pid, name in people.items():
+        for form, (label, conf) in name_forms(name):
+            owners[form].add(pid)
+            if conf > strength.get(form, (None, 0))[1]:
+                strength[form] = (label, conf)
+
+    index = defaultdict(list)
+    for form, pids in owners.items():
+        label, conf = strength[form]
+        # A form shared by several people says less about each of them
+        index[form[0]].append((form, label, conf / len(pids), frozenset(pids)))
+    return index
+
+
+def scan(words: list, index: dict) -> dict:
+    """One pass over a document's tokens -> {person_id: (confidence, label)}."""
+    found = {}
+    for i, word in enumerate(words):
+        for form, label, conf, pids in index.get(word, ()):
+            if tuple(words[i:i + len(form)]) != form:
+                continue
+            for pid in pids:
+                if conf > found.get(pid, (0, None))[0]:
+                    found[pid] = (conf, label)
+    return found
 
+
+def match_document(file_name: str, text: str, index: dict) -> dict:
+    found = scan(tokens(text), index)
+    for pid, (conf, label) in scan(tokens(file_name), index).items():
+        if pid in found:
+            best, best_label = found[pid]
+            found[pid] = (min(1.0, max(best, conf) + FILE_NAME_BONUS), f"{best_label}, file name")
+        else:
+            found[pid] = (conf, f"{label} (file name)")
+    return {pid: (round(conf, 3), label) for pid, (conf, label) in found.items()}
+
+
+# ============================================================
+# CHANGES
+# ============================================================
+def _signature(*parts) -> str:
+    return hashlib.sha1("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def _changed(conn, table, key, current: dict):
+    """(changed keys, removed keys) against the stored signatures."""
+    seen = dict(conn.execute(f"SELECT {key}, signature FROM {table}"))
+    changed = {k for k, sig in current.items() if seen.get(k) != sig}
+    removed = set(seen) - set(current)
+    return changed, removed
+
+
+def _temp_ids(conn, name, ids):
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS {name} (id INTEGER PRIMARY KEY)")
+    conn.execute(f"DELETE FROM {name}")
+    conn.executemany(f"INSERT INTO {name} VALUES (?)", [(i,) for i in ids])
+
+
+def documents(conn, where=""):
+    """(file id, file name, text) with the legacy files.ocr_text and all OCR text."""
+    return conn.execute(f"""
+        SELECT f.id, COALESCE(f.file_name, ''),
+               COALESCE(f.ocr_text, '') || ' ' || COALESCE(GROUP_CONCAT(o.text, ' '), '')
+        FROM files f LEFT JOIN ocr_results o ON o.file_path = f.file_path
+        {where}
+        GROUP BY f.id
+    """)
+
+# ============================================================
+# LINK
+# ============================================================
 def link():
     conn = sqlite3.connect(DB)
-    c = conn.cursor()
+    ensure_schema(conn)
+    normalize_people_name(conn)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_files_path ON files(file_path)")
 
-    c.execute("""
-    CREATE TABLE IF NOT EXISTS asset_links (
-        file_id INTEGER,
-        person_id INTEGER,
-        confidence REAL
-    )
-    """)
+    people = {
+        pid: name for pid, name in conn.execute(
+            "SELECT id, name FROM people WHERE TRIM(COALESCE(name, '')) != ''"
+        )
+    }
+    # Cheap per-file signature: name, legacy text, and each OCR result's
+    # hash + length (re-OCR in place keeps the hash but changes the text)
+    file_sigs = {
+        fid: _signature(name, legacy, ocr)
+        for fid, name, legacy, ocr in conn.execute("""
+            SELECT f.id, f.file_name, f.ocr_text,
+                   GROUP_CONCAT(o.file_hash || ':' || LENGTH(o.text), ',')
+            FROM files f LEFT JOIN ocr_results o ON o.file_path = f.file_path
+            GROUP BY f.id
+        """)
+    }
+    # Stored as the name's tokens, so the old forms of a renamed person are known
+    people_keys = {pid: " ".join(tokens(name)) for pid, name in people.items()}
+
+    changed_files, removed_files = _changed(conn, "link_files", "file_id", file_sigs)
+    changed_people, removed_people = _changed(conn, "link_people", "person_id", people_keys)
+
+    if not (changed_files or removed_files or changed_people or removed_people):
+        conn.close()
+        log.info("No file or name changes since last link")
+        return
 
-    files = list(c.execute("SELECT id, filename, ocr_text FROM files"))
-    people = list(c.execute("SELECT id, name FROM people"))
+    if changed_people or removed_people:
+        # Whoever shares a form with an old or new name gets a new
+        # ambiguity share, so their links are redone too
+        old_keys = dict(conn.execute("SELECT person_id, signature FROM link_people"))
+        touched = {
+            form
+            for pid in changed_people | removed_people
+            for name in (people_keys.get(pid), old_keys.get(pid)) if name
+            for form, _ in name_forms(name)
+        }
+        changed_people |= {
+            pid for pid, name in people_keys.items()
+            if any(form in touched for form, _ in name_forms(name))
+        }
 
-    for fid, fname, text in files:
-        text_n = normalize(fname + " " + (text or ""))
+    # Always the full index: a form's confidence depends on everyone sharing it
+    index = build_index(people)
+    found = {}
+    if changed_files:
+        _temp_ids(conn, "link_scan", changed_files)
+        for fid, name, text in documents(conn, "WHERE f.id IN (SELECT id FROM link_scan)"):
+            for pid, match in match_document(name, text, index).items():
+                found[(fid, pid)] = match
+    if changed_people:
+        # Changed people only, in files that were not rescanned above
+        subset = {
+            word: [entry for entry in entries if entry[3] & changed_people]
+            for word, entries in index.items()
+        }
+        _temp_ids(conn, "link_scan", changed_files)
+        for fid, name, text in documents(conn, "WHERE f.id NOT IN (SELECT id FROM link_scan)"):
+            for pid, match in match_document(name, text, subset).items():
+                if pid in changed_people:
+                    found[(fid, pid)] = match
 
-        for pid, name in people:
-            if normalize(name) in text_n:
-                c.execute(
-                    "INSERT INTO asset_links VALUES (?, ?, ?)",
-                    (fid, pid, 0.85)
-                )
+    # Linker-made rows in the rescanned scope that were not found again
+    _temp_ids(conn, "link_files_scope", changed_files | removed_files)
+    _temp_ids(conn, "link_people_scope", changed_people | removed_people)
+    stale = [
+        key for key in conn.execute("""
+            SELECT file_id, person_id FROM asset_links
+            WHERE matched_text IS NOT NULL AND (
+                file_id IN (SELECT id FROM link_files_scope)
+                OR person_id IN (SELECT id FROM link_people_scope)
+                OR file_id NOT IN (SELECT id FROM files)
+            )
+        """)
+        if key not in found
+    ]
+    conn.executemany("DELETE FROM asset_links WHERE file_id=? AND person_id=?", stale)
+    conn.executemany(
+        """
+        INSERT INTO asset_links (file_id, person_id, confidence, matched_text)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(file_id, person_id) DO UPDATE SET
+            confidence=excluded.confidence,
+            matched_text=excluded.matched_text
+        WHERE asset_links.matched_text IS NOT NULL
+        AND (asset_links.confidence IS NOT excluded.confidence
+             OR asset_links.matched_text IS NOT excluded.matched_text)
+        """,
+        [(fid, pid, conf, label) for (fid, pid), (conf, label) in found.items()]
+    )
 
+    conn.executemany("DELETE FROM link_files WHERE file_id=?", [(f,) for f in removed_files])
+    conn.executemany("DELETE FROM link_people WHERE person_id=?", [(p,) for p in removed_people])
+    conn.executemany(
+        "INSERT OR REPLACE INTO link_files (file_id, signature) VALUES (?, ?)",
+        [(fid, file_sigs[fid]) for fid in changed_files]
+    )
+    conn.executemany(
+        "INSERT OR REPLACE INTO link_people (person_id, signature) VALUES (?, ?)",
+        [(pid, people_keys[pid]) for pid in changed_people]
+    )
     conn.commit()
     conn.close()
+    log.info(
+        f"Linked {len(changed_files)} changed files, {len(changed_people)} changed people: "
+        f"{len(found)} links found, {len(stale)} removed"
+    )
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        filename=BASE / ".genealogy_link.log",
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s"
+    )
     link()
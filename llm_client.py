@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Local LLM (Ollama) extraction client.
+- One keep-alive requests.Session, connection pool sized to the slots
+- Concurrency bounded to Ollama's parallel slots (OLLAMA_NUM_PARALLEL);
+  more in-flight requests only queue inside Ollama and hit timeouts
+- Long OCR text split into chunks that fit the model context
+- Streamed responses parsed as they arrive: each token piece is fed to
+  a RecordStream, and a record is taken (and handed to on_record) as
+  soon as its closing brace arrives, so an answer cut at the token
+  limit or partly malformed still yields every complete record; a
+  stream that breaks before "done" is a failed chunk (retried next
+  run, never cached)
+- Persistent response cache in SQLite keyed on
+  (chunk text hash, PROMPT_VERSION, model): re-runs after a crash or a
+  timeline rebuild never call the model for text it has already seen
+
+Point GENEALOGY_OLLAMA_URL at a stub server to test without a model.
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from schema_guard import ensure_table
+from extraction_store import clean_records
+
+BASE = Path.home() / "genealogy"
+DB_PATH = BASE / "db/family_tree.db"
+
+OLLAMA_URL = os.environ.get("GENEALOGY_OLLAMA_URL", "http://127.0.0.1:11434").rstrip("/")
+MODEL = os.environ.get("GENEALOGY_LLM_MODEL", "llama3.2")
+# Requests in flight; match the server's OLLAMA_NUM_PARALLEL
+PARALLEL = int(os.environ.get("GENEALOGY_LLM_PARALLEL", os.environ.get("OLLAMA_NUM_PARALLEL", "1")))
+NUM_CTX = int(os.environ.get("GENEALOGY_LLM_CTX", "4096"))   # tokens
+MAX_OUTPUT_TOKENS = 1024
+PROMPT_TOKENS = 300          # instructions around the chunk
+CHARS_PER_TOKEN = 3          # conservative for OCR text (names, digits, noise)
+CHUNK_CHARS = (NUM_CTX - MAX_OUTPUT_TOKENS - PROMPT_TOKENS) * CHARS_PER_TOKEN
+REQUEST_TIMEOUT = 300        # seconds per chunk (CPU inference)
+KEEP_ALIVE = "30m"           # keep the model loaded between cycles
+
+# Bump when PROMPT (or how responses are read) changes; old cache entries
+# are then ignored, not deleted
+PROMPT_VERSION = 2
+PROMPT = """You extract genealogy facts from OCR text of a family document.
+Return JSON only, in exactly this shape:
+{{"people": [{{"name": "", "sex": "", "birth_date": "", "death_date": "", "role": ""}}],
+ "events": [{{"type": "", "date": "", "person": "", "place": "", "description": ""}}]}}
+type is one of: birth, baptism, marriage, divorce, death, burial, residence,
+census, immigration, emigration, naturalization, military, occupation,
+education, other. Dates as YYYY-MM-DD or YYYY when known.
+Use "" for unknown values. Do not invent facts that are not in the text.
+
+TEXT:
+{text}"""
+
+log = logging.getLogger("llm_client")
+
+
+class LLMError(Exception):
+    pass
+
+# ============================================================
+# CACHE
+# ============================================================
+def ensure_cache(conn: sqlite3.Connection):
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            text_hash TEXT,
+            prompt_version INTEGER,
+            model TEXT,
+            response TEXT,
+            created_at TEXT,
+            PRIMARY KEY (text_hash, prompt_version, model)
+        )
+    """)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+# ============================================================
+# CHUNKING
+# ============================================================
+def chunk_text(text: str, max_chars: int = CHUNK_CHARS) -> list:
+    """
+    Split on paragraph, then line, then hard boundaries and pack the
+    pieces greedily into chunks of at most max_chars.
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    pieces = []
+    for para in text.split("\n\n"):
+        if len(para) <= max_chars:
+            pieces.append(para)
+            continue
+        for line in para.split("\n"):
+            pieces.extend(line[i:i + max_chars] for i in range(0, len(line), max_chars))
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + 2 + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+# ============================================================
+# CLIENT
+# ============================================================
+class LLMClient:
+    def __init__(self, conn: sqlite3.Connection, base_url: str = OLLAMA_URL,
+                 model: str = MODEL, parallel: int = PARALLEL):
+        self.conn = conn
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.parallel = max(1, parallel)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.parallel)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.calls = 0
+        self.cache_hits = 0
+        ensure_cache(conn)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def available(self) -> bool:
+        try:
+            self.session.get(f"{self.base_url}/api/version", timeout=5).raise_for_status()
+            return True
+        except requests.RequestException as e:
+            log.warning(f"LLM server unavailable at {self.base_url}: {e}")
+            return False
+
+    # --------------------------------------------------------
+    # One request (runs in a pool thread: no DB access here)
+    # --------------------------------------------------------
+    def generate(self, chunk: str, on_record=None):
+        """
+        Stream one answer, parsing records while it arrives.
+        Returns (raw text, RecordStream); on_record(kind, obj) is called
+        for each record the moment it closes.
+        Raises LLMError unless the server sent "done": a stream broken
+        off mid-answer must not be cached as if it were the whole answer.
+        """
+        parts = []
+        stream = RecordStream()
+        done = False
+        try:
+            with self.session.post(
+                f"{self.base_url}/api/generate",
+                json={
+                    "model": self.model,
+                    "prompt": PROMPT.format(text=chunk),
+                    "format": "json",
+                    "stream": True,
+                    "keep_alive": KEEP_ALIVE,
+                    "options": {
+                        "num_ctx": NUM_CTX,
+                        "num_predict": MAX_OUTPUT_TOKENS,
+                        "temperature": 0
+                    }
+                },
+                timeout=REQUEST_TIMEOUT,
+                stream=True
+            ) as resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if not line:
+                        continue
+                    msg = json.loads(line)
+                    if msg.get("error"):
+                        raise LLMError(msg["error"])
+                    piece = msg.get("response", "")
+                    parts.append(piece)
+                    for kind, obj in stream.feed(piece):
+                        if on_record:
+                            on_record(kind, obj)
+                    if msg.get("done"):
+                        done = True
+                        break
+        except (requests.RequestException, ValueError) as e:
+            raise LLMError(f"{self.base_url}: {e} (after {len(parts)} tokens)") from e
+        if not done:
+            raise LLMError(f"{self.base_url}: stream ended without done after {len(parts)} tokens")
+        return "".join(parts), stream
+
+    # --------------------------------------------------------
+    # Cache
+    # --------------------------------------------------------
+    def _cached(self, hashes) -> dict:
+        found = {}
+        hashes = list(hashes)
+        for i in range(0, len(hashes), 500):
+            batch = hashes[i:i + 500]
+            found.update(self.conn.execute(
+                f"""
+                SELECT text_hash, response FROM llm_cache
+                WHERE prompt_version=? AND model=?
+                AND text_hash IN ({",".join("?" * len(batch))})
+                """,
+                (PROMPT_VERSION, self.model, *batch)
+            ))
+        return found
+
+    def _store(self, digest: str, response: str):
+        self.conn.execute(
+            """
+            INSERT OR REPLACE INTO llm_cache
+            (text_hash, prompt_version, model, response, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (digest, PROMPT_VERSION, self.model, response, datetime.utcnow().isoformat())
+        )
+        self.conn.commit()
+
+    # --------------------------------------------------------
+    # Batch extraction
+    # --------------------------------------------------------
+    def extract_many(self, docs) -> dict:
+        """
+        docs: iterable of (key, text).
+        Returns {key: {"events": [...], "people": [...], "dropped": n}}
+        (validated, see extraction_store) for every document whose chunks
+        all succeeded; failed documents are left out so the next run retries.
+        """
+        doc_chunks = {key: [(text_hash(c), c) for c in chunk_text(text or "")]
+                      for key, text in docs}
+        unique = {digest: chunk for chunks in doc_chunks.values() for digest, chunk in chunks}
+
+        responses = self._cached(unique)
+        self.cache_hits += len(responses)
+        missing = [(d, c) for d, c in unique.items() if d not in responses]
+        # {digest: RecordStream}: fresh answers come parsed; cached text is parsed here
+        parsed = {}
+        for digest, text in responses.items():
+            parsed[digest] = RecordStream()
+            parsed[digest].feed(text)
+
+        if missing:
+            t0 = time.time()
+            with ThreadPoolExecutor(max_workers=self.parallel) as pool:
+                futures = {pool.submit(self.generate, chunk): digest for digest, chunk in missing}
+                for future in as_completed(futures):
+                    digest = futures[future]
+                    try:
+                        responses[digest], parsed[digest] = future.result()
+                    except LLMError as e:
+                        log.warning(f"LLM chunk failed: {e}")
+                        continue
+                    self._store(digest, responses[digest])
+                    self.calls += 1
+            elapsed = time.time() - t0
+            log.info(
+                f"LLM {self.calls} chunks in {elapsed:.1f}s "
+                f"({self.calls / max(elapsed, 1e-6):.2f} chunks/s, parallel={self.parallel})"
+            )
+
+        results = {}
+        for key, chunks in doc_chunks.items():
+            if any(digest not in responses for digest, _ in chunks):
+                continue
+            records = [r for digest, _ in chunks for r in parsed[digest].records]
+            results[key] = clean_records(records)
+            results[key]["dropped"] += sum(parsed[digest].dropped for digest, _ in chunks)
+        return results
+
+    def extract(self, text: str) -> dict:
+        return self.extract_many([(0, text)]).get(0)
+
+# ============================================================
+# INCREMENTAL RESPONSE PARSING
+# ============================================================
+class RecordStream:
+    """
+    Incremental parser for {"people": [{...}], "events": [{...}]} (or a
+    bare list of events) fed in arbitrary pieces. Each array element is
+    decoded as soon as it closes; a malformed element is counted in
+    `dropped` and skipped, the rest of the response is kept.
+    """
+
+    def __init__(self):
+        self.records = []   # (kind, obj) in arrival order
+        self.dropped = 0
+        self.reset()
+
+    def reset(self):
+        """Start a new response (records collected so far are kept)."""
+        self.stack = []         # open containers, "{" / "["
+        self.in_string = False
+        self.escape = False
+        self.key = None         # last key seen in the top-level object
+        self._key = None        # chars of a top-level string being read
+        self._elem = None       # chars of the element being read
+        self._elem_depth = 0
+
+    def feed(self, text: str) -> list:
+        """Consume more text; returns the records completed by it."""
+        done = []
+        for ch in text:
+            if self._elem is not None:
+                self._elem.append(ch)
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self._key is not None:
+                        self.key, self._key = "".join(self._key), None
+                elif self._key is not None:
+                    self._key.append(ch)
+                continue
+
+            if ch == '"':
+                self.in_string = True
+                if self.stack == ["{"]:
+                    self._key = []
+            elif ch in "{[":
+                if ch == "{" and self._elem is None and self.stack in (["["], ["{", "["]):
+                    self._elem = ["{"]
+                    self._elem_depth = len(self.stack)
+                self.stack.append(ch)
+            elif ch in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if self._elem is not None and ch == "}" and len(self.stack) == self._elem_depth:
+                    record = self._finish()
+                    if record:
+                        done.append(record)
+
+        self.records.extend(done)
+        return done
+
+    def _finish(self):
+        raw, self._elem = "".join(self._elem), None
+        kind = self.key if self.stack and self.stack[0] == "{" else "events"
+        try:
+            return kind, json.loads(raw)
+        except ValueError:
+            self.dropped += 1
+            return None
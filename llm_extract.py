@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+LLM structured extraction (single pass, called by run_all.py).
+Validated people / events for OCR rows not yet extracted go to
+extracted_people / extracted_events (see extraction_store.py).
+Form-template rows are skipped: their fields are already structured
+(form_fields). Chunk responses are cached by llm_client, so a crash
+mid-pass or a re-run costs no model calls for text already seen.
+Old ocr_results.events text is migrated into the tables once.
+If the LLM is down the pass ends quietly; OCR results stay as they are.
+"""
+
+import sys
+import sqlite3
+import logging
+from pathlib import Path
+
+from extraction_store import ensure_schema, migrate_legacy_events, store_extraction
+from llm_client import LLMClient
+
+BASE = Path.home() / "genealogy"
+DB_PATH = BASE / "db/family_tree.db"
+
+BATCH_DOCS = 16   # documents per round (chunks of a round run concurrently)
+
+logging.basicConfig(
+    filename=BASE / ".genealogy_llm.log",
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s"
+)
+log = logging.getLogger("llm_extract")
+
+
+def pending(conn: sqlite3.Connection) -> list:
+    return conn.execute(
+        """
+        SELECT file_hash, text FROM ocr_results
+        WHERE extracted_at IS NULL
+        AND TRIM(COALESCE(text, '')) != ''
+        AND COALESCE(engine, '') NOT LIKE 'form:%'
+        ORDER BY id
+        """
+    ).fetchall()
+
+
+def main() -> int:
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    ensure_schema(conn)
+    migrated = migrate_legacy_events(conn)
+    if migrated:
+        log.info(f"Migrated {migrated} legacy events rows")
+
+    rows = pending(conn)
+    if not rows:
+        log.info("No OCR results awaiting extraction")
+        return 0
+
+    with LLMClient(conn) as client:
+        if not client.available():
+            return 0
+
+        done = events = people = dropped = 0
+        for i in range(0, len(rows), BATCH_DOCS):
+            results = client.extract_many(rows[i:i + BATCH_DOCS])
+            for file_hash, records in results.items():
+                store_extraction(conn, file_hash, records)
+                events += len(records["events"])
+                people += len(records["people"])
+                dropped += records["dropped"]
+            conn.commit()
+            done += len(results)
+
+        log.info(
+            f"Extracted {done}/{len(rows)} documents: {events} events, {people} people, "
+            f"{dropped} invalid records dropped | "
+            f"model calls={client.calls} cache hits={client.cache_hits}"
+        )
+    conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
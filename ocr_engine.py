@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 """
 OCR Engine
-- EasyOCR primary
-- TrOCR fallback (offline, local)
+- EasyOCR primary (loaded on first image)
+- TrOCR fallback (offline, local, loaded on demand, unloaded when idle)
 - OMV is backup only; models never loaded from network share
 """
 
@@ -23,10 +23,10 @@ os.environ["HF_HOME"] = str(LOCAL_MODEL_DIR)
 # ============================================================
 # STANDARD LIBS
 # ============================================================
-from datetime import datetime
-import hashlib
 import logging
 import sqlite3
+import threading
+import time
 
 # ============================================================
 # THIRD PARTY
@@ -34,14 +34,21 @@ import sqlite3
 import numpy as np
 import torch
 from PIL import Image
-import easyocr
-from transformers import TrOCRProcessor, VisionEncoderDecoderModel
 
 # ============================================================
 # INTERNAL MODULES
 # ============================================================
-from preprocess import preprocess_image
-from confidence_engine import OCRResult, evaluate
+from preprocess import DEFAULT_PROFILE, clean_array, preprocess_array
+import page_cache
+import page_source
+import file_router
+import form_templates
+from confidence_engine import OCRResult, evaluate, score_batch
+from resource_guard import budget_allows, release_memory, rss_mb
+from ocr_store import (
+    already_ocred, cached_angle, load_pages, store_page, store_results, stored_pages
+)
+from hash_cache import content_hash
 
 # ============================================================
 # PATHS + DB
@@ -50,6 +57,15 @@ DB_PATH = BASE / "db/family_tree.db"
 MODEL_ID = "microsoft/trocr-base-handwritten"
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
+# CPU tuning (i3-8100 = 4 cores). Override via environment.
+TORCH_THREADS = int(os.environ.get("GENEALOGY_TORCH_THREADS", os.cpu_count() or 4))
+TROCR_BATCH_SIZE = int(os.environ.get("GENEALOGY_TROCR_BATCH", "8"))
+torch.set_num_threads(TORCH_THREADS)
+
+TROCR_IDLE_TIMEOUT = 600   # seconds unused before TrOCR is unloaded
+TROCR_EST_MB = 1500        # approx. resident cost of trocr-base on CPU
+EASYOCR_EST_MB = 1000      # approx. resident cost of EasyOCR (en)
+
 # ============================================================
 # LOGGING
 # ============================================================
@@ -60,37 +76,116 @@ logging.basicConfig(
 )
 log = logging.getLogger("ocr_engine")
 log.info("OCR engine starting")
-log.info(f"DEVICE={DEVICE}")
+log.info(f"DEVICE={DEVICE} threads={TORCH_THREADS} trocr_batch={TROCR_BATCH_SIZE}")
 log.info(f"Local HF_HOME={LOCAL_MODEL_DIR}")
 
 # ============================================================
-# OCR ENGINES (INITIALIZED ONCE)
+# OCR ENGINES (LAZY)
 # ============================================================
+_easyocr_reader = None
+_easyocr_lock = threading.Lock()
+
+_trocr = None              # (processor, model) while loaded
+_trocr_failed = False      # offline load failed once, don't retry every page
+_trocr_last_used = 0.0
+_trocr_lock = threading.RLock()
+_reaper_started = False
+
+
+def get_easyocr():
+    """EasyOCR reader, built on first use and kept for the process lifetime."""
+    global _easyocr_reader
+    with _easyocr_lock:
+        if _easyocr_reader is None:
+            if not budget_allows(EASYOCR_EST_MB, "EasyOCR"):
+                log.warning("Loading EasyOCR over memory budget (primary engine)")
+            import easyocr
+            t0, before = time.time(), rss_mb()
+            _easyocr_reader = easyocr.Reader(["en"], gpu=False)
+            log.info(
+                f"EasyOCR loaded in {time.time() - t0:.1f}s | "
+                f"+{rss_mb() - before:.0f}MB RSS (now {rss_mb():.0f}MB)"
+            )
+        return _easyocr_reader
+
+
+def get_trocr():
+    """
+    TrOCR (processor, model), loaded on first use.
+    Returns (None, None) if unavailable offline or over the memory budget.
+    """
+    global _trocr, _trocr_failed, _trocr_last_used
+    with _trocr_lock:
+        _trocr_last_used = time.time()
+        if _trocr is not None:
+            return _trocr
+        if _trocr_failed or not budget_allows(TROCR_EST_MB, "TrOCR"):
+            return None, None
+
+        try:
+            from transformers import TrOCRProcessor, VisionEncoderDecoderModel
+            t0, before = time.time(), rss_mb()
+            processor = TrOCRProcessor.from_pretrained(MODEL_ID)
+            model = VisionEncoderDecoderModel.from_pretrained(MODEL_ID)
+            model.to(DEVICE)
+            model.eval()
+            _trocr = (processor, model)
+            log.info(
+                f"TrOCR loaded in {time.time() - t0:.1f}s (offline, local) | "
+                f"+{rss_mb() - before:.0f}MB RSS (now {rss_mb():.0f}MB)"
+            )
+        except Exception as e:
+            _trocr_failed = True
+            log.warning(f"TrOCR could not load offline: {e}")
+            return None, None
+
+        _start_reaper()
+        return _trocr
+
+
+def unload_trocr(reason="idle"):
+    global _trocr
+    with _trocr_lock:
+        if _trocr is None:
+            return
+        before = rss_mb()
+        _trocr = None
+        release_memory()
+        log.info(
+            f"TrOCR unloaded ({reason}) | "
+            f"freed {before - rss_mb():.0f}MB RSS (now {rss_mb():.0f}MB)"
+        )
 
-# EasyOCR primary
-easyocr_reader = easyocr.Reader(["en"], gpu=False)
 
-# TrOCR fallback (offline, local)
-trocr_processor = None
-trocr_model = None
-try:
-    trocr_processor = TrOCRProcessor.from_pretrained(MODEL_ID)
-    trocr_model = VisionEncoderDecoderModel.from_pretrained(MODEL_ID)
-    trocr_model.to(DEVICE)
-    trocr_model.eval()
-    log.info("TrOCR loaded successfully (offline, local)")
-except Exception as e:
-    log.warning(f"TrOCR could not load offline: {e}")
+def unload_idle_models():
+    """Drop TrOCR if unused for TROCR_IDLE_TIMEOUT seconds."""
+    with _trocr_lock:
+        if _trocr is not None and time.time() - _trocr_last_used > TROCR_IDLE_TIMEOUT:
+            unload_trocr("idle")
+
+
+def _start_reaper():
+    global _reaper_started
+    if _reaper_started:
+        return
+    _reaper_started = True
+
+    def reaper():
+        while True:
+            time.sleep(30)
+            try:
+                unload_idle_models()
+            except Exception as e:
+                log.warning(f"Idle unload failed: {e}")
+
+    threading.Thread(target=reaper, daemon=True, name="trocr-reaper").start()
 
 # ============================================================
 # UTILS
 # ============================================================
-def hash_file(path: Path) -> str:
-    """Compute SHA256 hash of file contents."""
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        h.update(f.read())
-    return h.hexdigest()
+def hash_file(path: Path, conn: sqlite3.Connection = None) -> str:
+    """SHA256 of file contents (cached on path/size/mtime/inode)."""
+    return content_hash(path, conn)
 
 
 def get_confidence(scores):
@@ -100,118 +195,429 @@ def get_confidence(scores):
     return sum(scores) / len(scores)
 
 
+# ============================================================
+# REGIONS + LINES (TrOCR is a single-line model)
+# ============================================================
+LINE_PAD = 4  # pixels of margin around each line crop
+
+
+def _box_bounds(box):
+    """EasyOCR quad [[x,y]*4] -> (x0, y0, x1, y1)."""
+    xs = [p[0] for p in box]
+    ys = [p[1] for p in box]
+    return int(min(xs)), int(min(ys)), int(max(xs)), int(max(ys))
+
+
+def group_lines(bounds):
+    """
+    Group region bounds (x0, y0, x1, y1) into text lines: a region whose
+    vertical centre falls inside a line's span joins that line.
+    Returns lists of indexes, lines top → bottom, each left → right.
+    """
+    lines = []  # [y0, y1, [indexes]]
+    for i in sorted(range(len(bounds)), key=lambda i: bounds[i][1]):
+        x0, y0, x1, y1 = bounds[i]
+        cy = (y0 + y1) / 2
+        for line in lines:
+            if line[0] <= cy <= line[1]:
+                line[0] = min(line[0], y0)
+                line[1] = max(line[1], y1)
+                line[2].append(i)
+                break
+        else:
+            lines.append([y0, y1, [i]])
+    return [
+        sorted(idx, key=lambda i: bounds[i][0])
+        for _, _, idx in sorted(lines, key=lambda l: l[0])
+    ]
+
+
+def lines_from_projection(np_img, min_height=8):
+    """
+    Fallback when EasyOCR detected nothing: split the page on blank rows
+    of the horizontal ink profile (text is dark on the binarized page).
+    """
+    ink = (np_img < 128).sum(axis=1)
+    if ink.size == 0:
+        return []
+    rows = ink > max(2, ink.max() * 0.02)
+    lines = []
+    start = None
+    for y, has_ink in enumerate(rows):
+        if has_ink and start is None:
+            start = y
+        elif not has_ink and start is not None:
+            if y - start >= min_height:
+                lines.append((0, start, np_img.shape[1], y))
+            start = None
+    if start is not None and len(rows) - start >= min_height:
+        lines.append((0, start, np_img.shape[1], len(rows)))
+    return lines
+
+
+def crop_lines(np_img: np.ndarray, lines):
+    """Line bounds -> RGB PIL crops (TrOCR processor input)."""
+    h, w = np_img.shape[:2]
+    crops = []
+    for x0, y0, x1, y1 in lines:
+        crop = np_img[
+            max(0, y0 - LINE_PAD):min(h, y1 + LINE_PAD),
+            max(0, x0 - LINE_PAD):min(w, x1 + LINE_PAD)
+        ]
+        crops.append(Image.fromarray(crop).convert("RGB"))
+    return crops
+
+
+def trocr_recognize_lines(crops, batch_size=None):
+    """
+    Run TrOCR over line/region crops in fixed-size batches.
+    Returns [(text, confidence)] in crop order, or None if TrOCR is
+    unavailable. Confidence is the mean token probability.
+    """
+    batch_size = batch_size or TROCR_BATCH_SIZE
+    with _trocr_lock:
+        processor, model = get_trocr()
+        if not processor or not model:
+            return None
+
+        outputs = []
+        t0 = time.time()
+        with torch.inference_mode():
+            for i in range(0, len(crops), batch_size):
+                batch = crops[i:i + batch_size]
+                pixel_values = processor(images=batch, return_tensors="pt").pixel_values.to(DEVICE)
+                gen = model.generate(
+                    pixel_values, output_scores=True, return_dict_in_generate=True
+                )
+                texts = processor.batch_decode(gen.sequences, skip_special_tokens=True)
+                outputs.extend(zip(texts, _sequence_confidence(model, processor, gen)))
+
+        elapsed = time.time() - t0
+        if crops:
+            log.info(
+                f"TrOCR {len(crops)} lines in {elapsed:.1f}s "
+                f"({len(crops) / max(elapsed, 1e-6):.2f} lines/s, batch={batch_size})"
+            )
+        return outputs
+
+
+def _sequence_confidence(model, processor, gen):
+    """Mean per-token probability of each generated sequence."""
+    try:
+        trans = model.compute_transition_scores(
+            gen.sequences, gen.scores, normalize_logits=True
+        )
+        probs = torch.exp(trans)
+        mask = (gen.sequences[:, 1:] != processor.tokenizer.pad_token_id).float()
+        conf = (probs * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+        return [float(c) for c in conf]
+    except Exception as e:
+        log.warning(f"TrOCR confidence unavailable: {e}")
+        return [0.75] * len(gen.sequences)  # heuristic
+
+
 # ============================================================
 # CORE OCR FUNCTION
 # ============================================================
+def is_image(file_path: Path) -> bool:
+    return file_router.classify(file_path) in file_router.IMAGE_ROUTES
+
+
+def text_result(text: str, route: str = "text") -> dict:
+    """Result for files that need no OCR; engine records the route taken."""
+    decision = evaluate(
+        OCRResult(text=text, engine=route, confidence=1.0 if text.strip() else 0.0)
+    )
+    return {
+        "text": text,
+        "engine": route,
+        "confidence": decision["confidence"],
+        "raw_confidence": decision["raw_confidence"],
+        "needs_review": decision["needs_review"]
+    }
+
+
+def recognize_image(img, name="", confidence_threshold=0.5) -> dict:
+    """
+    OCR a preprocessed page (grayscale NumPy array or PIL Image):
+    EasyOCR on every region, TrOCR only on low-confidence regions,
+    confidence evaluation.
+    Returns: dict {text, engine, confidence, needs_review, regions}
+    """
+    np_img = np.asarray(img)
+
+    # Known form layout: OCR only its field regions, keep the structure
+    try:
+        template, score = form_templates.match(np_img)
+        if template:
+            return recognize_form(np_img, template, score, name)
+    except Exception as e:
+        log.warning(f"Form template match failed for {name}: {e}")
+
+    # EasyOCR first: detection + recognition for every region
+    regions = [
+        {
+            "box": _box_bounds(box),
+            "easyocr_text": text,
+            "easyocr_conf": float(conf),
+            "text": text,
+            "confidence": float(conf),
+            "engine": "easyocr"
+        }
+        for box, text, conf in get_easyocr().readtext(np_img, detail=1)
+    ]
+    if not regions:
+        # Nothing detected (faint handwriting): TrOCR on projection lines
+        regions = [
+            {"box": b, "easyocr_text": "", "easyocr_conf": 0.0,
+             "text": "", "confidence": 0.0, "engine": "easyocr"}
+            for b in lines_from_projection(np_img)
+        ]
+
+    # Cascade: only weak regions go to TrOCR (one batched pass),
+    # the reading with the higher calibrated confidence wins per region
+    weak = [r for r in regions if r["confidence"] < confidence_threshold]
+    if weak:
+        try:
+            outputs = trocr_recognize_lines(crop_lines(np_img, [r["box"] for r in weak]))
+            if outputs:
+                n = len(weak)
+                scores = score_batch(
+                    ["easyocr"] * n + ["trocr"] * n,
+                    [r["confidence"] for r in weak] + [conf for _, conf in outputs]
+                )
+                for r, (text, conf), easy, trocr in zip(weak, outputs, scores[:n], scores[n:]):
+                    if text.strip() and trocr > easy:
+                        r.update(text=text.strip(), confidence=conf, engine="trocr")
+        except Exception as e:
+            log.warning(f"TrOCR retry failed for {name}: {e}")
+
+    # Merge back in reading order
+    ocr_text = "\n".join(
+        " ".join(regions[i]["text"] for i in line if regions[i]["text"])
+        for line in group_lines([r["box"] for r in regions])
+    ).strip()
+
+    filled = [r for r in regions if r["text"]]
+    weight = sum(len(r["text"]) for r in filled)
+    confidence = (
+        sum(r["confidence"] * len(r["text"]) for r in filled) / weight if weight else 0.0
+    )
+    engines = {r["engine"] for r in filled}
+    engine_used = "cascade" if len(engines) > 1 else (engines.pop() if engines else "easyocr")
+
+    log.info(
+        f"{name}: {len(regions)} regions, {len(weak)} to TrOCR, "
+        f"{sum(r['engine'] == 'trocr' for r in regions)} replaced"
+    )
+
+    # --------------------------------------------------------
+    # CONFIDENCE ENGINE DELEGATION
+    # --------------------------------------------------------
+    decision = evaluate(
+        OCRResult(
+            text=ocr_text,
+            engine=engine_used,
+            confidence=confidence
+        )
+    )
+
+    return {
+        "text": ocr_text,
+        "engine": engine_used,
+        "confidence": decision["confidence"],
+        "raw_confidence": decision["raw_confidence"],
+        "needs_review": decision["needs_review"],
+        "regions": regions
+    }
+
+
+def recognize_form(np_img, template, score, name="") -> dict:
+    """Structured result for a page matching a stored form template."""
+    fields = form_templates.ocr_fields(get_easyocr(), np_img, template)
+    filled = {k: v for k, v in fields.items() if v[0]}
+    confidence = get_confidence([c for _, c in filled.values()])
+    engine_used = f"form:{template['name']}"
+    log.info(
+        f"{name} matched form '{template['name']}' ({score:.2f}), "
+        f"{len(filled)}/{len(fields)} fields filled"
+    )
+
+    decision = evaluate(
+        OCRResult(
+            text="",
+            engine=engine_used,
+            confidence=confidence
+        )
+    )
+    return {
+        "text": "\n".join(f"{k}: {v}" for k, (v, _) in filled.items()),
+        "engine": engine_used,
+        "confidence": decision["confidence"],
+        "raw_confidence": decision["raw_confidence"],
+        "needs_review": decision["needs_review"],
+        "template_id": template["id"],
+        "fields": fields
+    }
+
+
+def preprocess_cached(file_path: Path, file_hash=None, angle=None, profile=DEFAULT_PROFILE):
+    """
+    Preprocessed page from page_cache when available, else preprocess
+    and cache it. Returns (np_img, deskew_angle).
+    """
+    if file_hash:
+        cached = page_cache.get(file_hash, profile)
+        if cached is not None:
+            return cached
+
+    np_img, angle = preprocess_array(file_path, profile, angle)
+    if file_hash:
+        try:
+            page_cache.put(file_hash, profile, np_img, angle)
+        except OSError as e:
+            log.warning(f"Page cache write failed for {file_path.name}: {e}")
+    return np_img, angle
+
+
+# ============================================================
+# PAGED DOCUMENTS (PDF, MULTI-FRAME TIFF)
+# ============================================================
+def recognize_page(page, name="", confidence_threshold=0.5, cache_key=None) -> dict:
+    """OCR one page from page_source (text layer pages skip OCR)."""
+    if page.text is not None:
+        return text_result(page.text, "pdf-text")
+
+    cached = page_cache.get(cache_key, DEFAULT_PROFILE) if cache_key else None
+    if cached is not None:
+        np_img, angle = cached
+    else:
+        np_img, angle = clean_array(page.gray, dpi=page.dpi)
+        if cache_key:
+            try:
+                page_cache.put(cache_key, DEFAULT_PROFILE, np_img, angle)
+            except OSError as e:
+                log.warning(f"Page cache write failed for {name} p{page.number}: {e}")
+
+    result = recognize_image(np_img, f"{name} p{page.number}", confidence_threshold)
+    result["deskew_angle"] = angle
+    return result
+
+
+def combine_pages(pages) -> dict:
+    """Document-level result from page results (in page order)."""
+    engines = {p["engine"] for p in pages}
+    return {
+        "text": "\n\n".join(p["text"] for p in pages if p["text"].strip()),
+        "engine": engines.pop() if len(engines) == 1 else ("mixed" if engines else "pdf"),
+        "confidence": sum(p["confidence"] for p in pages) / len(pages) if pages else 0.0,
+        "raw_confidence": (
+            sum(p.get("raw_confidence", p["confidence"]) for p in pages) / len(pages)
+            if pages else 0.0
+        ),
+        "needs_review": not pages or any(p["needs_review"] for p in pages)
+    }
+
+
+def run_paged(file_path: Path, conn: sqlite3.Connection, file_hash: str,
+              confidence_threshold=0.5):
+    """
+    Stream a paged document one page at a time, committing each page to
+    ocr_pages. Pages already stored are skipped, so a 400-page book
+    resumes where it stopped. Returns the combined result, or None if
+    the document could not be read (e.g. PyMuPDF missing).
+    """
+    total = page_source.page_count(file_path)
+    if total == 0:
+        log.warning(f"No readable pages in {file_path.name}")
+        return None
+
+    done = stored_pages(conn, file_hash)
+    if done:
+        log.info(f"Resuming {file_path.name} at page {len(done) + 1}/{total}")
+
+    for page in page_source.iter_pages(file_path, skip=done):
+        result = recognize_page(
+            page, file_path.name, confidence_threshold, f"{file_hash}_p{page.number}"
+        )
+        store_page(conn, file_hash, file_path, page.number, result)
+        log.info(
+            f"{file_path.name} page {page.number}/{total} | "
+            f"{result['engine']} {result['confidence']:.2f}"
+        )
+
+    return combine_pages(load_pages(conn, file_hash))
+
+
+def recognize(file_path: Path, confidence_threshold=0.5, angle=None, file_hash=None) -> dict:
+    """
+    Preprocess image → OCR → confidence evaluation. No DB access,
+    so it can run inside pool workers. With file_hash the preprocessed
+    page comes from / goes to page_cache; a cached deskew angle skips
+    the skew search.
+    Returns: dict {text, engine, confidence, needs_review[, deskew_angle]}
+    (paged documents add pages: [(page_no, page result)])
+    """
+    route = file_router.classify(file_path)
+
+    if route in file_router.PAGED_ROUTES:
+        # No DB here: whole document in one go (pages still streamed);
+        # the page results go back too, for ocr_store to write ocr_pages
+        pages = [
+            (page.number, recognize_page(
+                page, file_path.name, confidence_threshold,
+                f"{file_hash}_p{page.number}" if file_hash else None
+            ))
+            for page in page_source.iter_pages(file_path)
+        ]
+        result = combine_pages([r for _, r in pages])
+        result["pages"] = pages
+        return result
+
+    if route in file_router.IMAGE_ROUTES:
+        np_img, angle = preprocess_cached(file_path, file_hash, angle)
+        result = recognize_image(np_img, file_path.name, confidence_threshold)
+        result["deskew_angle"] = angle
+        return result
+
+    # NO-OCR ROUTES (text, docx, odt, rtf) + unsupported binaries
+    return text_result(file_router.extract_text(file_path, route), route)
+
+
 def run_ocr(file_path: Path, conn: sqlite3.Connection, confidence_threshold=0.5):
     """
     Preprocess image → OCR → confidence evaluation → store result.
     Returns: dict {text, engine, confidence, needs_review}
     """
-    cursor = conn.cursor()
-    file_hash = hash_file(file_path)
+    file_hash = hash_file(file_path, conn)
 
     # Check if already processed
-    cursor.execute("SELECT id FROM ocr_results WHERE file_hash=?", (file_hash,))
-    if cursor.fetchone():
+    if already_ocred(conn, file_hash):
         log.info(f"OCR already exists for {file_path.name}")
         return None
 
     log.info(f"Processing {file_path.name}")
 
-    img = None
-    text = ""
+    route = file_router.classify(file_path)
+    log.info(f"Route for {file_path.name}: {route}")
 
-    # ------------------------------------------------------------
-    # PREPROCESS
-    # ------------------------------------------------------------
-    if file_path.suffix.lower() in [".png", ".jpg", ".jpeg", ".bmp", ".tiff"]:
-        img = preprocess_image(file_path)
+    if route in file_router.PAGED_ROUTES:
+        result = run_paged(file_path, conn, file_hash, confidence_threshold)
+        if result is None:
+            return None
     else:
-        try:
-            text = file_path.read_text(errors="ignore")
-        except Exception:
-            text = ""
-
-    # ------------------------------------------------------------
-    # OCR
-    # ------------------------------------------------------------
-    ocr_text = ""
-    engine_used = ""
-    confidence = 0.0
-    needs_review = False
-
-    # IMAGE OCR
-    if img is not None:
-        # EasyOCR first
-        easy_results = easyocr_reader.readtext(np.array(img), detail=1)
-        ocr_text = "\n".join([t[1] for t in easy_results])
-        confidence = get_confidence([t[2] for t in easy_results])
-        engine_used = "easyocr"
-
-        # Retry with TrOCR if confidence low and TrOCR loaded
-        if confidence < confidence_threshold and trocr_processor and trocr_model:
-            try:
-                trocr_inputs = trocr_processor(images=img, return_tensors="pt").to(DEVICE)
-                output_ids = trocr_model.generate(**trocr_inputs)
-                ocr_text = trocr_processor.batch_decode(
-                    output_ids, skip_special_tokens=True
-                )[0]
-                confidence = 0.75  # heuristic
-                engine_used = "trocr"
-            except Exception as e:
-                log.warning(f"TrOCR retry failed for {file_path.name}: {e}")
-
-        # --------------------------------------------------------
-        # CONFIDENCE ENGINE DELEGATION
-        # --------------------------------------------------------
-        decision = evaluate(
-            OCRResult(
-                text=ocr_text,
-                engine=engine_used,
-                confidence=confidence
-            )
-        )
-        confidence = decision["confidence"]
-        needs_review = decision["needs_review"]
-
-    # NON-IMAGE FILES
-    else:
-        ocr_text = text
-        engine_used = "text"
-        confidence = 1.0 if text.strip() else 0.0
-        needs_review = not bool(text.strip())
+        result = recognize(file_path, confidence_threshold, cached_angle(conn, file_hash), file_hash)
 
     # ------------------------------------------------------------
     # SAVE TO DB
     # ------------------------------------------------------------
-    cursor.execute(
-        """
-        INSERT INTO ocr_results
-        (file_hash, file_path, engine, confidence, text, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (
-            file_hash,
-            str(file_path),
-            engine_used,
-            confidence,
-            ocr_text,
-            datetime.utcnow().isoformat()
-        )
-    )
-    conn.commit()
+    store_results(conn, [(file_hash, file_path, result)])
 
     log.info(
         f"OCR complete for {file_path.name} | "
-        f"Engine: {engine_used} | "
-        f"Confidence: {confidence:.2f} | "
-        f"Needs review: {needs_review}"
+        f"Engine: {result['engine']} | "
+        f"Confidence: {result['confidence']:.2f} | "
+        f"Needs review: {result['needs_review']}"
     )
 
-    return {
-        "text": ocr_text,
-        "engine": engine_used,
-        "confidence": confidence,
-        "needs_review": needs_review
-    }
+    return result
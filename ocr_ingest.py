@@ -3,19 +3,29 @@
 Single-pass OCR ingest worker.
 NO daemon loop.
 Called by run_all.py
+
+If the persistent OCR worker (ocr_worker.py) is alive, files are only
+queued for it and the OCR engines are never imported here.
+Otherwise files are OCRed here: inline, across a process pool when
+GENEALOGY_OCR_WORKERS > 1 (big scan drops), or as a streaming
+decode → denoise → recognize → store pipeline when GENEALOGY_OCR_PIPELINE=1.
 """
 
-import sqlite3
 from pathlib import Path
 from datetime import datetime
 from schema_guard import normalize_people_name
 import shutil
-import hashlib
 import logging
 import os
+import sys
 import time
+import queue
+import threading
+import multiprocessing
 
-from ocr_engine import run_ocr
+from ocr_queue import connect, enqueue, queue_depth, worker_health
+from ocr_store import already_ocred, cached_angle, cached_angles, store_results
+from hash_cache import content_hash, ensure_hash_cache, forget, remember
 import signal
 
 def watchdog(seconds=300):
@@ -36,6 +46,27 @@ DB_PATH = BASE / "db" / "family_tree.db"
 for p in (INCOMING, PROCESSED, HTML_DIR, DB_PATH.parent):
     p.mkdir(parents=True, exist_ok=True)
 
+# ============================================================
+# PARALLEL INGEST CONFIG
+# ============================================================
+# Worker processes (1 = inline). Each worker loads its own OCR engine.
+OCR_WORKERS = int(os.environ.get("GENEALOGY_OCR_WORKERS", "1"))
+# Torch intra-op threads per worker; default splits the cores evenly
+TORCH_THREADS_PER_WORKER = int(os.environ.get(
+    "GENEALOGY_WORKER_THREADS",
+    max(1, (os.cpu_count() or 4) // max(1, OCR_WORKERS))
+))
+JOB_TIMEOUT = 300   # seconds per file (same cap as the inline watchdog)
+WRITE_BATCH = 20    # results per DB commit
+
+# ============================================================
+# PIPELINE CONFIG
+# ============================================================
+OCR_PIPELINE = os.environ.get("GENEALOGY_OCR_PIPELINE", "0") == "1"
+QUEUE_DEPTH = 4       # pages buffered between stages (caps memory)
+DECODE_THREADS = 1    # disk read + image decode
+DENOISE_THREADS = 2   # OpenCV releases the GIL
+
 # ============================================================
 # LOGGING
 # ============================================================
@@ -46,79 +77,476 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s"
 )
 log = logging.getLogger("ocr_ingest")
-log.info("OCR ingest started (single pass)")
 
 # ============================================================
-# DB
+# PROCESS
 # ============================================================
-conn = sqlite3.connect(DB_PATH)
-normalize_people_name(conn)
-cursor = conn.cursor()
+def page_budget(path: Path) -> int:
+    """Pages in the document (1 for single images); scales the watchdog."""
+    import page_source
+    if not page_source.is_paged(path):
+        return 1
+    try:
+        return max(1, page_source.page_count(path))
+    except Exception:
+        return 1
 
-# ============================================================
-# HASH
-# ============================================================
-def sha256(path: Path) -> str:
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-    return h.hexdigest()
+def process_file(path: Path, conn) -> bool:
+    """
+    OCR one file and move it to processed/.
+    Returns True when the file is done (or was already OCRed).
+    """
+    # Imported here so queue-only runs never load the OCR models
+    from ocr_engine import run_ocr
 
-# ============================================================
-# PROCESS
-# ============================================================
-def process_file(path: Path, conn):
     if path.is_dir():
-        return
+        return False
 
     cursor = conn.cursor()
-    file_hash = sha256(path)
+    file_hash = content_hash(path, conn)
 
     cursor.execute(
         "SELECT 1 FROM ocr_results WHERE file_hash=?",
         (file_hash,)
     )
     if cursor.fetchone():
+        # Out of incoming/ like any finished file, or it is re-hashed
+        # (and in service mode re-queued) every cycle
         log.info(f"Already OCRed: {path.name}")
-        return
+        move_to_processed(path, file_hash, conn)
+        return True
 
     log.info(f"OCR start: {path.name}")
 
     try:
-        watchdog(300)  # ⏱ 5 minute hard cap per file
+        watchdog(JOB_TIMEOUT * page_budget(path))  # ⏱ 5 minute hard cap per page
         result = run_ocr(path, conn)
     except TimeoutError as e:
         log.error(f"OCR timeout: {path.name}")
-        return
+        return False
     except Exception as e:
         log.error(f"OCR failed: {path.name} — {e}")
-        return
+        return False
     finally:
         signal.alarm(0)  # 🔴 ALWAYS clear alarm
 
     if not result:
         log.warning(f"OCR skipped: {path.name}")
-        return
+        return False
+
+    move_to_processed(path, file_hash, conn)
+
+    log.info(f"Completed: {path.name}")
+    return True
 
+def move_to_processed(path: Path, file_hash=None, conn=None):
     dest = PROCESSED / f"{path.stem}_{datetime.utcnow():%Y%m%d_%H%M%S}{path.suffix}"
     shutil.move(str(path), dest)
+    # Carry the hash over so processed/ is never re-read
+    if file_hash:
+        remember(dest, file_hash, conn)
+        forget(path, conn)
 
-    log.info(f"Completed: {path.name}")
+# ============================================================
+# PARALLEL (PROCESS POOL)
+# ============================================================
+def _init_pool_worker(threads):
+    os.environ["GENEALOGY_TORCH_THREADS"] = str(threads)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import ocr_engine
+    # Explicit too: the env var is only read when ocr_engine is first imported
+    ocr_engine.torch.set_num_threads(threads)
+    ocr_engine.get_easyocr()
+
+
+def _pool_job(path_str, angle=None, file_hash=None):
+    import ocr_engine
+    return ocr_engine.recognize(Path(path_str), angle=angle, file_hash=file_hash)
+
+
+def _new_pool():
+    # spawn, not fork: the parent may already have torch / OpenMP threads
+    # running (process_file imports ocr_engine), and a forked child inherits
+    # their thread count and can deadlock on their locks
+    return multiprocessing.get_context("spawn").Pool(
+        OCR_WORKERS,
+        initializer=_init_pool_worker,
+        initargs=(TORCH_THREADS_PER_WORKER,)
+    )
+
+
+def parallel_ingest(files, conn):
+    """
+    OCR files across OCR_WORKERS processes.
+    - Each worker keeps a warm engine for the whole run
+    - Per-job timeout without SIGALRM: a stuck pool is terminated and
+      rebuilt, unfinished jobs are resubmitted
+    - This process is the single DB writer, committing in batches
+    """
+    todo = []
+    seen = set()
+    for f in files:
+        file_hash = content_hash(f, conn)
+        if file_hash in seen:
+            continue    # same content earlier in this run; next run moves it
+        if already_ocred(conn, file_hash):
+            log.info(f"Already OCRed: {f.name}")
+            move_to_processed(f, file_hash, conn)
+            continue
+        seen.add(file_hash)
+        todo.append((f, file_hash))
+    todo.reverse()  # pop() from the end keeps sorted order
+
+    log.info(
+        f"Parallel ingest: {len(todo)} files, {OCR_WORKERS} workers x "
+        f"{TORCH_THREADS_PER_WORKER} threads"
+    )
+
+    pool = _new_pool()
+    running = {}   # AsyncResult -> (path, hash, started)
+    batch = []
+    done = failed = 0
+    t0 = time.time()
+
+    def flush():
+        nonlocal done
+        if not batch:
+            return
+        store_results(conn, batch)
+        for file_hash, path, _ in batch:
+            move_to_processed(path, file_hash, conn)
+            log.info(f"Completed: {path.name}")
+        done += len(batch)
+        batch.clear()
+
+    try:
+        while todo or running:
+            # Keep exactly one job per worker so submit time ≈ start time
+            while todo and len(running) < OCR_WORKERS:
+                path, file_hash = todo.pop()
+                log.info(f"OCR start: {path.name}")
+                ar = pool.apply_async(
+                    _pool_job, (str(path), cached_angle(conn, file_hash), file_hash)
+                )
+                running[ar] = (path, file_hash, time.time())
+
+            time.sleep(0.2)
+            timed_out = False
+
+            for ar, (path, file_hash, started) in list(running.items()):
+                if ar.ready():
+                    del running[ar]
+                    try:
+                        result = ar.get()
+                        batch.append((file_hash, path, result))
+                    except Exception as e:
+                        failed += 1
+                        log.error(f"OCR failed: {path.name} — {e}")
+                elif time.time() - started > JOB_TIMEOUT:
+                    del running[ar]
+                    failed += 1
+                    timed_out = True
+                    log.error(f"OCR timeout: {path.name}")
+
+            if timed_out:
+                # Only way to stop a stuck worker: kill the pool, requeue the rest
+                pool.terminate()
+                pool.join()
+                for path, file_hash, _ in running.values():
+                    todo.append((path, file_hash))
+                running.clear()
+                pool = _new_pool()
+
+            if len(batch) >= WRITE_BATCH:
+                flush()
+
+        flush()
+    finally:
+        pool.terminate()
+        pool.join()
+
+    elapsed = time.time() - t0
+    log.info(
+        f"Parallel ingest done: {done} ok, {failed} failed in {elapsed:.0f}s "
+        f"({done / max(elapsed, 1e-6) * 60:.1f} files/min)"
+    )
+
+# ============================================================
+# PIPELINED (STREAMING STAGES)
+# ============================================================
+_END = object()  # end-of-stream marker
+
+
+class StageStats:
+    """Per-stage throughput counters."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds, ok=True):
+        with self.lock:
+            self.busy += seconds
+            if ok:
+                self.items += 1
+            else:
+                self.failed += 1
+
+    def summary(self, wall):
+        rate = self.items / self.busy if self.busy else 0.0
+        return (
+            f"{self.name}: {self.items} ok {self.failed} failed | "
+            f"busy {self.busy:.1f}s ({rate:.2f}/s busy, "
+            f"{self.items / max(wall, 1e-6):.2f}/s wall)"
+        )
+
+
+def _run_stage(fn, q_in, q_out, stats, threads):
+    """
+    Start `threads` workers applying fn to items from q_in.
+    fn returns the item for the next stage, or None to drop it.
+    The last worker to see the end marker forwards it downstream.
+    """
+    remaining = [threads]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            item = q_in.get()
+            if item is _END:
+                q_in.put(_END)  # let sibling workers see it too
+                with lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    q_out.put(_END)
+                return
+
+            t0 = time.time()
+            try:
+                out = fn(item)
+                stats.add(time.time() - t0)
+            except Exception as e:
+                stats.add(time.time() - t0, ok=False)
+                log.error(f"{stats.name} failed: {item['path'].name} — {e}")
+                continue
+            if out is not None:
+                q_out.put(out)
+
+    for i in range(threads):
+        threading.Thread(target=worker, daemon=True, name=f"{stats.name}-{i}").start()
+
+
+def pipelined_ingest(files, conn):
+    """
+    decode → denoise → recognize → store, joined by bounded queues so
+    disk reads, OpenCV and the OCR model overlap instead of taking turns.
+    This thread is the store stage (single DB writer, batched commits).
+    """
+    import ocr_engine
+    import page_cache
+    import file_router
+    from preprocess import DEFAULT_PROFILE, load_gray, clean_array, source_dpi
+
+    stored = {row[0] for row in conn.execute("SELECT file_hash FROM ocr_results")}
+    known = set(stored)
+    angles = cached_angles(conn)
+    known_lock = threading.Lock()
+
+    stats = {name: StageStats(name) for name in ("decode", "denoise", "recognize", "store")}
+    q_paths = queue.Queue()
+    q_decoded = queue.Queue(maxsize=QUEUE_DEPTH)
+    q_clean = queue.Queue(maxsize=QUEUE_DEPTH)
+    q_results = queue.Queue(maxsize=QUEUE_DEPTH)
+
+    def decode(item):
+        path = item["path"]
+        item["hash"] = content_hash(path)
+        with known_lock:
+            if item["hash"] in known:
+                if item["hash"] in stored:
+                    log.info(f"Already OCRed: {path.name}")
+                    move_to_processed(path, item["hash"])   # this thread's hash_cache connection
+                return None
+            known.add(item["hash"])
+        item["route"] = file_router.classify(path)
+        if item["route"] in file_router.IMAGE_ROUTES:
+            cached = page_cache.get(item["hash"], DEFAULT_PROFILE)
+            if cached is not None:
+                item["img"], item["angle"] = cached
+            else:
+                item["gray"] = load_gray(path)
+                item["dpi"] = source_dpi(path)
+        else:
+            item["text"] = file_router.extract_text(path, item["route"])
+        return item
+
+    def denoise(item):
+        if "gray" in item:
+            item["img"], item["angle"] = clean_array(
+                item.pop("gray"), dpi=item.get("dpi"), angle=angles.get(item["hash"])
+            )
+            try:
+                page_cache.put(item["hash"], DEFAULT_PROFILE, item["img"], item["angle"])
+            except OSError as e:
+                log.warning(f"Page cache write failed for {item['path'].name}: {e}")
+        return item
+
+    def recognize(item):
+        path = item["path"]
+        if "img" in item:
+            item["result"] = ocr_engine.recognize_image(item.pop("img"), path.name)
+            item["result"]["deskew_angle"] = item["angle"]
+        else:
+            item["result"] = ocr_engine.text_result(item.pop("text"), item["route"])
+        return item
+
+    for f in files:
+        q_paths.put({"path": f})
+    q_paths.put(_END)
+
+    t0 = time.time()
+    _run_stage(decode, q_paths, q_decoded, stats["decode"], DECODE_THREADS)
+    _run_stage(denoise, q_decoded, q_clean, stats["denoise"], DENOISE_THREADS)
+    _run_stage(recognize, q_clean, q_results, stats["recognize"], 1)
+
+    batch = []
+
+    def flush():
+        if not batch:
+            return
+        s0 = time.time()
+        store_results(conn, [(i["hash"], i["path"], i["result"]) for i in batch])
+        for i in batch:
+            move_to_processed(i["path"], i["hash"], conn)
+            log.info(f"Completed: {i['path'].name}")
+        per_item = (time.time() - s0) / len(batch)
+        for _ in batch:
+            stats["store"].add(per_item)
+        batch.clear()
+
+    while True:
+        item = q_results.get()
+        if item is _END:
+            break
+        batch.append(item)
+        if len(batch) >= WRITE_BATCH:
+            flush()
+    flush()
+
+    wall = time.time() - t0
+    log.info(f"Pipelined ingest done in {wall:.1f}s")
+    for st in stats.values():
+        log.info("  " + st.summary(wall))
+    slowest = max(stats.values(), key=lambda st: st.busy)
+    log.info(f"  bottleneck: {slowest.name}")
+
+# ============================================================
+# RE-OCR (AFTER THRESHOLD / EVALUATOR CHANGES)
+# ============================================================
+def reocr_processed(conn):
+    """
+    Re-run recognition over processed/ and replace the stored results.
+    Pages come from page_cache, so preprocessing is skipped entirely
+    for anything OCRed since the cache existed.
+    """
+    import ocr_engine
+
+    files = [f for f in sorted(PROCESSED.iterdir()) if f.is_file()]
+    log.info(f"Re-OCR of {len(files)} processed files")
+
+    batch = []
+    for f in files:
+        try:
+            file_hash = content_hash(f, conn)
+            result = ocr_engine.recognize(f, angle=cached_angle(conn, file_hash), file_hash=file_hash)
+            batch.append((file_hash, f, result))
+        except Exception as e:
+            log.error(f"Re-OCR failed: {f.name} — {e}")
+        if len(batch) >= WRITE_BATCH:
+            store_results(conn, batch, replace=True)
+            batch.clear()
+    store_results(conn, batch, replace=True)
+    log.info("Re-OCR finished")
 
 # ============================================================
 # RUN ONCE
 # ============================================================
-processed_any = False
+def main():
+    log.info("OCR ingest started (single pass)")
 
-for f in sorted(INCOMING.iterdir()):
-    try:
-        process_file(f)
-        processed_any = True
-    except Exception as e:
-        log.exception(f"Failed {f.name}: {e}")
+    conn = connect(DB_PATH)
+    normalize_people_name(conn)
+    ensure_hash_cache(conn)
+
+    files = [f for f in sorted(INCOMING.iterdir()) if f.is_file()]
+
+    health = worker_health(conn)
+    if health:
+        # --------------------------------------------------------
+        # SERVICE MODE: hand files to the warm OCR worker
+        # --------------------------------------------------------
+        queued = sum(1 for f in files if enqueue(conn, f))
+        depth = queue_depth(conn)
+        log.info(
+            f"Queued {queued} files for OCR worker pid={health['pid']} | "
+            f"queued={depth['queued']} running={depth['running']} "
+            f"failed={depth['failed']}"
+        )
+    else:
+        # Route by content (file_router): only real scans go to the
+        # pool / pipeline. Born-digital files are extracted inline
+        # first (no OCR model needed), paged documents (PDF /
+        # multi-frame TIFF) stream page by page and resume from ocr_pages.
+        import file_router
+        routes = {f: file_router.classify(f) for f in files}
+        direct = [f for f in files if routes[f] not in file_router.IMAGE_ROUTES | file_router.PAGED_ROUTES]
+        paged = [f for f in files if routes[f] in file_router.PAGED_ROUTES]
+        files = [f for f in files if routes[f] in file_router.IMAGE_ROUTES]
+        log.info(f"Routes: {len(files)} scans, {len(paged)} paged, {len(direct)} no-OCR")
+
+        for f in direct:
+            try:
+                process_file(f, conn)
+            except Exception as e:
+                log.exception(f"Failed {f.name}: {e}")
+
+        if OCR_WORKERS > 1 and len(files) > 1:
+            # ----------------------------------------------------
+            # PARALLEL MODE: process pool, single batched writer
+            # ----------------------------------------------------
+            parallel_ingest(files, conn)
+            files = []
+        elif OCR_PIPELINE and len(files) > 1:
+            # ----------------------------------------------------
+            # PIPELINE MODE: overlapped stages, bounded queues
+            # ----------------------------------------------------
+            pipelined_ingest(files, conn)
+            files = []
+
+        # --------------------------------------------------------
+        # INLINE MODE: no worker running, OCR here
+        # --------------------------------------------------------
+        for f in files + paged:
+            try:
+                process_file(f, conn)
+            except Exception as e:
+                log.exception(f"Failed {f.name}: {e}")
+
+    conn.commit()
+    conn.close()
+
+    log.info("OCR ingest finished (single pass)")
 
-conn.commit()
-conn.close()
 
-log.info("OCR ingest finished (single pass)")
+if __name__ == "__main__":
+    if "--reocr" in sys.argv:
+        conn = connect(DB_PATH)
+        ensure_hash_cache(conn)
+        reocr_processed(conn)
+        conn.close()
+    else:
+        main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+OCR job queue (SQLite-backed)
+- ocr_ingest.py enqueues files, ocr_worker.py claims and runs them
+- Worker heartbeat + state live in ocr_worker_status
+- Local DB only, survives crashes (running jobs are re-queued on start)
+"""
+
+import os
+import sqlite3
+import time
+import logging
+from datetime import datetime
+from pathlib import Path
+
+from schema_guard import ensure_table
+
+# ============================================================
+# PATHS + CONFIG
+# ============================================================
+BASE = Path.home() / "genealogy"
+DB_PATH = BASE / "db/family_tree.db"
+
+HEARTBEAT_STALE = 60   # seconds without heartbeat = worker considered dead
+MAX_ATTEMPTS = 3       # failed jobs are retried this many times
+
+log = logging.getLogger("ocr_queue")
+
+# ============================================================
+# SCHEMA
+# ============================================================
+def connect(db_path: Path = DB_PATH) -> sqlite3.Connection:
+    """Connection suitable for queue use (worker + ingest share the DB)."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    ensure_queue(conn)
+    return conn
+
+
+def ensure_queue(conn: sqlite3.Connection):
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS ocr_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_path TEXT UNIQUE,
+            status TEXT DEFAULT 'queued',   -- queued, running, done, failed
+            attempts INTEGER DEFAULT 0,
+            error TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    """)
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS ocr_worker_status (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            pid INTEGER,
+            state TEXT,
+            heartbeat REAL,
+            current_file TEXT,
+            jobs_done INTEGER DEFAULT 0,
+            jobs_failed INTEGER DEFAULT 0,
+            started_at TEXT
+        )
+    """)
+
+# ============================================================
+# PRODUCER SIDE
+# ============================================================
+def enqueue(conn: sqlite3.Connection, path: Path) -> bool:
+    """
+    Queue a file for OCR. Returns True if newly queued.
+    A finished path is re-queued (same name dropped again),
+    a failed one only while it has attempts left.
+    """
+    cur = conn.execute(
+        """
+        INSERT INTO ocr_jobs (file_path) VALUES (?)
+        ON CONFLICT(file_path) DO UPDATE
+            SET status='queued',
+                attempts=CASE WHEN status='done' THEN 0 ELSE attempts END,
+                error=NULL
+            WHERE status='done' OR (status='failed' AND attempts < ?)
+        """,
+        (str(path), MAX_ATTEMPTS)
+    )
+    conn.commit()
+    return cur.rowcount > 0
+
+
+def queue_depth(conn: sqlite3.Connection) -> dict:
+    """Job counts per status."""
+    rows = conn.execute(
+        "SELECT status, COUNT(*) FROM ocr_jobs GROUP BY status"
+    ).fetchall()
+    depth = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+    depth.update(dict(rows))
+    return depth
+
+# ============================================================
+# CONSUMER SIDE
+# ============================================================
+def claim(conn: sqlite3.Connection):
+    """Atomically take the oldest queued job. Returns (id, Path) or None."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT id, file_path FROM ocr_jobs WHERE status='queued' ORDER BY id LIMIT 1"
+        ).fetchone()
+        if not row:
+            conn.commit()
+            return None
+        conn.execute(
+            """
+            UPDATE ocr_jobs
+            SET status='running', attempts=attempts+1, started_at=?
+            WHERE id=?
+            """,
+            (datetime.utcnow().isoformat(), row[0])
+        )
+        conn.commit()
+        return row[0], Path(row[1])
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def complete(conn: sqlite3.Connection, job_id: int, ok: bool, error: str = None):
+    conn.execute(
+        "UPDATE ocr_jobs SET status=?, error=?, finished_at=? WHERE id=?",
+        ("done" if ok else "failed", error, datetime.utcnow().isoformat(), job_id)
+    )
+    conn.commit()
+
+
+def requeue_running(conn: sqlite3.Connection) -> int:
+    """Crash recovery: jobs left 'running' by a dead worker go back to the queue."""
+    cur = conn.execute("UPDATE ocr_jobs SET status='queued' WHERE status='running'")
+    conn.commit()
+    if cur.rowcount:
+        log.warning(f"Re-queued {cur.rowcount} interrupted OCR jobs")
+    return cur.rowcount
+
+# ============================================================
+# HEALTH
+# ============================================================
+def heartbeat(conn: sqlite3.Connection, state: str, current_file=None,
+              jobs_done=0, jobs_failed=0, started_at=None):
+    conn.execute(
+        """
+        INSERT INTO ocr_worker_status
+            (id, pid, state, heartbeat, current_file, jobs_done, jobs_failed, started_at)
+        VALUES (1, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            pid=excluded.pid,
+            state=excluded.state,
+            heartbeat=excluded.heartbeat,
+            current_file=excluded.current_file,
+            jobs_done=excluded.jobs_done,
+            jobs_failed=excluded.jobs_failed,
+            started_at=COALESCE(excluded.started_at, ocr_worker_status.started_at)
+        """,
+        (os.getpid(), state, time.time(), current_file,
+         jobs_done, jobs_failed, started_at)
+    )
+    conn.commit()
+
+
+def pid_alive(pid) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def worker_health(conn: sqlite3.Connection):
+    """
+    Returns the worker status dict (plus queue depth) if a worker is alive,
+    otherwise None.
+    """
+    row = conn.execute(
+        """
+        SELECT pid, state, heartbeat, current_file, jobs_done, jobs_failed, started_at
+        FROM ocr_worker_status WHERE id=1
+        """
+    ).fetchone()
+    if not row:
+        return None
+
+    pid, state, beat, current_file, done, failed, started_at = row
+    age = time.time() - (beat or 0)
+    if state == "stopped" or age > HEARTBEAT_STALE or not pid_alive(pid):
+        return None
+
+    return {
+        "pid": pid,
+        "state": state,
+        "heartbeat_age": round(age, 1),
+        "current_file": current_file,
+        "jobs_done": done,
+        "jobs_failed": failed,
+        "started_at": started_at,
+        "queue": queue_depth(conn),
+    }
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+OCR result persistence.
+- No model imports: safe for the ingest parent / single DB writer
+- Batched inserts, one commit per batch
+- Deskew angles cached per file hash (survive re-OCR)
+- Per-page rows for PDFs / multi-frame TIFFs (resume mid-document)
+- Structured fields for pages matched to a form template
+- Per-region engine/confidence from the EasyOCR → TrOCR cascade
+"""
+
+import sqlite3
+from datetime import datetime
+
+from schema_guard import ensure_column, ensure_table
+
+
+def ensure_store(conn: sqlite3.Connection):
+    ensure_column(conn, "ocr_results", "deskew_angle", "REAL")
+    ensure_column(conn, "ocr_results", "raw_confidence", "REAL")
+    ensure_column(conn, "ocr_results", "needs_review", "INTEGER")
+    ensure_column(conn, "ocr_results", "extracted_at", "TEXT")  # llm_extract.py
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS deskew_angles (
+            file_hash TEXT PRIMARY KEY,
+            angle REAL
+        )
+    """)
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS ocr_pages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_hash TEXT,
+            file_path TEXT,
+            page_no INTEGER,
+            engine TEXT,
+            confidence REAL,
+            needs_review INTEGER,
+            text TEXT,
+            deskew_angle REAL,
+            created_at TEXT,
+            UNIQUE(file_hash, page_no)
+        )
+    """)
+    ensure_column(conn, "ocr_pages", "raw_confidence", "REAL")
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS ocr_regions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_hash TEXT,
+            page_no INTEGER DEFAULT 1,
+            region_no INTEGER,
+            x0 INTEGER, y0 INTEGER, x1 INTEGER, y1 INTEGER,
+            engine TEXT,
+            confidence REAL,
+            text TEXT,
+            easyocr_text TEXT,
+            easyocr_conf REAL,
+            UNIQUE(file_hash, page_no, region_no)
+        )
+    """)
+
+
+def store_results(conn: sqlite3.Connection, rows, replace=False):
+    """
+    rows: iterable of (file_hash, file_path, result_dict)
+    result_dict: {text, engine, confidence, needs_review[, raw_confidence, deskew_angle,
+                  pages: [(page_no, page result)]]}
+    Duplicate hashes are ignored (file_hash is UNIQUE) unless replace=True
+    (re-OCR), which overwrites the stored result in place.
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    ensure_store(conn)
+    now = datetime.utcnow().isoformat()
+    conflict = """
+        ON CONFLICT(file_hash) DO UPDATE SET
+            file_path=excluded.file_path,
+            engine=excluded.engine,
+            confidence=excluded.confidence,
+            raw_confidence=excluded.raw_confidence,
+            needs_review=excluded.needs_review,
+            text=excluded.text,
+            deskew_angle=excluded.deskew_angle,
+            extracted_at=NULL
+    """ if replace else "ON CONFLICT(file_hash) DO NOTHING"
+    conn.executemany(
+        f"""
+        INSERT INTO ocr_results
+        (file_hash, file_path, engine, confidence, raw_confidence, needs_review,
+         text, deskew_angle, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        {conflict}
+        """,
+        [
+            (
+                file_hash,
+                str(file_path),
+                result["engine"],
+                result["confidence"],
+                result.get("raw_confidence", result["confidence"]),
+                int(bool(result["needs_review"])),
+                result["text"],
+                result.get("deskew_angle"),
+                now
+            )
+            for file_hash, file_path, result in rows
+        ]
+    )
+    # Paged documents (recognize() adds "pages"): per-page rows in the same
+    # transaction, all replaced on re-OCR so no page keeps stale text
+    for file_hash, file_path, result in rows:
+        if not result.get("pages"):
+            continue
+        if replace:
+            conn.execute("DELETE FROM ocr_pages WHERE file_hash=?", (file_hash,))
+        elif stored_pages(conn, file_hash):
+            continue
+        _write_pages(conn, file_hash, file_path, result["pages"])
+
+    page_rows = [(file_hash, 1, result) for file_hash, _, result in rows]
+    store_form_fields(conn, page_rows)
+    store_regions(conn, page_rows if replace else [
+        r for r in page_rows if not _has_regions(conn, r[0], 1)
+    ])
+    conn.executemany(
+        "INSERT OR REPLACE INTO deskew_angles (file_hash, angle) VALUES (?, ?)",
+        [
+            (file_hash, result["deskew_angle"])
+            for file_hash, _, result in rows
+            if result.get("deskew_angle") is not None
+        ]
+    )
+    conn.commit()
+
+
+def store_form_fields(conn: sqlite3.Connection, rows):
+    """rows: (file_hash, page_no, result) — only templated-form results are stored."""
+    rows = [r for r in rows if r[2].get("fields")]
+    if not rows:
+        return
+    import form_templates  # OpenCV import only when forms were matched
+    for file_hash, page_no, result in rows:
+        form_templates.store_fields(
+            conn, file_hash, result["template_id"], result["fields"], page_no
+        )
+
+
+def store_regions(conn: sqlite3.Connection, rows):
+    """
+    rows: (file_hash, page_no, result) — cascade regions of a page.
+    A page's regions are replaced as a whole (region numbers shift on re-OCR).
+    """
+    rows = [r for r in rows if r[2].get("regions")]
+    if not rows:
+        return
+    conn.executemany(
+        "DELETE FROM ocr_regions WHERE file_hash=? AND page_no=?",
+        [(file_hash, page_no) for file_hash, page_no, _ in rows]
+    )
+    conn.executemany(
+        """
+        INSERT INTO ocr_regions
+        (file_hash, page_no, region_no, x0, y0, x1, y1,
+         engine, confidence, text, easyocr_text, easyocr_conf)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (file_hash, page_no, n, *region["box"], region["engine"],
+             region["confidence"], region["text"],
+             region["easyocr_text"], region["easyocr_conf"])
+            for file_hash, page_no, result in rows
+            for n, region in enumerate(result["regions"])
+        ]
+    )
+
+
+def _has_regions(conn: sqlite3.Connection, file_hash: str, page_no: int) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM ocr_regions WHERE file_hash=? AND page_no=? LIMIT 1",
+        (file_hash, page_no)
+    ).fetchone() is not None
+
+
+def already_ocred(conn: sqlite3.Connection, file_hash: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM ocr_results WHERE file_hash=?", (file_hash,)
+    ).fetchone() is not None
+
+
+def cached_angle(conn: sqlite3.Connection, file_hash: str):
+    """Deskew angle from an earlier run of this file, or None."""
+    ensure_store(conn)
+    row = conn.execute(
+        "SELECT angle FROM deskew_angles WHERE file_hash=?", (file_hash,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def cached_angles(conn: sqlite3.Connection) -> dict:
+    ensure_store(conn)
+    return dict(conn.execute("SELECT file_hash, angle FROM deskew_angles"))
+
+
+# ------------------------------------------------------------
+# Per-page rows
+# ------------------------------------------------------------
+def _write_pages(conn: sqlite3.Connection, file_hash: str, file_path, pages):
+    """pages: [(page_no, result)]; rows replaced, caller commits."""
+    now = datetime.utcnow().isoformat()
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO ocr_pages
+        (file_hash, file_path, page_no, engine, confidence, raw_confidence,
+         needs_review, text, deskew_angle, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                file_hash,
+                str(file_path),
+                page_no,
+                result["engine"],
+                result["confidence"],
+                result.get("raw_confidence", result["confidence"]),
+                int(bool(result["needs_review"])),
+                result["text"],
+                result.get("deskew_angle"),
+                now
+            )
+            for page_no, result in pages
+        ]
+    )
+    page_rows = [(file_hash, page_no, result) for page_no, result in pages]
+    store_form_fields(conn, page_rows)
+    store_regions(conn, page_rows)
+
+
+def store_page(conn: sqlite3.Connection, file_hash: str, file_path, page_no: int, result: dict):
+    """One page, committed immediately so a crash resumes at the next page."""
+    _write_pages(conn, file_hash, file_path, [(page_no, result)])
+    conn.commit()
+
+
+def stored_pages(conn: sqlite3.Connection, file_hash: str) -> set:
+    ensure_store(conn)
+    return {
+        row[0] for row in conn.execute(
+            "SELECT page_no FROM ocr_pages WHERE file_hash=?", (file_hash,)
+        )
+    }
+
+
+def load_pages(conn: sqlite3.Connection, file_hash: str) -> list:
+    """Stored page results in page order."""
+    return [
+        {"page_no": r[0], "engine": r[1], "confidence": r[2],
+         "needs_review": bool(r[3]), "text": r[4], "raw_confidence": r[5]}
+        for r in conn.execute(
+            """
+            SELECT page_no, engine, confidence, needs_review, text,
+                   COALESCE(raw_confidence, confidence)
+            FROM ocr_pages WHERE file_hash=? ORDER BY page_no
+            """,
+            (file_hash,)
+        )
+    ]
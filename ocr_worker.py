@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Persistent OCR worker (service mode).
+- Loads EasyOCR ONCE and keeps it warm (TrOCR on demand)
+- Takes jobs from the SQLite queue (ocr_queue.py)
+- Heartbeat + queue depth written to ocr_worker_status
+- Started and supervised by run_all.py
+
+Usage:
+    python ocr_worker.py            # run the worker
+    python ocr_worker.py --status   # print health + queue depth
+"""
+
+import sys
+import time
+import signal
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+
+BASE = Path.home() / "genealogy"
+DB_PATH = BASE / "db/family_tree.db"
+
+POLL_INTERVAL = 5         # seconds between queue polls when idle
+HEARTBEAT_INTERVAL = 10   # seconds between heartbeats
+
+logging.basicConfig(
+    filename=BASE / ".ocr_worker.log",
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s"
+)
+log = logging.getLogger("ocr_worker")
+
+import ocr_queue
+from hash_cache import ensure_hash_cache
+
+# ============================================================
+# STATUS MODE
+# ============================================================
+def print_status():
+    conn = ocr_queue.connect(DB_PATH)
+    health = ocr_queue.worker_health(conn)
+    depth = ocr_queue.queue_depth(conn)
+    conn.close()
+
+    if health:
+        print(
+            f"OCR worker ALIVE pid={health['pid']} state={health['state']} "
+            f"heartbeat={health['heartbeat_age']}s ago "
+            f"done={health['jobs_done']} failed={health['jobs_failed']}"
+        )
+        if health["current_file"]:
+            print(f"  working on: {health['current_file']}")
+    else:
+        print("OCR worker NOT running")
+    print(
+        f"Queue: queued={depth['queued']} running={depth['running']} "
+        f"done={depth['done']} failed={depth['failed']}"
+    )
+    return 0 if health else 1
+
+# ============================================================
+# WORKER
+# ============================================================
+class Worker:
+    def __init__(self):
+        self.state = "starting"
+        self.current_file = None
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.started_at = datetime.utcnow().isoformat()
+        self.stop = threading.Event()
+
+    def beat(self, conn):
+        ocr_queue.heartbeat(
+            conn, self.state, self.current_file,
+            self.jobs_done, self.jobs_failed, self.started_at
+        )
+
+    def heartbeat_loop(self):
+        # Own connection: heartbeats continue while a long OCR job runs
+        conn = ocr_queue.connect(DB_PATH)
+        while not self.stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.beat(conn)
+            except Exception as e:
+                log.warning(f"Heartbeat failed: {e}")
+        conn.close()
+
+    def run(self):
+        conn = ocr_queue.connect(DB_PATH)
+        ensure_hash_cache(conn)
+        ocr_queue.requeue_running(conn)
+        self.beat(conn)
+
+        threading.Thread(target=self.heartbeat_loop, daemon=True).start()
+
+        # Warm EasyOCR once; process_file reuses it for every job.
+        # TrOCR loads on the first low-confidence page and is
+        # unloaded again by ocr_engine when it sits idle.
+        t0 = time.time()
+        import ocr_engine
+        ocr_engine.get_easyocr()
+        from ocr_ingest import process_file
+        log.info(f"OCR engines ready in {time.time() - t0:.1f}s")
+
+        self.state = "idle"
+        self.beat(conn)
+
+        while not self.stop.is_set():
+            job = ocr_queue.claim(conn)
+            if not job:
+                self.state = "idle"
+                self.current_file = None
+                self.stop.wait(POLL_INTERVAL)
+                continue
+
+            job_id, path = job
+            self.state = "busy"
+            self.current_file = str(path)
+            self.beat(conn)
+
+            if not path.exists():
+                ocr_queue.complete(conn, job_id, False, "file missing")
+                self.jobs_failed += 1
+                continue
+
+            try:
+                ok = process_file(path, conn)
+                error = None if ok else "ocr failed or skipped"
+            except Exception as e:
+                log.exception(f"Job {job_id} failed: {path.name}")
+                ok, error = False, str(e)
+
+            ocr_queue.complete(conn, job_id, ok, error)
+            if ok:
+                self.jobs_done += 1
+            else:
+                self.jobs_failed += 1
+
+        self.state = "stopped"
+        self.current_file = None
+        self.beat(conn)
+        conn.close()
+        log.info("OCR worker stopped")
+
+
+def main():
+    worker = Worker()
+
+    def shutdown(signum, frame):
+        log.info(f"Signal {signum} received, stopping after current job")
+        worker.stop.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    log.info("OCR worker starting")
+    worker.run()
+
+
+if __name__ == "__main__":
+    if "--status" in sys.argv:
+        sys.exit(print_status())
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Preprocessed page cache (content-addressed, on local disk).
+- Key: file hash + preprocessing profile + PREPROCESS_VERSION
+- Stored as 1-bit PNG (binarized pages compress to a few hundred KB)
+- Deskew angle kept in a PNG text chunk
+- Size-bounded, least-recently-used pages evicted first
+"""
+
+import os
+import logging
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, PngImagePlugin
+
+from preprocess import PREPROCESS_VERSION
+
+BASE = Path.home() / "genealogy"
+CACHE_DIR = BASE / "cache" / "preprocessed"
+MAX_BYTES = int(os.environ.get("GENEALOGY_PAGE_CACHE_MB", "2048")) * 1024 * 1024
+EVICT_EVERY = 50   # puts between eviction sweeps
+
+log = logging.getLogger("page_cache")
+_puts = 0
+
+
+def _path(file_hash: str, profile: str) -> Path:
+    return CACHE_DIR / file_hash[:2] / f"{file_hash}_{profile}_v{PREPROCESS_VERSION}.png"
+
+
+def get(file_hash: str, profile: str):
+    """Returns (np_img, angle) or None."""
+    path = _path(file_hash, profile)
+    try:
+        with Image.open(path) as img:
+            angle = img.info.get("deskew_angle")
+            np_img = np.array(img.convert("L"))
+    except (OSError, ValueError):
+        return None
+
+    try:
+        os.utime(path)  # LRU: mtime = last use
+    except OSError:
+        pass
+    return np_img, (float(angle) if angle not in (None, "") else None)
+
+
+def put(file_hash: str, profile: str, np_img: np.ndarray, angle=None):
+    global _puts
+    path = _path(file_hash, profile)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    info = PngImagePlugin.PngInfo()
+    if angle is not None:
+        info.add_text("deskew_angle", str(angle))
+
+    # Atomic write: pool workers / pipeline threads may race on one page
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    # No dithering: cached pixels must match the page preprocess.py returned
+    Image.fromarray(np_img).convert("1", dither=Image.Dither.NONE).save(tmp, format="PNG", optimize=True, pnginfo=info)
+    os.replace(tmp, path)
+
+    _puts += 1
+    if _puts % EVICT_EVERY == 0:
+        evict()
+
+
+def evict(max_bytes: int = MAX_BYTES):
+    """Delete least recently used pages until the cache fits in max_bytes."""
+    if not CACHE_DIR.exists():
+        return 0
+    entries = []
+    total = 0
+    for p in CACHE_DIR.glob("*/*.png"):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, p))
+        total += st.st_size
+
+    if total <= max_bytes:
+        return 0
+
+    removed = 0
+    target = max_bytes * 0.9
+    for _, size, p in sorted(entries):
+        if total <= target:
+            break
+        try:
+            p.unlink()
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    log.info(f"Page cache evicted {removed} pages, now {total / 1e6:.0f}MB")
+    return removed
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Page-aware document sources.
+- PDF: embedded text layer used directly, scanned pages rasterized
+  lazily (one page in memory at a time) at RASTER_DPI
+- Multi-frame TIFF: frames decoded one at a time
+PDF support needs PyMuPDF (pip install pymupdf); without it PDFs are
+logged and left for review instead of being read as binary text.
+"""
+
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+import file_router
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+RASTER_DPI = 300        # scanned PDF pages are rendered at this DPI
+MIN_TEXT_CHARS = 40     # text layer shorter than this = treat page as a scan
+
+log = logging.getLogger("page_source")
+
+
+@dataclass
+class Page:
+    number: int             # 1-based
+    text: str = None        # embedded text layer (no OCR needed)
+    gray: np.ndarray = None # grayscale raster (needs OCR)
+    dpi: float = None
+
+# ============================================================
+# DETECTION (magic bytes, see file_router.py)
+# ============================================================
+def is_pdf(path: Path) -> bool:
+    return file_router.classify(path) == "pdf"
+
+
+def is_paged(path: Path) -> bool:
+    return file_router.classify(path) in file_router.PAGED_ROUTES
+
+
+def page_count(path: Path) -> int:
+    if is_pdf(path):
+        if fitz is None:
+            return 0
+        with fitz.open(path) as doc:
+            return doc.page_count
+    with Image.open(path) as img:
+        return getattr(img, "n_frames", 1)
+
+# ============================================================
+# ITERATION (LAZY)
+# ============================================================
+def iter_pages(path: Path, skip=(), dpi=RASTER_DPI):
+    """
+    Yield Page objects one at a time. Page numbers in `skip`
+    (already stored) are not rendered at all.
+    """
+    skip = set(skip)
+    if is_pdf(path):
+        yield from _iter_pdf(path, skip, dpi)
+    else:
+        yield from _iter_tiff(path, skip)
+
+
+def _iter_pdf(path: Path, skip, dpi):
+    if fitz is None:
+        log.warning(f"PyMuPDF not installed, cannot read {path.name}")
+        return
+    with fitz.open(path) as doc:
+        for i in range(doc.page_count):
+            number = i + 1
+            if number in skip:
+                continue
+            page = doc.load_page(i)
+            text = page.get_text("text")
+            if len(text.strip()) >= MIN_TEXT_CHARS:
+                yield Page(number, text=text)
+                continue
+            pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+            gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+            yield Page(number, gray=gray[:, :pix.width].copy(), dpi=dpi)
+            del pix
+
+
+def _iter_tiff(path: Path, skip):
+    with Image.open(path) as img:
+        frames = getattr(img, "n_frames", 1)
+        dpi = img.info.get("dpi", (None,))[0] or None
+        for i in range(frames):
+            number = i + 1
+            if number in skip:
+                continue
+            img.seek(i)
+            yield Page(number, gray=np.array(img.convert("L")), dpi=dpi)
@@ -1,45 +1,182 @@
 #!/usr/bin/env python3
-from PIL import Image, ImageOps, ImageFilter
+"""
+Page preprocessing for OCR (NumPy / OpenCV end to end).
+
+Profiles:
+- fast      downscale to OCR_TARGET_DPI, median filter
+- balanced  downscale to OCR_TARGET_DPI, light non-local means
+- quality   full resolution, strong non-local means (original behaviour)
+- auto      pick from page size + estimated noise
+"""
+from PIL import Image
 import cv2
 import numpy as np
 from pathlib import Path
 
-def preprocess_image(path: Path) -> Image.Image:
+PROFILES = ("fast", "balanced", "quality")
+DEFAULT_PROFILE = "auto"
+
+# Bump when any step below changes output; invalidates page_cache entries
+PREPROCESS_VERSION = 2
+
+OCR_TARGET_DPI = 300        # EasyOCR gains nothing from 600 dpi scans
+MAX_SIDE_NO_DPI = 3500      # downscale untagged pages larger than this
+
+NOISE_LOW = 4.0             # sigma below this: clean scan, fast is enough
+NOISE_HIGH = 12.0           # sigma above this: speckled/foxed page
+BIG_PAGE_PIXELS = 12_000_000
+
+DESKEW_SAMPLE_SIDE = 800    # skew is estimated on a page this size
+DESKEW_MAX_ANGLE = 10.0     # degrees searched either side of level
+
+# ============================================================
+# DECODE
+# ============================================================
+def source_dpi(path: Path):
+    """DPI from the image header (None if untagged). Does not decode pixels."""
+    try:
+        with Image.open(path) as img:
+            dpi = img.info.get("dpi")
+        if dpi and dpi[0]:
+            return float(dpi[0])
+    except Exception:
+        pass
+    return None
+
+def load_gray(path: Path) -> np.ndarray:
     """
-    Returns a preprocessed PIL Image for OCR.
+    Decode stage: read file straight to grayscale, stretch contrast.
+    """
+    np_img = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+    if np_img is None:
+        # Formats OpenCV can't read (some TIFF compressions, palette BMPs)
+        with Image.open(path) as img:
+            np_img = np.array(img.convert("L"))
+
+    # Enhance contrast (same as PIL autocontrast with no cutoff)
+    return cv2.normalize(np_img, None, 0, 255, cv2.NORM_MINMAX)
+
+# ============================================================
+# PROFILE SELECTION
+# ============================================================
+def estimate_noise(np_img: np.ndarray) -> float:
+    """
+    Fast noise sigma estimate (Immerkaer) on a downsampled copy.
+    """
+    h, w = np_img.shape
+    step = max(1, max(h, w) // 1000)
+    small = np_img[::step, ::step].astype(np.float32)
+    if small.shape[0] < 3 or small.shape[1] < 3:
+        return 0.0
+    kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+    conv = cv2.filter2D(small, -1, kernel)[1:-1, 1:-1]
+    sh, sw = conv.shape
+    return float(np.abs(conv).sum() * np.sqrt(0.5 * np.pi) / (6.0 * sh * sw))
+
+def choose_profile(np_img: np.ndarray) -> str:
+    noise = estimate_noise(np_img)
+    if noise < NOISE_LOW:
+        return "fast"
+    if noise > NOISE_HIGH and np_img.size <= BIG_PAGE_PIXELS:
+        return "quality"
+    return "balanced"
+
+def downscale(np_img: np.ndarray, dpi=None) -> np.ndarray:
+    """Resize to OCR_TARGET_DPI (or cap the long side if untagged)."""
+    h, w = np_img.shape
+    if dpi:
+        scale = OCR_TARGET_DPI / dpi
+    else:
+        scale = MAX_SIDE_NO_DPI / max(h, w)
+    if scale >= 1.0:
+        return np_img
+    return cv2.resize(
+        np_img, (max(1, int(w * scale)), max(1, int(h * scale))),
+        interpolation=cv2.INTER_AREA
+    )
+
+# ============================================================
+# CLEAN
+# ============================================================
+def _projection_score(ink: np.ndarray, angle: float) -> float:
+    """Sharpness of the row ink profile after rotating by angle."""
+    h, w = ink.shape
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    rotated = cv2.warpAffine(ink, M, (w, h), flags=cv2.INTER_NEAREST, borderValue=0)
+    rows = rotated.sum(axis=1, dtype=np.float64)
+    return float(np.square(np.diff(rows)).sum())
+
+def estimate_skew(np_img: np.ndarray) -> float:
     """
-    # Open image
-    img = Image.open(path).convert("RGB")
+    Skew angle (degrees, correction to apply) from a projection-profile
+    search on a downsampled ink mask. Coarse 1° sweep, then 0.1° refine.
+    """
+    h, w = np_img.shape
+    scale = DESKEW_SAMPLE_SIDE / max(h, w)
+    small = np_img
+    if scale < 1.0:
+        small = cv2.resize(np_img, (max(1, int(w * scale)), max(1, int(h * scale))),
+                           interpolation=cv2.INTER_AREA)
+    ink = (small < 128).astype(np.uint8)
+    if not ink.any():
+        return 0.0
+
+    coarse = np.arange(-DESKEW_MAX_ANGLE, DESKEW_MAX_ANGLE + 0.5, 1.0)
+    best = max(coarse, key=lambda a: _projection_score(ink, a))
+    fine = np.arange(best - 1.0, best + 1.05, 0.1)
+    best = max(fine, key=lambda a: _projection_score(ink, a))
+    return round(float(best), 2)
 
-    # Convert to grayscale
-    gray = ImageOps.grayscale(img)
+def deskew(np_img: np.ndarray, angle=None):
+    """
+    Rotate the page once by the estimated (or given, e.g. cached) angle.
+    Returns (image, angle).
+    """
+    if angle is None:
+        angle = estimate_skew(np_img)
+    if abs(angle) < 0.05:
+        return np_img, angle
 
-    # Enhance contrast
-    gray = ImageOps.autocontrast(gray)
+    (h, w) = np_img.shape
+    center = (w // 2, h // 2)
+    M = cv2.getRotationMatrix2D(center, angle, 1.0)
+    # Nearest: the page is already binarized, interpolation would add grays
+    np_img = cv2.warpAffine(np_img, M, (w, h), flags=cv2.INTER_NEAREST,
+                            borderMode=cv2.BORDER_CONSTANT, borderValue=255)
+    return np_img, angle
 
-    # Convert to numpy for OpenCV operations
-    np_img = np.array(gray)
+def clean_array(np_img: np.ndarray, profile=DEFAULT_PROFILE, dpi=None, angle=None):
+    """
+    Denoise stage: denoise, binarize, deskew a grayscale page.
+    Pass a cached angle to skip the skew search.
+    Returns (image, deskew_angle).
+    """
+    if profile == "auto":
+        profile = choose_profile(np_img)
 
     # Denoise / remove small artifacts
-    np_img = cv2.fastNlMeansDenoising(np_img, None, 30, 7, 21)
+    if profile == "fast":
+        np_img = downscale(np_img, dpi)
+        np_img = cv2.medianBlur(np_img, 3)
+    elif profile == "balanced":
+        np_img = downscale(np_img, dpi)
+        np_img = cv2.fastNlMeansDenoising(np_img, None, 15, 7, 11)
+    else:
+        np_img = cv2.fastNlMeansDenoising(np_img, None, 30, 7, 21)
 
     # Threshold (binarize)
     _, np_img = cv2.threshold(np_img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
-    # Deskew
-    coords = np.column_stack(np.where(np_img > 0))
-    if coords.size != 0:
-        angle = cv2.minAreaRect(coords)[-1]
-        if angle < -45:
-            angle = -(90 + angle)
-        else:
-            angle = -angle
-        (h, w) = np_img.shape
-        center = (w // 2, h // 2)
-        M = cv2.getRotationMatrix2D(center, angle, 1.0)
-        np_img = cv2.warpAffine(np_img, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
-
-    # Convert back to PIL
-    processed_img = Image.fromarray(np_img)
-
-    return processed_img
+    return deskew(np_img, angle)
+
+def preprocess_array(path: Path, profile=DEFAULT_PROFILE, angle=None):
+    """
+    Returns (preprocessed uint8 NumPy page, deskew angle).
+    """
+    return clean_array(load_gray(path), profile, source_dpi(path), angle)
+
+def preprocess_image(path: Path, profile=DEFAULT_PROFILE) -> Image.Image:
+    """
+    Returns a preprocessed PIL Image for OCR.
+    """
+    return Image.fromarray(preprocess_array(path, profile)[0])
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Memory budget helpers (Linux /proc, no extra deps).
+EasyOCR, TrOCR and the Ollama llama3.2 runner all share the same RAM;
+model loaders ask here before pulling another model in.
+"""
+
+import os
+import logging
+from pathlib import Path
+
+log = logging.getLogger("resource_guard")
+
+# Total RAM the pipeline may use (our process + Ollama), in MB.
+# Override with GENEALOGY_MEMORY_BUDGET_MB.
+MEMORY_BUDGET_MB = int(os.environ.get("GENEALOGY_MEMORY_BUDGET_MB", "24000"))
+
+# ------------------------------------------------------------
+# RSS readers
+# ------------------------------------------------------------
+def rss_mb(pid="self") -> float:
+    """Resident memory of a process in MB (0 if unknown)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return 0.0
+
+
+def ollama_rss_mb() -> float:
+    """Combined RSS of all running ollama processes (server + model runners)."""
+    total = 0.0
+    for proc in Path("/proc").iterdir():
+        if not proc.name.isdigit():
+            continue
+        try:
+            comm = (proc / "comm").read_text().strip()
+        except OSError:
+            continue
+        if comm.startswith("ollama"):
+            total += rss_mb(proc.name)
+    return total
+
+# ------------------------------------------------------------
+# Budget check
+# ------------------------------------------------------------
+def budget_allows(extra_mb: float, label: str) -> bool:
+    """
+    True if loading something of ~extra_mb keeps us + Ollama under budget.
+    """
+    ours = rss_mb()
+    ollama = ollama_rss_mb()
+    projected = ours + ollama + extra_mb
+
+    if projected > MEMORY_BUDGET_MB:
+        log.warning(
+            f"Memory budget exceeded for {label} | self={ours:.0f}MB "
+            f"ollama={ollama:.0f}MB +{extra_mb:.0f}MB > {MEMORY_BUDGET_MB}MB"
+        )
+        return False
+    return True
+
+
+def release_memory():
+    """Hand freed heap pages back to the OS (glibc only, best effort)."""
+    import gc
+    gc.collect()
+    try:
+        import ctypes
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except Exception:
+        pass
@@ -2,14 +2,18 @@
 """
 Pipeline controller with watchdog.
 THIS is the only daemon loop.
+Also keeps the persistent OCR worker (ocr_worker.py) alive.
 """
 
 import subprocess
+import sqlite3
 import time
 import logging
 from pathlib import Path
 import sys
 
+import ocr_queue
+
 BASE = Path.home() / "genealogy"
 PYTHON = str(BASE / "venv" / "bin" / "python")
 LOG_FILE = BASE / "run_all.log"
@@ -24,15 +28,76 @@ log.info("Pipeline controller started")
 
 PIPELINE = [
     "ocr_ingest.py",
+    "llm_extract.py",
     "face_cluster.py",
     "db_upgrade.py",
     "build_timelines.py",
     "generate_graph.py",
-    "link_assets.py"
+    "link_assets.py",
+    "search_index.py",  # no-op once built: triggers keep it current
+    "fuzzy_search.py"   # indexes only OCR results queued by its triggers
 ]
 
 WATCHDOG_TIMEOUT = 600  # seconds
 
+# Persistent OCR worker: engines stay loaded between cycles,
+# ocr_ingest.py only queues files while it is alive
+OCR_SERVICE = True
+OCR_WORKER = "ocr_worker.py"
+worker_proc = None
+
+# ============================================================
+# OCR WORKER SUPERVISION
+# ============================================================
+def ensure_ocr_worker():
+    """Start (or restart) the OCR worker if it is not healthy."""
+    global worker_proc
+
+    conn = ocr_queue.connect(ocr_queue.DB_PATH)
+    health = ocr_queue.worker_health(conn)
+    conn.close()
+
+    if health:
+        q = health["queue"]
+        log.info(
+            f"OCR worker pid={health['pid']} {health['state']} | "
+            f"queued={q['queued']} running={q['running']} failed={q['failed']}"
+        )
+        return True
+
+    if worker_proc and worker_proc.poll() is None:
+        # Our child exists but stopped heartbeating — replace it
+        log.error("OCR worker unresponsive, restarting")
+        worker_proc.kill()
+        worker_proc.wait()
+    elif worker_proc:
+        log.warning(f"OCR worker exited with code {worker_proc.returncode}, restarting")
+
+    worker_proc = subprocess.Popen(
+        [PYTHON, str(BASE / OCR_WORKER)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    log.info(f"OCR worker started pid={worker_proc.pid}")
+
+    # Give it a moment to register so this cycle's ingest queues to it
+    conn = ocr_queue.connect(ocr_queue.DB_PATH)
+    for _ in range(15):
+        if ocr_queue.worker_health(conn):
+            break
+        time.sleep(1)
+    conn.close()
+    return False
+
+
+def stop_ocr_worker():
+    if worker_proc and worker_proc.poll() is None:
+        worker_proc.terminate()
+        try:
+            worker_proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            worker_proc.kill()
+
 def run_step(script):
     cmd = [PYTHON, str(BASE / script)]
     log.info(f"Running: {script}")
@@ -72,6 +137,12 @@ def run_step(script):
 # ============================================================
 try:
     while True:
+        if OCR_SERVICE:
+            try:
+                ensure_ocr_worker()
+            except sqlite3.Error as e:
+                log.error(f"OCR worker check failed: {e}")
+
         for step in PIPELINE:
             if not run_step(step):
                 log.warning("Pipeline aborted this cycle")
@@ -82,4 +153,5 @@ try:
 
 except KeyboardInterrupt:
     log.info("Pipeline stopped by user")
+    stop_ocr_worker()
     sys.exit(0)
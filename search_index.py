@@ -1,30 +1,181 @@
 #!/usr/bin/env python3
+"""
+Full-text search over people, files and OCR text (SQLite FTS5).
+- External-content FTS tables: the text stays in people / files /
+  ocr_results, the index only holds postings and points back by rowid
+- Triggers on the source tables keep the index current on every
+  INSERT / UPDATE / DELETE, so indexing cost follows new documents; the
+  full build happens once, when an index table is first created
+- trigram tokenizer (substring matches survive OCR noise inside words)
+  where SQLite has it, porter + unicode61 otherwise
+- search(): bm25-ranked hits with source type, row id and a highlighted
+  snippet
 
+Usage:
+    python search_index.py                 create / upgrade the index
+    python search_index.py "anna weber"    query from the command line
+"""
+
+import re
+import sys
 import sqlite3
+import logging
+from pathlib import Path
 
-DB = "/home/USER/genealogy/db/family_tree.db"
+from schema_guard import normalize_people_name
 
-def setup():
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
+BASE = Path.home() / "genealogy"
+DB_PATH = BASE / "db/family_tree.db"
+
+log = logging.getLogger("search_index")
+
+# source: (FTS table, content table, indexed columns, bm25 column weights, title column)
+SOURCES = {
+    "person": ("search_people", "people", ("name", "notes"), (10.0, 1.0), "name"),
+    "file": ("search_files", "files", ("file_name", "ocr_text"), (5.0, 1.0), "file_name"),
+    "ocr": ("search_ocr", "ocr_results", ("text",), (1.0,), "file_path"),
+}
+FALLBACK_TOKENIZER = "porter unicode61 remove_diacritics 2"
+SNIPPET_TOKENS = 12          # words of context (porter)
+SNIPPET_TRIGRAMS = 60        # trigram tokens are characters, 64 at most
+MARK = ("<mark>", "</mark>")
 
-    c.execute("""
-    CREATE VIRTUAL TABLE IF NOT EXISTS search_index
-    USING fts5(content)
-    """)
+# ============================================================
+# SCHEMA
+# ============================================================
+def tokenizer(conn: sqlite3.Connection) -> str:
+    """trigram if this SQLite build has it (3.34+), porter otherwise."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp.fts_probe")
+        return "trigram"
+    except sqlite3.OperationalError:
+        return FALLBACK_TOKENIZER
 
-    c.execute("DELETE FROM search_index")
 
-    for row in c.execute("SELECT first_name,last_name,notes FROM people"):
-        c.execute("INSERT INTO search_index VALUES (?)",
-                  (" ".join(filter(None,row)),))
+def _exists(conn, name) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (name,)).fetchone() is not None
 
-    for row in c.execute("SELECT ocr_text FROM files"):
-        if row[0]:
-            c.execute("INSERT INTO search_index VALUES (?)", (row[0],))
 
+def ensure_index(conn: sqlite3.Connection) -> list:
+    """Create missing FTS tables + triggers; returns the sources built from scratch."""
+    normalize_people_name(conn)
+    # The old single-column index was a full copy, rebuilt on every run
+    conn.execute("DROP TABLE IF EXISTS search_index")
+
+    tokenize = tokenizer(conn)
+    built = []
+    for source, (fts, table, columns, _, _) in SOURCES.items():
+        if not _exists(conn, table):
+            continue
+        cols = ", ".join(columns)
+        new_cols = ", ".join(f"new.{c}" for c in columns)
+        old_cols = ", ".join(f"old.{c}" for c in columns)
+
+        fresh = not _exists(conn, fts)
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {cols}, content='{table}', content_rowid='id', tokenize='{tokenize}'
+            )
+        """)
+        # External content: a delete must repeat the old values exactly
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_cols});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{fts}_update AFTER UPDATE OF {cols} ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+                INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_cols});
+            END
+        """)
+        if fresh:
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+            built.append(source)
+            log.info(f"Built {fts} ({tokenize})")
     conn.commit()
+    return built
+
+
+def setup():
+    conn = sqlite3.connect(DB_PATH)
+    built = ensure_index(conn)
     conn.close()
+    log.info(f"Search index ready (built: {', '.join(built) or 'none'})")
+
+# ============================================================
+# QUERY
+# ============================================================
+def fts_query(text: str, trigram: bool) -> str:
+    """
+    Free text -> FTS5 query: every word must match, words quoted so
+    punctuation / operators in user input are literal. trigram needs at
+    least 3 characters per word.
+    """
+    words = re.findall(r"\w+", text or "")
+    if trigram:
+        words = [w for w in words if len(w) >= 3]
+    return " ".join(f'"{w}"' for w in words)
+
+
+def _is_trigram(conn, fts) -> bool:
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name=?", (fts,)).fetchone()
+    return bool(sql) and "'trigram'" in sql[0]
+
+
+def search(conn: sqlite3.Connection, query: str, limit: int = 20, sources=None) -> list:
+    """
+    bm25-ranked hits across sources (default: all):
+    [{"source", "id", "title", "rank", "snippet"}], best first.
+    bm25 is lower-is-better and comparable enough across the tables to
+    merge them into one list.
+    """
+    hits = []
+    for source in sources or SOURCES:
+        fts, table, _, weights, title = SOURCES[source]
+        if not _exists(conn, fts):
+            continue
+        trigram = _is_trigram(conn, fts)
+        match = fts_query(query, trigram)
+        if not match:
+            continue
+        rows = conn.execute(
+            f"""
+            SELECT s.rowid, t.{title}, bm25({fts}, {", ".join(map(str, weights))}) AS rank,
+                   snippet({fts}, -1, ?, ?, '…', ?)
+            FROM {fts} s JOIN {table} t ON t.id = s.rowid
+            WHERE {fts} MATCH ?
+            ORDER BY rank
+            LIMIT ?
+            """,
+            (*MARK, SNIPPET_TRIGRAMS if trigram else SNIPPET_TOKENS, match, limit)
+        )
+        hits.extend(
+            {"source": source, "id": rowid, "title": name, "rank": rank, "snippet": snip}
+            for rowid, name, rank, snip in rows
+        )
+    hits.sort(key=lambda h: h["rank"])
+    return hits[:limit]
+
 
 if __name__ == "__main__":
-    setup()
+    logging.basicConfig(
+        filename=BASE / ".genealogy_search.log",
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s"
+    )
+    if len(sys.argv) > 1:
+        conn = sqlite3.connect(DB_PATH)
+        ensure_index(conn)
+        for hit in search(conn, " ".join(sys.argv[1:])):
+            print(f"{hit['rank']:8.2f}  {hit['source']:6} {hit['id']:>6}  {hit['title']}")
+            print(f"          {hit['snippet']}")
+        conn.close()
+    else:
+        setup()
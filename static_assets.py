@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Generated static pages (family graph, per-person timelines).
+- content_version: a counter per page source ("graph",
+  "timeline:<person id>"), bumped by triggers on people, relationships
+  and person_events; a page is regenerated only when its counter moved
+- static_assets: what is on disk, built from which version; web_ui.py
+  serves its etag / built_at as ETag / Last-Modified, so an unchanged
+  page costs a 304
+- Pages are written with .gz (and .br when brotli is installed) next to
+  them, compressed once at build time instead of per request
+"""
+
+import os
+import gzip
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from schema_guard import ensure_table
+
+BASE = Path.home() / "genealogy"
+GRAPH_DIR = BASE / "graphs"
+TIMELINE_DIR = BASE / "timelines"
+
+TIMELINE = "timeline:"
+
+_BUMP = """
+    INSERT INTO content_version (name, version, changed_at) VALUES ({name}, 1, datetime('now'))
+    ON CONFLICT(name) DO UPDATE SET version = version + 1, changed_at = excluded.changed_at;
+"""
+PEOPLE_COLUMNS = "name, first_name, last_name, birth_date, death_date"
+EVENT_COLUMNS = "person_id, event_type, event_date, description, source_file"   # not the date keys
+
+# table: {event: [version names (SQL) to bump]}
+TRIGGERS = {
+    "people": {
+        "INSERT": ["'graph'", f"'{TIMELINE}' || NEW.id"],
+        "DELETE": ["'graph'", f"'{TIMELINE}' || OLD.id"],
+        f"UPDATE OF {PEOPLE_COLUMNS}": ["'graph'", f"'{TIMELINE}' || NEW.id"],
+    },
+    "relationships": {
+        "INSERT": ["'graph'"],
+        "DELETE": ["'graph'"],
+        "UPDATE": ["'graph'"],
+    },
+    "person_events": {
+        "INSERT": [f"'{TIMELINE}' || NEW.person_id"],
+        "DELETE": [f"'{TIMELINE}' || OLD.person_id"],
+        f"UPDATE OF {EVENT_COLUMNS}": [f"'{TIMELINE}' || OLD.person_id", f"'{TIMELINE}' || NEW.person_id"],
+    },
+}
+# Versions to start from when a table's triggers are first created
+SEEDS = {
+    "people": f"SELECT 'graph' AS name UNION ALL SELECT '{TIMELINE}' || id FROM people",
+    "relationships": "SELECT 'graph' AS name",
+    "person_events": f"SELECT DISTINCT '{TIMELINE}' || person_id AS name FROM person_events "
+                     "WHERE person_id IS NOT NULL",
+}
+
+# ============================================================
+# SCHEMA
+# ============================================================
+def _exists(conn, kind, name) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type=? AND name=?", (kind, name)
+    ).fetchone() is not None
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS content_version (
+            name TEXT PRIMARY KEY,
+            version INTEGER,
+            changed_at TEXT
+        )
+    """)
+    ensure_table(conn, """
+        CREATE TABLE IF NOT EXISTS static_assets (
+            path TEXT PRIMARY KEY,
+            source TEXT,
+            version INTEGER,
+            etag TEXT,
+            built_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_static_assets_source ON static_assets(source)")
+    for table, events in TRIGGERS.items():
+        if not _exists(conn, "table", table):
+            continue
+        first = not _exists(conn, "trigger", f"trg_version_{table}_insert")
+        for event, names in events.items():
+            trigger = f"trg_version_{table}_{event.split()[0].lower()}"
+            sql = conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type='trigger' AND name=?", (trigger,)
+            ).fetchone()
+            if sql and not all(n in sql[0] for n in names):
+                # Older trigger bumping fewer versions: replace, seed again
+                conn.execute(f"DROP TRIGGER {trigger}")
+                first = True
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {trigger}
+                AFTER {event} ON {table}
+                BEGIN
+                    {"".join(_BUMP.format(name=n) for n in names)}
+                END
+            """)
+        if first and table in SEEDS:
+            # Rows written before the triggers existed: build everything once
+            conn.execute(f"""
+                INSERT INTO content_version (name, version, changed_at)
+                SELECT name, 1, datetime('now') FROM ({SEEDS[table]})
+                WHERE true
+                ON CONFLICT(name) DO UPDATE SET version = version + 1
+            """)
+    conn.commit()
+
+# ============================================================
+# VERSIONS
+# ============================================================
+def stale(conn: sqlite3.Connection, prefix: str) -> list:
+    """[(source, version)] for sources under prefix whose page is missing or older."""
+    return conn.execute(
+        """
+        SELECT v.name, v.version FROM content_version v
+        LEFT JOIN static_assets a ON a.source = v.name
+        WHERE v.name >= ? AND v.name < ? || char(127)
+        AND (a.version IS NULL OR a.version != v.version)
+        """,
+        (prefix, prefix)
+    ).fetchall()
+
+# ============================================================
+# WRITE
+# ============================================================
+def _atomic_write(path: Path, data: bytes):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def write(path: Path, data: bytes):
+    """Write a page plus its pre-compressed variants (stale variants removed)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _atomic_write(path, data)
+    _atomic_write(path.with_name(path.name + ".gz"), gzip.compress(data, compresslevel=9, mtime=0))
+    br = path.with_name(path.name + ".br")
+    if brotli:
+        _atomic_write(br, brotli.compress(data, quality=11))
+    elif br.exists():
+        br.unlink()
+
+
+def publish(conn: sqlite3.Connection, path: Path, data: bytes, source: str, version: int):
+    """Write the page and record what it was built from. Caller commits."""
+    write(path, data)
+    conn.execute(
+        """
+        INSERT INTO static_assets (path, source, version, etag, built_at) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(path) DO UPDATE SET
+            source=excluded.source, version=excluded.version,
+            etag=excluded.etag, built_at=excluded.built_at
+        """,
+        (path.relative_to(BASE).as_posix(), source, version, f"{source}-{version}",
+         datetime.utcnow().replace(microsecond=0).isoformat())
+    )
+
+
+def unpublish(conn: sqlite3.Connection, path: Path, source: str):
+    """Remove a page whose source is gone (e.g. a deleted person). Caller commits."""
+    for p in (path, path.with_name(path.name + ".gz"), path.with_name(path.name + ".br")):
+        if p.exists():
+            p.unlink()
+    conn.execute("DELETE FROM static_assets WHERE path=?", (path.relative_to(BASE).as_posix(),))
+    conn.execute("DELETE FROM content_version WHERE name=?", (source,))
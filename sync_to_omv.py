@@ -5,15 +5,17 @@ sync_to_omv.py
 Incremental sync of local genealogy project to OMV backup.
 - Copies code, models, output, graphs, and web_ui updates
 - Skips files that already exist with the same hash
+  (hashes cached in the DB, unchanged files are never re-read)
 - Offline-safe, read-only to OMV (no execution on OMV)
 """
 
 import os
 import shutil
 from pathlib import Path
-import hashlib
 import logging
 
+from hash_cache import content_hash, remember
+
 # -------------------------------
 # CONFIG
 # -------------------------------
@@ -44,12 +46,8 @@ log.info("Starting sync to OMV")
 # UTILS
 # -------------------------------
 def file_hash(path: Path) -> str:
-    """Compute SHA256 hash of a file."""
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        while chunk := f.read(8192):
-            h.update(chunk)
-    return h.hexdigest()
+    """SHA256 of a file (cached on path/size/mtime/inode)."""
+    return content_hash(path)
 
 def ensure_dir(path: Path):
     path.mkdir(parents=True, exist_ok=True)
@@ -57,10 +55,12 @@ def ensure_dir(path: Path):
 def sync_file(src: Path, dst: Path):
     """Copy file if missing or changed."""
     ensure_dir(dst.parent)
+    src_hash = file_hash(src)
     if dst.exists():
-        if file_hash(src) == file_hash(dst):
+        if src_hash == file_hash(dst):
             return False  # already synced
     shutil.copy2(src, dst)
+    remember(dst, src_hash)  # never read the copy back over CIFS
     return True
 
 def sync_folder(src: Path, dst: Path, patterns=None):
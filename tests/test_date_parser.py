@@ -0,0 +1,72 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import date_parser
+from date_parser import parse
+
+
+def test_exact_dates():
+    for text in ("1850-06-12", "1850/06/12", "12 Jun 1850", "Jun 12, 1850",
+                 "12/6/1850", "1850-06-12 00:00:00"):
+        date = parse(text)
+        assert (date.text, date.sort, date.lo, date.hi, date.precision) == \
+            ("1850-06-12", 18500612, 18500612, 18500612, "day"), text
+
+
+def test_partial_dates_span_their_period():
+    month = parse("Feb 1904")
+    assert (month.precision, month.lo, month.hi) == ("month", 19040201, 19040229)
+    year = parse("1887")
+    assert (year.sort, year.lo, year.hi) == (18870000, 18870101, 18871231)
+    decade = parse("1890s")
+    assert (decade.precision, decade.lo, decade.hi) == ("decade", 18900101, 18991231)
+
+
+def test_qualifiers():
+    about = parse("abt 1887")
+    assert (about.text, about.lo, about.hi) == ("abt 1887", 18850101, 18891231)
+    assert parse("c.1887").text == "abt 1887"
+    before = parse("bef 1850")
+    assert (before.precision, before.lo, before.hi) == ("before", 18300101, 18501231)
+    assert parse("after 1850").hi == 18701231
+
+
+def test_ranges():
+    for text in ("bet 1880 and 1885", "between 1880 & 1885", "from 1880 to 1885", "1880-1885"):
+        date = parse(text)
+        assert (date.text, date.lo, date.hi, date.precision) == \
+            ("bet 1880 and 1885", 18800101, 18851231, "range"), text
+    assert parse("bet 1885 and 1880") is None
+
+
+def test_invalid_full_dates_are_not_approximate():
+    for text in ("31 Feb 1850", "29 Feb 1900", "1850-13-01", "30/2/1850", "abt 31 Feb 1850"):
+        assert parse(text) is None, text
+    assert parse("29 Feb 1904").precision == "day"
+
+
+def test_fallback_single_year():
+    assert parse("born circa 1887 in Ohio").text == "abt 1887"
+    assert parse("1850 or 1851") is None
+    assert parse("") is None
+
+
+def test_keys_written_and_refreshed():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE person_events (id INTEGER PRIMARY KEY, person_id INTEGER, event_date TEXT)")
+    conn.executemany("INSERT INTO person_events (person_id, event_date) VALUES (?, ?)",
+                     [(1, "12 Jun 1850"), (1, "abt 1849"), (1, "nonsense")])
+    date_parser.ensure_date_keys(conn)
+    assert date_parser.refresh_keys(conn) == 3
+    assert date_parser.refresh_keys(conn) == 0
+    assert conn.execute(
+        "SELECT event_date_precision FROM person_events ORDER BY event_date_sort IS NULL, event_date_sort"
+    ).fetchall() == [("about",), ("day",), ("none",)]
+
+    # Editing the text re-queues the row
+    conn.execute("UPDATE person_events SET event_date='1851' WHERE id=3")
+    assert date_parser.refresh_keys(conn) == 1
+    assert conn.execute("SELECT event_date_sort FROM person_events WHERE id=3").fetchone() == (18510000,)
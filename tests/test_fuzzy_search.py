@@ -0,0 +1,47 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fuzzy_search
+from ocr_store import store_results
+
+
+def _db():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE ocr_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_hash TEXT UNIQUE,
+            file_path TEXT,
+            engine TEXT,
+            confidence REAL,
+            text TEXT,
+            created_at TEXT
+        )
+    """)
+    return conn
+
+
+def _result(text):
+    return {"text": text, "engine": "easyocr", "confidence": 0.9, "needs_review": 0}
+
+
+def test_reocr_of_queued_document():
+    conn = _db()
+    store_results(conn, [("h1", "a.png", _result("Anna Weber"))])
+    fuzzy_search.ensure_schema(conn)
+    assert conn.execute("SELECT doc_id FROM fuzzy_changes").fetchall() == [(1,)]
+
+    # Upsert while the document is still queued (ocr_ingest --reocr)
+    store_results(conn, [("h1", "a.png", _result("Anna Webber"))], replace=True)
+    assert conn.execute("SELECT doc_id FROM fuzzy_changes").fetchall() == [(1,)]
+
+    fuzzy_search.update(conn)
+    assert [h["id"] for h in fuzzy_search.search(conn, "webber")] == [1]
+
+
+def test_ocr_digit_fixes():
+    assert fuzzy_search.fold("8aker") == "baker"
+    assert fuzzy_search.fold("5m1th") == "smlth"
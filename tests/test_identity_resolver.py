@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import identity_resolver as ir
+from identity_resolver import Person
+
+
+def test_soundex():
+    assert ir.soundex("Robert") == ir.soundex("Rupert") == "R163"
+    assert ir.soundex("Ashcraft") == "A261"
+    assert ir.soundex("Tymczak") == "T522"
+    assert ir.soundex("") == ""
+
+
+def test_blocking_by_surname_and_decade():
+    people = [
+        Person(1, "Anna Weber", None, "1850", None),
+        Person(2, "Anna Webber", None, "1852", None),
+        Person(3, "Anna Weber", None, "1920", None),    # decades apart
+        Person(4, "Anna Fischer", None, "1850", None),  # other surname block
+    ]
+    assert set(ir.candidate_pairs(people, {1})) == {(1, 2)}
+
+
+def test_only_changed_people_are_queried():
+    people = [Person(i, "Anna Weber", None, None, None) for i in (1, 2, 3)]
+    assert set(ir.candidate_pairs(people, {3})) == {(1, 3), (2, 3)}
+    assert ir.candidate_pairs(people, set()) == {}
+
+
+def test_split_block_is_symmetric_for_missing_given_name(monkeypatch):
+    monkeypatch.setattr(ir, "MAX_BLOCK", 1)     # force the given-name split
+    people = [
+        Person(1, "Weber", None, None, None),
+        Person(2, "A Weber", None, None, None),
+        Person(3, "Otto Weber", None, None, None),
+    ]
+    assert (1, 2) in ir.candidate_pairs(people, {1})
+    assert (1, 2) in ir.candidate_pairs(people, {2})
+
+
+def test_dates_and_documents_in_combined_score():
+    a = Person(1, "Anna Weber", None, "1850", "1900", documents=frozenset({10, 11}))
+    b = Person(2, "Anna Weber", None, "abt 1851", None, documents=frozenset({11}))
+    c = Person(3, "Anna Weber", None, "1950", None)
+    same = ir.features(a, b, 1.0)
+    assert same["dates"] == 1.0 and same["documents"] == 1.0
+    assert ir.combine(same) == 1.0
+    # Born after the other one died: a full conflict
+    assert ir.features(a, c, 1.0)["dates"] == -1.0
+    assert ir.combine(ir.features(a, c, 1.0)) < ir.MERGE_THRESHOLD
+
+
+def test_clusters_use_smallest_member_id():
+    assert ir.clusters([(5, 3), (3, 9), (7, 8)]) == {3: 3, 5: 3, 9: 3, 7: 7, 8: 7}
@@ -0,0 +1,30 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from link_assets import build_index, match_document, name_forms, FULL, INITIAL, REVERSED
+
+
+def test_name_forms():
+    forms = dict(name_forms("Maria Anna Müller"))
+    assert forms[("maria", "anna", "muller")] == FULL
+    assert forms[("muller", "maria")] == REVERSED
+    assert forms[("m", "muller")] == INITIAL
+    assert ("maria", "muller") in forms
+    assert name_forms("Müller") == []
+
+
+def test_match_document_confidence():
+    index = build_index({1: "Anna Weber", 2: "Otto Weber", 3: "Ida Koch"})
+    found = match_document("letter.jpg", "Dear Anna Weber, greetings from O. Weber", index)
+    assert found[1] == (0.95, "full name")
+    assert found[2] == (0.6, "initial + last")
+    assert 3 not in found
+
+
+def test_shared_form_is_split_and_file_name_adds():
+    index = build_index({1: "Anna Weber", 2: "Albert Weber"})
+    found = match_document("a_weber_1890.jpg", "A. Weber", index)
+    # "a weber" fits both people: half the confidence each, plus the file name
+    assert found[1][0] == found[2][0] == round(0.6 / 2 + 0.05, 3)
@@ -1,43 +1,471 @@
 #!/usr/bin/env python3
+"""
+Read-only browsing UI for the archive.
+- Keyset pagination everywhere (no OFFSET): a page costs the same at
+  row 50 and at row 500,000
+- List pages select only the columns they show; OCR text is loaded by
+  the document detail page alone
+- Detail pages per person (timeline, linked files, possible duplicates)
+  and per document (text, extracted people / events, linked people)
+- /search: FTS5 (search_index.py), ?fuzzy=1 for OCR-tolerant name search
+  (fuzzy_search.py)
+- /graphs/, /timelines/: pages built by generate_graph.py, served
+  pre-compressed (.br / .gz) with ETag / Last-Modified from their
+  content version, so an unchanged page is a 304
+- Templates compiled once at startup; read-only SQLite connections
+  (mode=ro, query_only) reused from a small pool instead of one connect
+  per request
+"""
 
-from flask import Flask, render_template_string
+import queue
 import sqlite3
+from datetime import datetime, timezone
 from pathlib import Path
 
+from flask import Flask, abort, g, render_template, request, send_file
+from jinja2 import DictLoader
+from markupsafe import Markup, escape
+
+import fuzzy_search
+import search_index
+import static_assets
+
 BASE = Path.home() / "genealogy"
 DB = BASE / "db" / "family_tree.db"
 
+PAGE_SIZE = 50
+POOL_SIZE = 8           # idle read connections kept open
+DETAIL_LIMIT = 200      # rows per section on detail pages
+
 app = Flask(__name__)
 
-HTML = """
-<h1>Genealogy System</h1>
+# ============================================================
+# CONNECTION POOL (READ-ONLY)
+# ============================================================
+class ReadPool:
+    """Idle read-only connections, handed to one request at a time."""
 
-<h2>People</h2>
+    def __init__(self, path: Path, size: int = POOL_SIZE):
+        self.path = path
+        self.idle = queue.LifoQueue(maxsize=size)
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only=1")
+        return conn
+
+    def get(self) -> sqlite3.Connection:
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def put(self, conn: sqlite3.Connection):
+        try:
+            self.idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+
+pool = ReadPool(DB)
+
+
+def db() -> sqlite3.Connection:
+    if "db" not in g:
+        g.db = pool.get()
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    conn = g.pop("db", None)
+    if conn is not None:
+        if conn.in_transaction:
+            conn.rollback()
+        pool.put(conn)
+
+
+def rows(sql, params=()):
+    return db().execute(sql, params).fetchall()
+
+
+def optional_rows(sql, params=()):
+    """Rows from a table a later pipeline step creates; [] until it exists."""
+    try:
+        return rows(sql, params)
+    except sqlite3.OperationalError:
+        return []
+
+
+def page(items, key):
+    """Split a PAGE_SIZE + 1 fetch into (rows, next cursor or None)."""
+    if len(items) > PAGE_SIZE:
+        return items[:PAGE_SIZE], key(items[PAGE_SIZE - 1])
+    return items, None
+
+# ============================================================
+# TEMPLATES (COMPILED AT STARTUP)
+# ============================================================
+TEMPLATES = {
+    "base.html": """<!doctype html>
+<html><head><meta charset="utf-8"><title>{% block title %}Genealogy System{% endblock %}</title>
+<style>
+body { font-family: sans-serif; max-width: 60em; margin: 1em auto; }
+nav a { margin-right: 1em; }
+td, th { padding: .2em .6em; text-align: left; vertical-align: top; }
+pre { white-space: pre-wrap; }
+mark { background: #fe6; }
+</style></head><body>
+<nav><a href="/">Home</a><a href="/people">People</a><a href="/documents">Documents</a>
+<a href="/files">Files</a><a href="/graphs/family_graph.html">Family Graph</a>
+<form action="/search" style="display:inline"><input name="q" value="{{ q or '' }}" placeholder="Search">
+<label><input type="checkbox" name="fuzzy" value="1"{% if fuzzy %} checked{% endif %}> fuzzy</label></form></nav>
+{% block body %}{% endblock %}
+</body></html>""",
+
+    "index.html": """{% extends "base.html" %}{% block body %}
+<h1>Genealogy System</h1>
 <ul>
+<li><a href="/people">People</a></li>
+<li><a href="/documents">Documents</a></li>
+<li><a href="/files">Files</a></li>
+</ul>
+<h2>Graphs</h2>
+<a href="/graphs/family_graph.html">Family Graph</a>
+{% endblock %}""",
+
+    "people.html": """{% extends "base.html" %}{% block title %}People{% endblock %}{% block body %}
+<h1>People</h1>
+<table><tr><th>Name</th><th>Born</th><th>Died</th></tr>
 {% for p in people %}
-<li>{{p[1]}}</li>
+<tr><td><a href="/people/{{ p.id }}">{{ p.name }}</a></td><td>{{ p.birth_date or '' }}</td><td>{{ p.death_date or '' }}</td></tr>
 {% endfor %}
-</ul>
+</table>
+{% if next %}<p><a href="/people?after_name={{ next[0]|urlencode }}&amp;after_id={{ next[1] }}">Next &raquo;</a></p>{% endif %}
+{% endblock %}""",
 
-<h2>Documents</h2>
+    "person.html": """{% extends "base.html" %}{% block title %}{{ person.name }}{% endblock %}{% block body %}
+<h1>{{ person.name }}</h1>
+<p>Born {{ person.birth_date or '?' }} &middot; Died {{ person.death_date or '?' }}</p>
+{% if person.notes %}<p>{{ person.notes }}</p>{% endif %}
+<h2>Timeline</h2>
+{% if timeline_page %}<p><a href="/{{ timeline_page }}">Timeline page</a></p>{% endif %}
+<table>
+{% for e in events %}
+<tr><td>{{ e.event_date or '' }}</td><td>{{ e.event_type }}</td><td>{{ e.description or '' }}</td><td>{{ e.source_file or '' }}</td></tr>
+{% else %}<tr><td>No events yet.</td></tr>{% endfor %}
+</table>
+<h2>Files</h2>
 <ul>
 {% for f in files %}
-<li>{{f[1]}}</li>
+<li><a href="/files/{{ f.id }}">{{ f.file_name }}</a>{% if f.confidence is not none %} ({{ '%.2f'|format(f.confidence) }}){% endif %}</li>
+{% else %}<li>None linked.</li>{% endfor %}
+</ul>
+{% if duplicates %}
+<h2>Possible duplicates</h2>
+<ul>
+{% for d in duplicates %}<li><a href="/people/{{ d.id }}">{{ d.name }}</a></li>{% endfor %}
+</ul>
+{% endif %}
+{% endblock %}""",
+
+    "documents.html": """{% extends "base.html" %}{% block title %}Documents{% endblock %}{% block body %}
+<h1>Documents</h1>
+<table><tr><th>Document</th><th>Engine</th><th>Confidence</th><th>Added</th></tr>
+{% for d in documents %}
+<tr><td><a href="/documents/{{ d.id }}">{{ d.file_path }}</a></td><td>{{ d.engine or '' }}</td>
+<td>{% if d.confidence is not none %}{{ '%.2f'|format(d.confidence) }}{% endif %}</td><td>{{ d.created_at or '' }}</td></tr>
 {% endfor %}
+</table>
+{% if next %}<p><a href="/documents?before={{ next }}">Next &raquo;</a></p>{% endif %}
+{% endblock %}""",
+
+    "document.html": """{% extends "base.html" %}{% block title %}{{ doc.file_path }}{% endblock %}{% block body %}
+<h1>{{ doc.file_path }}</h1>
+<p>{{ doc.engine or '' }}{% if doc.confidence is not none %} &middot; confidence {{ '%.2f'|format(doc.confidence) }}{% endif %}</p>
+{% if linked %}<p>People: {% for p in linked %}<a href="/people/{{ p.id }}">{{ p.name }}</a>{% if not loop.last %}, {% endif %}{% endfor %}</p>{% endif %}
+{% if people %}
+<h2>Extracted people</h2>
+<table>{% for p in people %}
+<tr><td>{{ p.name }}</td><td>{{ p.role or '' }}</td><td>{{ p.birth_date or '' }}</td><td>{{ p.death_date or '' }}</td></tr>
+{% endfor %}</table>
+{% endif %}
+{% if events %}
+<h2>Extracted events</h2>
+<table>{% for e in events %}
+<tr><td>{{ e.event_date or e.date_text or '' }}</td><td>{{ e.event_type }}</td><td>{{ e.person or '' }}</td><td>{{ e.place or '' }}</td><td>{{ e.description or '' }}</td></tr>
+{% endfor %}</table>
+{% endif %}
+<h2>Text</h2>
+<pre>{{ doc.text or '' }}</pre>
+{% endblock %}""",
+
+    "files.html": """{% extends "base.html" %}{% block title %}Files{% endblock %}{% block body %}
+<h1>Files</h1>
+<table><tr><th>File</th><th>Type</th></tr>
+{% for f in files %}
+<tr><td><a href="/files/{{ f.id }}">{{ f.file_name }}</a></td><td>{{ f.file_type or '' }}</td></tr>
+{% endfor %}
+</table>
+{% if next %}<p><a href="/files?before={{ next }}">Next &raquo;</a></p>{% endif %}
+{% endblock %}""",
+
+    "file.html": """{% extends "base.html" %}{% block title %}{{ file.file_name }}{% endblock %}{% block body %}
+<h1>{{ file.file_name }}</h1>
+<p>{{ file.file_type or '' }} &middot; {{ file.file_path or '' }}</p>
+{% if documents %}<p>OCR: {% for d in documents %}<a href="/documents/{{ d.id }}">{{ d.engine or 'text' }}</a> {% endfor %}</p>{% endif %}
+<h2>People</h2>
+<ul>
+{% for p in linked %}
+<li><a href="/people/{{ p.id }}">{{ p.name }}</a>{% if p.confidence is not none %} ({{ '%.2f'|format(p.confidence) }}{% if p.matched_text %}, {{ p.matched_text }}{% endif %}){% endif %}</li>
+{% else %}<li>None linked.</li>{% endfor %}
 </ul>
+{% if file.ocr_text %}<h2>Text</h2><pre>{{ file.ocr_text }}</pre>{% endif %}
+{% endblock %}""",
 
-<h2>Graphs</h2>
-<a href="/graphs/family_graph.html">Family Graph</a>
-"""
+    "search.html": """{% extends "base.html" %}{% block title %}Search{% endblock %}{% block body %}
+<h1>Search{% if q %}: {{ q }}{% endif %}</h1>
+<ol>
+{% for h in hits %}
+<li><a href="{{ h.url }}">{{ h.title or h.url }}</a> <small>{{ h.source }}</small>
+{% if h.snippet %}<br>{{ h.snippet }}{% endif %}</li>
+{% else %}{% if q %}<li>No matches.</li>{% endif %}{% endfor %}
+</ol>
+{% endblock %}""",
+}
+app.jinja_loader = DictLoader(TEMPLATES)
+for _name in TEMPLATES:
+    app.jinja_env.get_template(_name)   # compile now, served from the cache
 
+# ============================================================
+# ROUTES
+# ============================================================
 @app.route("/")
 def index():
-    conn = sqlite3.connect(DB)
-    c = conn.cursor()
-    people = list(c.execute("SELECT * FROM people"))
-    files = list(c.execute("SELECT * FROM files"))
-    conn.close()
-    return render_template_string(HTML, people=people, files=files)
+    # No totals: COUNT(*) scans the whole table on every visit
+    return render_template("index.html")
+
+
+@app.route("/people")
+def people():
+    after_name = request.args.get("after_name")
+    after_id = request.args.get("after_id", type=int)
+    # Keyset on (name, id): idx_people_name (db_upgrade.py)
+    if after_name is not None and after_id is not None:
+        items = rows(
+            """
+            SELECT id, name, birth_date, death_date FROM people
+            WHERE name IS NOT NULL AND (name, id) > (?, ?)
+            ORDER BY name, id LIMIT ?
+            """,
+            (after_name, after_id, PAGE_SIZE + 1)
+        )
+    else:
+        items = rows(
+            "SELECT id, name, birth_date, death_date FROM people "
+            "WHERE name IS NOT NULL ORDER BY name, id LIMIT ?",
+            (PAGE_SIZE + 1,)
+        )
+    items, next_key = page(items, lambda r: (r["name"], r["id"]))
+    return render_template("people.html", people=items, next=next_key)
+
+
+@app.route("/people/<int:person_id>")
+def person(person_id):
+    found = rows(
+        "SELECT id, name, birth_date, death_date, notes FROM people WHERE id=?", (person_id,)
+    )
+    if not found:
+        abort(404)
+    timeline = """
+        SELECT event_type, event_date, description, source_file FROM person_events
+        WHERE person_id=? ORDER BY {order} LIMIT ?
+    """
+    try:
+        # Integer date keys (date_parser.py, kept by build_timelines.py)
+        events = rows(timeline.format(order="event_date_sort, id"), (person_id, DETAIL_LIMIT))
+    except sqlite3.OperationalError:
+        events = optional_rows(timeline.format(order="event_date, id"), (person_id, DETAIL_LIMIT))
+    files = optional_rows(
+        """
+        SELECT f.id, f.file_name, l.confidence FROM asset_links l JOIN files f ON f.id = l.file_id
+        WHERE l.person_id=?
+        UNION
+        SELECT id, file_name, NULL FROM files WHERE person_id=?
+        ORDER BY 3 DESC LIMIT ?
+        """,
+        (person_id, person_id, DETAIL_LIMIT)
+    )
+    duplicates = optional_rows(
+        """
+        SELECT p.id, p.name FROM identity_clusters me
+        JOIN identity_clusters other ON other.cluster_id = me.cluster_id AND other.person_id != me.person_id
+        JOIN people p ON p.id = other.person_id
+        WHERE me.person_id=? LIMIT ?
+        """,
+        (person_id, DETAIL_LIMIT)
+    )
+    # Built by generate_graph.py; not there until its next run
+    timeline_page = optional_rows(
+        "SELECT path FROM static_assets WHERE path=?", (f"timelines/person_{person_id}.html",)
+    )
+    return render_template("person.html", person=found[0], events=events,
+                           files=files, duplicates=duplicates,
+                           timeline_page=timeline_page[0]["path"] if timeline_page else None)
+
+
+@app.route("/documents")
+def documents():
+    before = request.args.get("before", type=int)
+    items = optional_rows(
+        f"""
+        SELECT id, file_path, engine, confidence, created_at FROM ocr_results
+        {"WHERE id < ?" if before is not None else ""}
+        ORDER BY id DESC LIMIT ?
+        """,
+        ((before,) if before is not None else ()) + (PAGE_SIZE + 1,)
+    )
+    items, next_key = page(items, lambda r: r["id"])
+    return render_template("documents.html", documents=items, next=next_key)
+
+
+@app.route("/documents/<int:doc_id>")
+def document(doc_id):
+    found = optional_rows(
+        "SELECT id, file_hash, file_path, engine, confidence, text FROM ocr_results WHERE id=?",
+        (doc_id,)
+    )
+    if not found:
+        abort(404)
+    doc = found[0]
+    people = optional_rows(
+        "SELECT name, sex, birth_date, death_date, role FROM extracted_people "
+        "WHERE file_hash=? ORDER BY seq LIMIT ?",
+        (doc["file_hash"], DETAIL_LIMIT)
+    )
+    events = optional_rows(
+        "SELECT person, event_type, event_date, date_text, place, description FROM extracted_events "
+        "WHERE file_hash=? ORDER BY seq LIMIT ?",
+        (doc["file_hash"], DETAIL_LIMIT)
+    )
+    linked = optional_rows(
+        """
+        SELECT DISTINCT p.id, p.name FROM files f
+        JOIN asset_links l ON l.file_id = f.id JOIN people p ON p.id = l.person_id
+        WHERE f.file_path=? LIMIT ?
+        """,
+        (doc["file_path"], DETAIL_LIMIT)
+    )
+    return render_template("document.html", doc=doc, people=people, events=events, linked=linked)
+
+
+@app.route("/files")
+def files():
+    before = request.args.get("before", type=int)
+    items = rows(
+        f"""
+        SELECT id, file_name, file_type FROM files
+        {"WHERE id < ?" if before is not None else ""}
+        ORDER BY id DESC LIMIT ?
+        """,
+        ((before,) if before is not None else ()) + (PAGE_SIZE + 1,)
+    )
+    items, next_key = page(items, lambda r: r["id"])
+    return render_template("files.html", files=items, next=next_key)
+
+
+@app.route("/files/<int:file_id>")
+def file(file_id):
+    found = rows(
+        "SELECT id, file_name, file_type, file_path, ocr_text FROM files WHERE id=?", (file_id,)
+    )
+    if not found:
+        abort(404)
+    linked = optional_rows(
+        """
+        SELECT p.id, p.name, l.confidence, l.matched_text FROM asset_links l
+        JOIN people p ON p.id = l.person_id
+        WHERE l.file_id=? ORDER BY l.confidence DESC LIMIT ?
+        """,
+        (file_id, DETAIL_LIMIT)
+    )
+    documents = optional_rows(
+        "SELECT id, engine FROM ocr_results WHERE file_path=?", (found[0]["file_path"],)
+    )
+    return render_template("file.html", file=found[0], linked=linked, documents=documents)
+
+
+SOURCE_URLS = {"person": "/people/{}", "file": "/files/{}", "ocr": "/documents/{}"}
+
+
+def _snippet(text):
+    """Escape OCR text but keep the FTS highlight tags."""
+    if not text:
+        return ""
+    open_tag, close_tag = search_index.MARK
+    safe = str(escape(text))
+    safe = safe.replace(str(escape(open_tag)), open_tag).replace(str(escape(close_tag)), close_tag)
+    return Markup(safe)
+
+
+@app.route("/search")
+def search():
+    q = request.args.get("q", "").strip()
+    fuzzy = request.args.get("fuzzy") == "1"
+    hits = []
+    if q and fuzzy:
+        try:
+            found = fuzzy_search.search(db(), q, limit=PAGE_SIZE)
+        except sqlite3.OperationalError:
+            found = []      # fuzzy index not built yet
+        hits = [
+            {"source": "ocr", "url": SOURCE_URLS["ocr"].format(h["id"]), "title": h["file_path"],
+             "snippet": ", ".join(f"{term} ~ {word}" for term, word in h["terms"].items())}
+            for h in found
+        ]
+    elif q:
+        hits = [
+            {"source": h["source"], "url": SOURCE_URLS[h["source"]].format(h["id"]),
+             "title": h["title"], "snippet": _snippet(h["snippet"])}
+            for h in search_index.search(db(), q, limit=PAGE_SIZE)
+        ]
+    return render_template("search.html", q=q, fuzzy=fuzzy, hits=hits)
+
+
+# Pre-compressed variants written by static_assets.write(), best first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+@app.route("/<any(graphs, timelines):kind>/<path:name>")
+def static_page(kind, name):
+    found = optional_rows(
+        "SELECT path, etag, built_at FROM static_assets WHERE path=?", (f"{kind}/{name}",)
+    )
+    if not found:
+        abort(404)
+    asset = found[0]
+    path = static_assets.BASE / asset["path"]
+    if not path.is_file():
+        abort(404)
+
+    encoding = None
+    for enc, suffix in ENCODINGS:
+        variant = path.with_name(path.name + suffix)
+        if enc in request.accept_encodings and variant.is_file():
+            path, encoding = variant, enc
+            break
+
+    resp = send_file(path, mimetype="text/html", conditional=False, etag=False)
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.vary.add("Accept-Encoding")
+    # Weak: the gzip and brotli bodies differ byte-wise but not in content
+    resp.set_etag(asset["etag"], weak=True)
+    resp.last_modified = datetime.fromisoformat(asset["built_at"]).replace(tzinfo=timezone.utc)
+    resp.cache_control.no_cache = True     # always revalidate; cheap when unchanged
+    return resp.make_conditional(request)
+
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8088)